@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+苹果订单页面模拟器 - 本地提供与苹果订单页结构相近的页面，用于可重复的性能测试
+
+- 订单链接: /xc/us/vieworder/<订单号>/<邮箱>，订单内容由订单号和随机种子决定
+- 覆盖所有订单状态、多种物流追踪格式、跳转登录页、字段不全的页面
+- 可配置延迟分布、503/429 错误比例；订单状态随（虚拟）时间推进
+- 同时模拟 Telegram sendMessage 接口，便于统计通知数量
+
+用法:
+    python apple_simulator.py --port 8899
+    python apple_simulator.py --latency lognormal:80:0.5 --error-rate 0.01 --transition 600
+
+控制接口:
+    GET  /__stats              请求统计
+    POST /__advance?seconds=N  虚拟时间前进 N 秒（订单状态随之变化）
+    POST /__reset              清空统计、虚拟时间归零
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+
+
+# 正常订单依次经过的状态
+STATUS_FLOW = ['PLACED', 'PROCESSING', 'PREPARED_FOR_SHIPMENT', 'SHIPPED', 'DELIVERED']
+TRACKING_STATUSES = ('SHIPPED', 'DELIVERED')
+PRODUCTS = [
+    'iPhone 17 Pro Max 256GB Deep Blue',
+    'iPhone 17 Pro 512GB Cosmic Orange',
+    'iPhone Air 256GB Sky Blue',
+    'MacBook Pro 14-inch M5 Space Black',
+    'AirPods Pro 3',
+]
+
+ORDER_PATH_PREFIX = '/xc/us/vieworder/'
+SIGNIN_PATH = '/signin'
+TELEGRAM_PATH_PREFIX = '/tg/'
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布（毫秒），返回 rng -> 秒 的函数
+
+        none                 无延迟
+        fixed:50             固定 50ms
+        uniform:20:200       20~200ms 均匀分布
+        lognormal:80:0.5     中位数 80ms、sigma 0.5 的对数正态分布（长尾）
+    """
+    parts = (spec or 'none').split(':')
+    kind = parts[0]
+    values = [float(v) for v in parts[1:]]
+    if kind == 'none':
+        return lambda rng: 0
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+def _order_rng(seed, order_number):
+    """每个订单固定的随机数（同一订单每次请求得到相同的内容和时间线）"""
+    digest = hashlib.blake2b(f"{seed}:{order_number}".encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, 'big'))
+
+
+class AppleSimulator:
+    """生成订单页面并记录统计，与 HTTP 服务分开便于直接调用"""
+
+    def __init__(self, seed=42, page_kb=300, latency='none', error_rate=0.0, throttle_rate=0.0,
+                 signin_rate=0.0, incomplete_rate=0.0, cancel_rate=0.05, transition=600):
+        self.seed = seed
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.signin_rate = signin_rate
+        self.incomplete_rate = incomplete_rate
+        self.cancel_rate = cancel_rate
+        self.transition = transition  # 每个状态平均停留的（虚拟）秒数
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.clock = 0.0  # 虚拟时间（秒），只通过 /__advance 推进
+        self.timelines = {}  # {订单号: 时间线}
+        self.stats = {}
+        self._build_filler(page_kb)
+        self.reset()
+
+    def _build_filler(self, page_kb):
+        """页面的脚本/样式部分只生成一次，订单 JSON 插在中后部"""
+        rng = random.Random(self.seed)
+        parts = []
+        size = 0
+        while size < page_kb * 1024:
+            part = (f'<div class="rs-item-{rng.randint(0, 9999)}" data-analytics="{{&quot;id&quot;:{rng.random()}}}">'
+                    f'<script>window.ac_{rng.randint(0, 99999)} = {{"key":"value{rng.random()}","list":[1,2,3]}};</script></div>\n')
+            parts.append(part)
+            size += len(part)
+        split = int(len(parts) * 0.6)
+        self.head = ('<!DOCTYPE html><html><head><title>Order Details - Apple</title></head><body>\n' +
+                     ''.join(parts[:split])).encode()
+        self.tail = (''.join(parts[split:]) + '</body></html>\n').encode()
+
+    def reset(self):
+        with self.lock:
+            self.clock = 0.0
+            self.stats = {
+                'requests': 0,
+                'orders': 0,       # 正常返回的订单页面
+                'errors': 0,       # 503
+                'throttled': 0,    # 429
+                'signin': 0,       # 跳转登录页
+                'incomplete': 0,   # 字段不全的页面
+                'telegram': 0,     # 收到的 Telegram 消息
+                'statuses': {},
+            }
+
+    def advance(self, seconds):
+        with self.lock:
+            self.clock += seconds
+            return self.clock
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, statuses=dict(self.stats['statuses']), clock=self.clock)
+
+    def _count(self, key, status=None):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[key] += 1
+            if status:
+                self.stats['statuses'][status] = self.stats['statuses'].get(status, 0) + 1
+
+    def _timeline(self, order_number):
+        """订单的时间线：[(进入状态的虚拟时间, 状态)]，以及固定的商品和物流信息"""
+        timeline = self.timelines.get(order_number)
+        if timeline is not None:
+            return timeline
+        rng = _order_rng(self.seed, order_number)
+        # 订单在测试开始时已经处于不同阶段
+        start = -rng.uniform(0, self.transition * (len(STATUS_FLOW) - 1))
+        steps = []
+        at = start
+        for status in STATUS_FLOW:
+            steps.append((at, status))
+            at += self.transition * rng.uniform(0.5, 1.5)
+        if rng.random() < self.cancel_rate:
+            # 在发货前的某个阶段取消
+            cancel_index = rng.randint(1, 3)
+            steps = steps[:cancel_index] + [(steps[cancel_index][0], 'CANCELED')]
+        tracking_number = f"1Z{rng.randint(10**15, 10**16 - 1)}"
+        timeline = {
+            'steps': steps,
+            'product': rng.choice(PRODUCTS),
+            'placed': f"Jan {rng.randint(1, 28):02d}, 2026",
+            'delivery': f"Feb {rng.randint(1, 28):02d}, 2026",
+            'trackingFormat': rng.randrange(4),
+            'trackingNumber': tracking_number,
+        }
+        with self.lock:
+            self.timelines[order_number] = timeline
+        return timeline
+
+    def status_at(self, order_number, clock=None):
+        """订单在某个虚拟时间的状态"""
+        clock = self.clock if clock is None else clock
+        status = STATUS_FLOW[0]
+        for at, step in self._timeline(order_number)['steps']:
+            if at <= clock:
+                status = step
+        return status
+
+    def order_page(self, order_number, incomplete=False):
+        """订单页面 HTML（bytes）和状态"""
+        timeline = self._timeline(order_number)
+        status = self.status_at(order_number)
+        fields = [
+            f'"orderNumber":"{order_number}"',
+            f'"orderPlacedDate":"{timeline["placed"]}"',
+            f'"productName":"{timeline["product"]}"',
+        ]
+        if not incomplete:
+            fields.append(f'"currentStatus":"{status}","statusDescription":"{status.title()}"')
+        fields.append(f'"deliveryDate":"{timeline["delivery"]}"')
+
+        extra = ''
+        if status in TRACKING_STATUSES and not incomplete:
+            number = timeline['trackingNumber']
+            tracking_format = timeline['trackingFormat']
+            if tracking_format == 0:
+                # UPS 链接，单号在 InquiryNumber1 参数中
+                fields.append(f'"trackingUrl":"https://www.ups.com/track?loc=en_US&InquiryNumber1={number}"')
+            elif tracking_format == 1:
+                # 其他承运商，单号在 trackingNumber 参数中
+                fields.append(f'"trackingUrl":"https://www.fedex.com/fedextrack/?trackingNumber={number}"')
+            elif tracking_format == 2:
+                # 只有单号，没有追踪链接
+                fields.append(f'"trackingNumber":"{number}"')
+            else:
+                # 没有 trackingUrl 字段，UPS 链接出现在页面其他位置
+                extra = f'<a href="https://wwwapps.ups.com/WebTracking/track?InquiryNumber1={number}">Track</a>'
+
+        order_json = '{' + ','.join(fields) + '}'
+        body = (self.head +
+                f'<script type="application/json" id="init_data">{order_json}</script>{extra}\n'.encode() +
+                self.tail)
+        return body, status
+
+    def handle_order(self, order_number):
+        """
+        处理订单页面请求
+
+        Returns:
+            (状态码, 额外响应头, 内容, 延迟秒数)
+        """
+        with self.lock:
+            roll = self.rng.random()
+            delay = self.latency(self.rng)
+        if roll < self.error_rate:
+            self._count('errors')
+            return 503, {}, b'<html><body>Service Unavailable</body></html>', delay
+        roll -= self.error_rate
+        if roll < self.throttle_rate:
+            self._count('throttled')
+            return 429, {'Retry-After': '1'}, b'<html><body>Too Many Requests</body></html>', delay
+        roll -= self.throttle_rate
+        if roll < self.signin_rate:
+            self._count('signin')
+            return 302, {'Location': f'{SIGNIN_PATH}?ref={order_number}'}, b'', delay
+        roll -= self.signin_rate
+        incomplete = roll < self.incomplete_rate
+        body, status = self.order_page(order_number, incomplete=incomplete)
+        self._count('incomplete' if incomplete else 'orders', None if incomplete else status)
+        return 200, {}, body, delay
+
+    def record_telegram(self):
+        with self.lock:
+            self.stats['telegram'] += 1
+
+
+class SimulatorServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # 客户端提前断开是正常情况（拿到字段后不再读取），不输出错误
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def make_handler(simulator):
+    class SimulatorHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, code, body, content_type='text/html; charset=utf-8', headers=None):
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端拿到所需字段后提前断开
+                self.close_connection = True
+
+        def _send_json(self, data, code=200):
+            self._send(code, json.dumps(data).encode(), 'application/json')
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path.startswith(ORDER_PATH_PREFIX):
+                segments = parts.path[len(ORDER_PATH_PREFIX):].split('/')
+                code, headers, body, delay = simulator.handle_order(segments[0])
+                if delay:
+                    time.sleep(delay)
+                self._send(code, body, headers=headers)
+            elif parts.path == SIGNIN_PATH:
+                self._send(200, b'<html><head><title>Sign In - Apple</title></head><body>Sign in</body></html>')
+            elif parts.path == '/__stats':
+                self._send_json(simulator.get_stats())
+            else:
+                self._send(404, b'Not Found')
+
+        def do_POST(self):
+            parts = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            if parts.path.startswith(TELEGRAM_PATH_PREFIX) and parts.path.endswith('/sendMessage'):
+                simulator.record_telegram()
+                self._send_json({'ok': True, 'result': {'message_id': 1}})
+            elif parts.path == '/__advance':
+                seconds = float(parse_qs(parts.query).get('seconds', ['0'])[0])
+                self._send_json({'clock': simulator.advance(seconds)})
+            elif parts.path == '/__reset':
+                simulator.reset()
+                self._send_json({'ok': True})
+            else:
+                self._send(404, b'Not Found')
+
+    return SimulatorHandler
+
+
+def start_simulator(host='127.0.0.1', port=8899, **options):
+    """在后台线程中启动模拟器，返回 (server, simulator)"""
+    simulator = AppleSimulator(**options)
+    server = SimulatorServer((host, port), make_handler(simulator))
+    threading.Thread(target=server.serve_forever, daemon=True, name='apple-simulator').start()
+    return server, simulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description='苹果订单页面模拟器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8899, help='监听端口')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（相同种子得到相同的订单）')
+    parser.add_argument('--page-kb', type=int, default=300, help='页面大小（KB）')
+    parser.add_argument('--latency', default='none',
+                        help='延迟分布（毫秒）: none | fixed:50 | uniform:20:200 | lognormal:80:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的比例')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='返回 429 的比例')
+    parser.add_argument('--signin-rate', type=float, default=0.0, help='跳转登录页的比例')
+    parser.add_argument('--incomplete-rate', type=float, default=0.0, help='页面缺少状态字段的比例')
+    parser.add_argument('--cancel-rate', type=float, default=0.05, help='订单被取消的比例')
+    parser.add_argument('--transition', type=float, default=600, help='每个状态平均停留的虚拟秒数')
+    args = parser.parse_args()
+
+    simulator = AppleSimulator(
+        seed=args.seed, page_kb=args.page_kb, latency=args.latency,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        signin_rate=args.signin_rate, incomplete_rate=args.incomplete_rate,
+        cancel_rate=args.cancel_rate, transition=args.transition
+    )
+    server = SimulatorServer((args.host, args.port), make_handler(simulator))
+    print(f"🍎 苹果订单页面模拟器: http://{args.host}:{args.port}{ORDER_PATH_PREFIX}<订单号>/<邮箱>")
+    print(f"   页面 {args.page_kb} KB, 延迟 {args.latency}, 503 {args.error_rate:.1%}, 429 {args.throttle_rate:.1%}, "
+          f"登录页 {args.signin_rate:.1%}, 不完整 {args.incomplete_rate:.1%}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+异步检查引擎 - 在一个事件循环中并发查询大量订单（需要安装 aiohttp）
+"""
+
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:  # 可选依赖，未安装时使用线程池引擎
+    aiohttp = None
+
+from circuit_breaker import CONNECTION, CircuitOpenError, get_breaker
+from concurrency_limiter import OK, TIMEOUT, classify_response, get_limiter
+from fetch_client import DEFAULT_HEADERS, SHARED_WAIT_FACTOR, STREAM_CHUNK_SIZE, get_fetch_client, shared_page
+from order_extractor import StreamingOrderExtractor, extract_order_fields, fingerprint_fields
+
+
+# 并发名额用完时，等待名额的轮询间隔（秒）
+LIMITER_POLL_INTERVAL = 0.01
+
+
+def is_available():
+    """是否可以使用异步引擎"""
+    return aiohttp is not None
+
+
+class AsyncSweepEngine:
+    """基于 asyncio + aiohttp 的批量查询引擎，用信号量限制并发数"""
+
+    def __init__(self, concurrency=200, timeout=30, stream=False):
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.stream = stream
+        self.stats = {
+            'queries': 0,
+            'earlyExits': 0,
+            'bytesRead': 0,
+            'bytesSkipped': 0,
+        }
+
+    async def fetch_order(self, session, url):
+        """抓取订单页面，返回结构与 FetchClient.fetch_order 相同"""
+        start = time.time()
+        early_exit = False
+        bytes_read = 0
+
+        async with session.get(url, allow_redirects=True) as response:
+            if self.stream:
+                extractor = StreamingOrderExtractor(response.charset)
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    bytes_read += len(chunk)
+                    if extractor.feed(chunk):
+                        early_exit = True
+                        break
+                # 字段不全时 finish() 会对完整页面重新提取
+                fields = extractor.finish()
+            else:
+                body = await response.read()
+                bytes_read = len(body)
+                fields = extract_order_fields(body.decode(response.charset or 'utf-8', errors='replace'))
+
+            if early_exit:
+                # 不再读取剩余内容，直接断开连接
+                response.close()
+
+            skipped = 0
+            content_length = response.headers.get('Content-Length')
+            # aiohttp 读到的是解压后的字节，只有未压缩时才能和 Content-Length 比较
+            if early_exit and content_length and 'Content-Encoding' not in response.headers:
+                try:
+                    skipped = max(0, int(content_length) - bytes_read)
+                except ValueError:
+                    skipped = 0
+
+            self.stats['queries'] += 1
+            self.stats['earlyExits'] += 1 if early_exit else 0
+            self.stats['bytesRead'] += bytes_read
+            self.stats['bytesSkipped'] += skipped
+
+            return {
+                'fields': fields,
+                'fingerprint': fingerprint_fields(fields),
+                'finalUrl': str(response.url),
+                'statusCode': response.status,
+                'bytesRead': bytes_read,
+                'earlyExit': early_exit,
+                'elapsedMs': int((time.time() - start) * 1000),
+            }
+
+    async def _run(self, urls, build_result, error_result, apply_result):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        # 不在订单之间共享 Cookie
+        async with aiohttp.ClientSession(headers=DEFAULT_HEADERS, connector=connector, timeout=timeout,
+                                         cookie_jar=aiohttp.DummyCookieJar()) as session:
+
+            limiter = get_limiter()
+            breaker = get_breaker()
+            # 与线程引擎共用：同一订单正在被其他地方查询（或刚查询过）时复用结果
+            flight = get_fetch_client().flight
+
+            async def fetch_shared(url):
+                kind, key, value = flight.claim(url)
+                if kind == 'cached':
+                    return shared_page(value)
+                if kind == 'wait':
+                    # shield：本协程超时或被取消时，不取消其他调用方共享的 Future
+                    page = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(value)),
+                                                  self.timeout * SHARED_WAIT_FACTOR)
+                    return shared_page(page)
+                # 从 claim 到 finish 之间任何位置退出（包括等待名额时被取消）都必须 finish，
+                # 否则这个订单会一直留在 inflight 中，之后的调用方永远等待
+                try:
+                    # 熔断中不发出请求（与线程引擎共用同一个熔断器）
+                    if not breaker.allow():
+                        raise CircuitOpenError(breaker.retry_in())
+                    # 自适应并发限制（与线程引擎共用）
+                    while not limiter.try_acquire():
+                        await asyncio.sleep(LIMITER_POLL_INTERVAL)
+                    start = time.time()
+                    outcome = 'error'
+                    try:
+                        page = await self.fetch_order(session, url)
+                        outcome = classify_response(page['statusCode'], page['finalUrl'], page['fields'])
+                    except BaseException as e:
+                        # 链接无效、取消等保持 'error'，不调整并发，也不计入熔断
+                        if isinstance(e, asyncio.TimeoutError):
+                            outcome = TIMEOUT
+                        elif isinstance(e, aiohttp.ClientConnectionError):
+                            outcome = CONNECTION
+                        raise
+                    finally:
+                        limiter.release(outcome, (time.time() - start) * 1000)
+                        breaker.record_outcome(outcome)
+                except BaseException as e:
+                    flight.finish(key, value, error=e)
+                    raise
+                flight.finish(key, value, page, cacheable=outcome == OK)
+                return page
+
+            async def check_one(url):
+                async with semaphore:
+                    try:
+                        result = build_result(url, await fetch_shared(url))
+                    except asyncio.TimeoutError:
+                        result = error_result(url, '请求超时')
+                    except Exception as e:
+                        result = error_result(url, e)
+                # 合并结果和发送通知会有阻塞操作（Telegram 请求），放到线程池中执行
+                return await loop.run_in_executor(None, apply_result, url, result)
+
+            return await asyncio.gather(*(check_one(url) for url in urls))
+
+    def run(self, urls, build_result, error_result, apply_result):
+        """
+        并发查询所有订单
+
+        Args:
+            urls: 订单链接列表
+            build_result: (url, page) -> result，根据页面构造查询结果
+            error_result: (url, error) -> result，构造失败结果
+            apply_result: (url, result) -> result，状态变化检测、通知与结果合并
+
+        Returns:
+            list: 与 urls 顺序一致的查询结果
+        """
+        return asyncio.run(self._run(urls, build_result, error_result, apply_result))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+批量查询 - 滑动窗口并发查询一组订单，每完成一个就返回一个结果
+
+- 同时最多 concurrency 个查询在进行，任何一个完成后立即补上下一个（不按批次等待）
+- 失败的订单按指数退避重新排队，等待期间不占用并发名额
+"""
+
+import heapq
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def iter_batch_query(urls, query, concurrency=10, max_retries=2, backoff=1.0, max_backoff=10.0):
+    """
+    并发查询订单，按完成顺序逐个产出结果
+
+    Args:
+        urls: 订单链接列表
+        query: url -> result 的查询函数，result['success'] 表示是否成功
+        concurrency: 最大并发数
+        max_retries: 每个订单失败后的最大重试次数
+        backoff: 第一次重试前的等待秒数，之后每次翻倍
+        max_backoff: 单次等待上限（秒）
+
+    Yields:
+        (index, result, attempts): index 为 urls 中的位置，attempts 为实际查询次数
+    """
+    concurrency = max(1, int(concurrency))
+    pending = list(range(len(urls)))[::-1]  # 待查询（倒序，pop() 取第一个）
+    retry_heap = []                          # [(可重试时间, index)]
+    attempts = [0] * len(urls)
+    running = {}                             # {future: index}
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as executor:
+        while pending or retry_heap or running:
+            now = time.time()
+            # 到期的重试优先补进窗口
+            while retry_heap and retry_heap[0][0] <= now and len(running) < concurrency:
+                _, index = heapq.heappop(retry_heap)
+                attempts[index] += 1
+                running[executor.submit(query, urls[index])] = index
+            while pending and len(running) < concurrency:
+                index = pending.pop()
+                attempts[index] += 1
+                running[executor.submit(query, urls[index])] = index
+
+            if not running:
+                # 只剩等待退避的订单
+                time.sleep(max(0, retry_heap[0][0] - time.time()))
+                continue
+
+            wait_timeout = None
+            if retry_heap:
+                wait_timeout = max(0, retry_heap[0][0] - time.time())
+            done, _ = wait(running, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'url': urls[index], 'error': str(e)}
+
+                if not result.get('success') and attempts[index] <= max_retries:
+                    delay = min(backoff * (2 ** (attempts[index] - 1)), max_backoff)
+                    heapq.heappush(retry_heap, (time.time() + delay, index))
+                    continue
+
+                yield index, result, attempts[index]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+订单字段提取性能测试 - 单次扫描提取器 vs 原来的 re.search 链
+
+用法:
+    python bench_extractor.py                 # 使用合成页面
+    python bench_extractor.py --corpus pages  # 使用保存的订单页面 (*.html)
+"""
+
+import argparse
+import glob
+import os
+import random
+import re
+import time
+
+from order_extractor import extract_order_fields
+
+
+def legacy_extract(html):
+    """原来的提取方式：每个字段一次 re.search"""
+    result = {
+        'orderNumber': '-',
+        'orderDate': '-',
+        'productName': '-',
+        'status': '-',
+        'deliveryDate': '-',
+        'trackingUrl': '-',
+        'trackingNumber': '-',
+    }
+
+    m = re.search(r'"orderNumber"\s*:\s*"([^"]+)"', html)
+    if m:
+        result['orderNumber'] = m.group(1)
+
+    m = re.search(r'"orderPlacedDate"\s*:\s*"([^"]+)"', html)
+    if m:
+        result['orderDate'] = m.group(1)
+
+    m = re.search(r'"productName"\s*:\s*"([^"]+)"', html)
+    if m:
+        result['productName'] = m.group(1)
+
+    m = re.search(r'"currentStatus"\s*:\s*"([^"]+)"', html)
+    if m:
+        result['status'] = m.group(1)
+    else:
+        m = re.search(r'"statusDescription"\s*:\s*"([^"]+)"', html)
+        if m:
+            result['status'] = m.group(1)
+
+    m = re.search(r'"deliveryDate"\s*:\s*"([^"]+)"', html)
+    if m:
+        result['deliveryDate'] = m.group(1)
+
+    m = re.search(r'"trackingUrl"\s*:\s*"([^"]+)"', html)
+    if not m:
+        m = re.search(r'(https?://[^"\s]+ups\.com[^"\s]+)', html)
+    if m:
+        result['trackingUrl'] = m.group(1)
+        tracking_match = re.search(r'[?&]InquiryNumber\d*=([A-Z0-9]+)', m.group(1))
+        if not tracking_match:
+            tracking_match = re.search(r'[?&]trackingNumber=([A-Z0-9]+)', m.group(1))
+        if tracking_match:
+            result['trackingNumber'] = tracking_match.group(1)
+
+    if result['trackingNumber'] == '-':
+        m = re.search(r'"trackingNumber"\s*:\s*"([^"]+)"', html)
+        if m:
+            result['trackingNumber'] = m.group(1)
+
+    return result
+
+
+def make_synthetic_page(rng, size_kb=300):
+    """生成与苹果订单页结构相近的页面：大量脚本/样式 + 一段订单 JSON"""
+    status = rng.choice(['PLACED', 'PROCESSING', 'PREPARED_FOR_SHIPMENT', 'SHIPPED', 'DELIVERED', 'CANCELED'])
+    order_no = f"W{rng.randint(1000000000, 9999999999)}"
+    tracking = ''
+    if status in ('SHIPPED', 'DELIVERED'):
+        number = f"1Z{rng.randint(10**15, 10**16 - 1)}"
+        tracking = (f',"trackingUrl":"https://www.ups.com/track?loc=en_US&InquiryNumber1={number}"'
+                    f',"trackingNumber":"{number}"')
+    order_json = (
+        f'{{"orderNumber":"{order_no}","orderPlacedDate":"Jan 15, 2026",'
+        f'"productName":"iPhone 17 Pro Max 256GB Deep Blue",'
+        f'"currentStatus":"{status}","statusDescription":"{status.title()}",'
+        f'"deliveryDate":"Feb 02, 2026"{tracking}}}'
+    )
+
+    filler_parts = []
+    filler_size = 0
+    while filler_size < size_kb * 1024:
+        part = (f'<div class="rs-item-{rng.randint(0, 9999)}" data-analytics="{{&quot;id&quot;:{rng.random()}}}">'
+                f'<script>window.ac_{rng.randint(0, 99999)} = {{"key":"value{rng.random()}","list":[1,2,3]}};</script></div>\n')
+        filler_parts.append(part)
+        filler_size += len(part)
+
+    # 订单 JSON 通常位于页面中后部
+    split = int(len(filler_parts) * 0.6)
+    return (''.join(filler_parts[:split]) +
+            f'<script type="application/json" id="init_data">{order_json}</script>' +
+            ''.join(filler_parts[split:]))
+
+
+def load_corpus(corpus_dir, count, rng):
+    if corpus_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+        if pages:
+            print(f"✅ 从 {corpus_dir} 加载了 {len(pages)} 个页面")
+            return pages
+        print(f"⚠️ {corpus_dir} 中没有 .html 页面，改用合成页面")
+    return [make_synthetic_page(rng) for _ in range(count)]
+
+
+def bench(name, func, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            func(html)
+    elapsed = time.perf_counter() - start
+    per_page = elapsed / (rounds * len(pages)) * 1000
+    print(f"  {name:<12} {elapsed:8.3f}s   {per_page:8.3f} ms/页")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='订单字段提取性能测试')
+    parser.add_argument('--corpus', help='保存的订单页面目录 (*.html)')
+    parser.add_argument('--pages', type=int, default=50, help='合成页面数量')
+    parser.add_argument('--rounds', type=int, default=5, help='重复轮数')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    pages = load_corpus(args.corpus, args.pages, rng)
+    total_kb = sum(len(p) for p in pages) / 1024
+    print(f"📄 页面数: {len(pages)}, 平均大小: {total_kb / len(pages):.0f} KB")
+
+    # 先校验结果一致
+    mismatches = 0
+    for html in pages:
+        if extract_order_fields(html) != legacy_extract(html):
+            mismatches += 1
+    print(f"🔍 结果一致性: {len(pages) - mismatches}/{len(pages)}")
+
+    print(f"⏱ {args.rounds} 轮:")
+    legacy = bench('re.search 链', legacy_extract, pages, args.rounds)
+    single = bench('单次扫描', extract_order_fields, pages, args.rounds)
+    print(f"🚀 加速比: {legacy / single:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+监控检查吞吐量测试 - 让监控器查询本地苹果订单页面模拟器，统计每轮检查的耗时和通知数量
+
+每个订单规模在单独的子进程和目录中运行（监控器、连接池、并发限制器、熔断器和通知器都不会
+带到下一个规模）：第一轮查询所有新订单，之后每轮前模拟器的虚拟时间前进 --advance 秒，
+部分订单状态发生变化并触发通知（发送到模拟器的 Telegram 接口）。
+
+用法:
+    python bench_sweep.py                                # 1k、10k、100k 个订单
+    python bench_sweep.py --sizes 1000 --engine async
+    python bench_sweep.py --latency lognormal:80:0.5 --error-rate 0.01
+    python bench_sweep.py --simulator http://127.0.0.1:8899   # 使用已启动的模拟器
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+import notifier as notifier_module
+from notifier import get_notifier
+from web_monitor import OrderMonitor
+
+
+SIMULATOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'apple_simulator.py')
+BENCH_SCRIPT = os.path.abspath(__file__)
+
+
+def start_simulator_process(args):
+    """启动模拟器子进程（与监控器分开，避免争用同一个 GIL），返回 (进程, 地址)"""
+    command = [
+        sys.executable, SIMULATOR_SCRIPT,
+        '--port', str(args.port),
+        '--seed', str(args.seed),
+        '--page-kb', str(args.page_kb),
+        '--latency', args.latency,
+        '--error-rate', str(args.error_rate),
+        '--throttle-rate', str(args.throttle_rate),
+        '--signin-rate', str(args.signin_rate),
+        '--incomplete-rate', str(args.incomplete_rate),
+        '--transition', str(args.transition),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{args.port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base}/__stats", timeout=1)
+            return process, base
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('模拟器启动失败')
+
+
+def order_urls(base, run, count):
+    return [f"{base}/xc/us/vieworder/W{run:02d}{i:08d}/bench@example.com" for i in range(count)]
+
+
+def dispatch_totals():
+    """所有机器人已发送、失败和排队中的消息数"""
+    totals = {'sent': 0, 'failed': 0, 'queued': 0}
+    for item in get_notifier().get_dispatch_stats():
+        totals['sent'] += item['sent']
+        totals['failed'] += item['failed']
+        totals['queued'] += item['queueDepth']
+    return totals
+
+
+def run_size(base, run, size, args):
+    """在单独的目录中对 size 个订单运行多轮检查，返回每轮的统计"""
+    workdir = os.path.join(args.workdir, f"orders_{size}")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    for name in ('orders.txt', 'order_history.json', 'order_history.json.journal', 'notification_outbox.jsonl'):
+        if os.path.exists(name):
+            os.remove(name)
+
+    requests.post(f"{base}/__reset", timeout=10)
+    with open('orders.txt', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(order_urls(base, run, size)) + '\n')
+    with open('monitor_config.json', 'w') as f:
+        json.dump({
+            'engine': args.engine,
+            'threads': args.threads,
+            'max_threads': max(args.threads, args.max_threads),
+            'timeout': args.timeout,
+            # 每轮都要真正请求页面（轮次之间的间隔远小于结果缓存时间）
+            'fetch_cache_ttl': 0,
+        }, f, indent=2)
+
+    monitor = OrderMonitor()
+    notifier = get_notifier()
+    if not notifier.get_enabled_bots():
+        notifier.add_bot('bench', 'bench-token', 'bench-chat')
+
+    rows = []
+    for sweep in range(args.sweeps):
+        if sweep:
+            requests.post(f"{base}/__advance", params={'seconds': args.advance}, timeout=10)
+        changes_before = len(monitor.status_changes)
+        dispatch_before = dispatch_totals()
+        requests_before = requests.get(f"{base}/__stats", timeout=10).json()['requests']
+
+        start = time.perf_counter()
+        # 监控器每个订单都会打印日志，默认不输出
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            results = monitor.check_all_orders()
+        elapsed = time.perf_counter() - start
+
+        dispatch_after = dispatch_totals()
+        sweep_stats = monitor.last_sweep if results else {}
+        row = {
+            'orders': size,
+            'sweep': sweep + 1,
+            'queried': len(results),
+            'seconds': round(elapsed, 3),
+            'ordersPerSecond': round(len(results) / elapsed, 1) if elapsed else 0,
+            'changed': sweep_stats.get('changed', 0),
+            'unchanged': sweep_stats.get('unchanged', 0),
+            'failed': sweep_stats.get('failed', 0),
+            'statusChanges': len(monitor.status_changes) - changes_before,
+            'messages': sum(dispatch_after.values()) - sum(dispatch_before.values()),
+            'requests': requests.get(f"{base}/__stats", timeout=10).json()['requests'] - requests_before,
+        }
+        rows.append(row)
+        print(f"  {size:>7} 个订单  第 {row['sweep']} 轮  查询 {row['queried']:>7}  "
+              f"{row['seconds']:8.2f} 秒  {row['ordersPerSecond']:8.1f} 个/秒  "
+              f"变化 {row['changed']:>6}  未变化 {row['unchanged']:>6}  失败 {row['failed']:>5}  "
+              f"状态变更 {row['statusChanges']:>5}  通知 {row['messages']:>4}")
+
+    # 等待通知发送队列清空（Telegram 限速约每秒 1 条）
+    deadline = time.time() + args.drain
+    while dispatch_totals()['queued'] and time.time() < deadline:
+        time.sleep(0.2)
+    delivered = requests.get(f"{base}/__stats", timeout=10).json()['telegram']
+    print(f"  📨 模拟 Telegram 收到 {delivered} 条消息，队列剩余 {dispatch_totals()['queued']} 条")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监控检查吞吐量测试（本地苹果订单页面模拟器）')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='订单数量，逗号分隔')
+    parser.add_argument('--sweeps', type=int, default=3, help='每个规模的检查轮数')
+    parser.add_argument('--advance', type=float, default=300, help='每轮之间虚拟时间前进的秒数')
+    parser.add_argument('--engine', default='threads', choices=['threads', 'async'], help='检查引擎')
+    parser.add_argument('--threads', type=int, default=10, help='初始并发数')
+    parser.add_argument('--max-threads', type=int, default=64, help='自适应并发上限')
+    parser.add_argument('--timeout', type=int, default=30, help='单个订单的超时（秒）')
+    parser.add_argument('--drain', type=float, default=10, help='最后等待通知发送的秒数')
+    parser.add_argument('--workdir', help='运行目录（默认临时目录）')
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    parser.add_argument('--verbose', action='store_true', help='输出监控器日志')
+    # 模拟器参数
+    parser.add_argument('--simulator', help='已启动的模拟器地址（默认自动启动）')
+    parser.add_argument('--port', type=int, default=8899, help='自动启动的模拟器端口')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--page-kb', type=int, default=300)
+    parser.add_argument('--latency', default='none')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--signin-rate', type=float, default=0.0)
+    parser.add_argument('--incomplete-rate', type=float, default=0.0)
+    parser.add_argument('--transition', type=float, default=600)
+    # 子进程参数：只运行一个规模，结果写入文件
+    parser.add_argument('--child-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--child-run', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--child-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_size:
+        # 通知发送到模拟器，而不是 api.telegram.org
+        notifier_module.TELEGRAM_API = f"{args.simulator}/tg"
+        rows = run_size(args.simulator, args.child_run, args.child_size, args)
+        with open(args.child_output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f)
+        return
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    args.workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='bench_sweep_'))
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    process = None
+    if args.simulator:
+        base = args.simulator.rstrip('/')
+    else:
+        process, base = start_simulator_process(args)
+    print(f"🍎 模拟器: {base}  引擎: {args.engine}  运行目录: {args.workdir}")
+    rows = []
+    try:
+        for run, size in enumerate(sizes):
+            rows_file = os.path.join(args.workdir, f"rows_{run}_{size}.json")
+            subprocess.run([sys.executable, BENCH_SCRIPT, *sys.argv[1:],
+                            '--simulator', base, '--workdir', args.workdir,
+                            '--child-size', str(size), '--child-run', str(run),
+                            '--child-output', rows_file], check=True)
+            with open(rows_file, 'r', encoding='utf-8') as f:
+                rows.extend(json.load(f))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'sweeps': rows}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+接口序列化基准测试 - /api/monitor/orders 的 JSON 生成（数据变化后第一次请求的开销）
+"""
+
+import json
+
+import pytest
+
+from conftest import SIZE_IDS, SIZES, rounds_for
+from web_server import build_orders_payload
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_orders_payload_json(bench, monitor_fixture, size):
+    monitor = monitor_fixture(size).monitor
+    bench(lambda: json.dumps(build_orders_payload(monitor)).encode('utf-8'), rounds=rounds_for(size))
+    payload = json.loads(json.dumps(build_orders_payload(monitor)))
+    assert len(payload['orders']) == size and len(payload['results']) == size
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+订单字段提取基准测试 - 完整页面提取和流式提取（分块读取、字段齐全后提前结束）
+"""
+
+import glob
+import os
+
+import pytest
+
+from apple_simulator import AppleSimulator
+from fetch_client import STREAM_CHUNK_SIZE
+from order_extractor import StreamingOrderExtractor, extract_order_fields
+
+
+def load_pages():
+    """BENCH_CORPUS 目录中保存的页面；未设置时用模拟器生成覆盖各种状态和物流格式的页面"""
+    corpus = os.environ.get('BENCH_CORPUS')
+    if corpus:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(corpus, '*.html'))):
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        if pages:
+            return pages
+    simulator = AppleSimulator(seed=7, cancel_rate=0.1, transition=600)
+    pages = []
+    # 虚拟时间推进，同一批订单经过各个状态
+    for clock in (0, 900, 1800, 3000):
+        simulator.clock = clock
+        for i in range(12):
+            pages.append(simulator.order_page(f"W{i:010d}")[0])
+    return pages
+
+
+@pytest.fixture(scope='module')
+def pages():
+    return load_pages()
+
+
+def test_extract_fields(bench, pages):
+    texts = [page.decode('utf-8') for page in pages]
+
+    def run():
+        for html in texts:
+            extract_order_fields(html)
+
+    bench(run)
+    assert all(extract_order_fields(html)['status'] != '-' for html in texts)
+
+
+def test_streaming_extract(bench, pages):
+    chunked = [[page[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(page), STREAM_CHUNK_SIZE)]
+               for page in pages]
+
+    def run():
+        for chunks in chunked:
+            extractor = StreamingOrderExtractor('utf-8')
+            for chunk in chunks:
+                if extractor.feed(chunk):
+                    break
+            extractor.finish()
+
+    bench(run)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+历史记录基准测试 - 追加变化的订单、合并快照、启动时读取
+"""
+
+import pytest
+
+from conftest import SIZE_IDS, SIZES, rounds_for
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_save_history_changes(bench, monitor_fixture, size):
+    """一轮检查后保存：10% 的订单有变化，只追加到日志"""
+    fixture = monitor_fixture(size)
+    monitor = fixture.monitor
+    changed = fixture.urls[::10]
+
+    def setup():
+        with monitor.history_lock:
+            monitor.dirty_urls = set(changed)
+        # 不在计时中合并快照
+        monitor.history_store.journal_ops = 0
+
+    bench(monitor.save_history, rounds=rounds_for(size), setup=setup)
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_compact_history(bench, monitor_fixture, size):
+    """把所有结果写入快照"""
+    monitor = monitor_fixture(size).monitor
+    bench(monitor.compact_history, rounds=rounds_for(size))
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_load_history(bench, monitor_fixture, size):
+    """启动时读取快照和日志"""
+    fixture = monitor_fixture(size)
+    monitor = fixture.monitor
+    monitor.compact_history()
+    with monitor.history_lock:
+        monitor.dirty_urls = set(fixture.urls[::10])
+    monitor.history_store.journal_ops = 0
+    monitor.save_history()
+
+    bench(monitor.load_history, rounds=rounds_for(size))
+    assert len(monitor.state) == size
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+监控检查基准测试 - 选择到期订单、合并查询结果、统计状态（不发出网络请求）
+"""
+
+import pytest
+
+from conftest import SIZE_IDS, SIZES, order_fields, rounds_for
+from order_extractor import fingerprint_fields
+
+
+def page_for(i, status=None):
+    """与 FetchClient.fetch_order 返回结构相同的页面"""
+    fields = order_fields(i, status)
+    return {'fields': fields, 'fingerprint': fingerprint_fields(fields), 'bytesRead': 180000}
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_select_due_orders(bench, monitor_fixture, size):
+    """一轮检查的选择阶段：同步调度、跳过终态和未到期的订单"""
+    fixture = monitor_fixture(size)
+    monitor = fixture.monitor
+
+    bench(lambda: monitor.check_all_orders(due_only=True), rounds=rounds_for(size),
+          setup=monitor.scheduler.clear)
+    assert monitor.check_all_orders(due_only=True) == []
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_build_and_merge_results(bench, monitor_fixture, size):
+    """构造结果并合并：大部分订单内容未变化，每 10 个订单有 1 个状态变化"""
+    fixture = monitor_fixture(size)
+    monitor = fixture.monitor
+    pages = []
+    for i, url in enumerate(fixture.urls):
+        status = 'SHIPPED' if i % 10 == 0 and order_fields(i)['status'] != 'SHIPPED' else None
+        pages.append((url, page_for(i, status)))
+
+    def run():
+        for url, page in pages:
+            monitor._apply_result(url, monitor._build_result(url, page))
+
+    bench(run, rounds=rounds_for(size), setup=fixture.reset)
+    assert monitor.state.get(fixture.urls[10])['status'] == 'SHIPPED'
+
+
+@pytest.mark.parametrize('size', SIZES, ids=SIZE_IDS)
+def test_get_status(bench, monitor_fixture, size):
+    monitor = monitor_fixture(size).monitor
+    bench(monitor.get_status, rounds=rounds_for(size))
+    assert monitor.get_status()['totalOrders'] == size
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+性能基准测试 - 监控热点路径的耗时与保存的基线比较，明显变慢时测试失败
+
+运行:
+    python -m pytest benchmarks                  # 1k、10k 规模
+    BENCH_LARGE=1 python -m pytest benchmarks    # 加上 100k 规模
+    BENCH_UPDATE=1 python -m pytest benchmarks   # 用本次结果更新基线（换机器或有意的改动后）
+
+环境变量:
+    BENCH_TOLERANCE  允许比基线慢的比例，默认 1.0（不到基线 2 倍不算退化；写文件的测试受磁盘影响波动较大）
+    BENCH_CORPUS     保存的订单页面目录 (*.html)，用于字段提取测试；未设置时使用模拟器生成的页面
+
+基线保存在 benchmarks/baselines.json（{测试名: 秒}），每项取多轮中最快的一次，
+受其他进程影响最小；很快的测试会自动增加轮数。基线与机器有关，在新机器上先用 BENCH_UPDATE=1 生成。
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from order_extractor import fingerprint_fields  # noqa: E402
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+TOLERANCE = float(os.environ.get('BENCH_TOLERANCE', '1.0'))
+UPDATE = os.environ.get('BENCH_UPDATE') == '1'
+LARGE = os.environ.get('BENCH_LARGE') == '1'
+# 比基线慢不到这么多秒时不算退化（很短的测试受计时抖动影响大）
+MIN_REGRESSION_SECONDS = 0.005
+# 很快的测试自动增加轮数，总计时至少这么多秒（最多 MAX_ROUNDS 轮）
+MIN_BENCH_SECONDS = 0.5
+MAX_ROUNDS = 50
+
+SIZES = [1000, 10000] + ([100000] if LARGE else [])
+SIZE_IDS = [f"{size // 1000}k" for size in SIZES]
+
+STATUSES = ['PLACED', 'PROCESSING', 'PREPARED_FOR_SHIPMENT', 'SHIPPED', 'DELIVERED', 'CANCELED']
+
+
+def rounds_for(size):
+    """规模越大重复次数越少"""
+    return 3 if size >= 100000 else 5
+
+
+def order_url(i):
+    return f"https://www.apple.com/xc/us/vieworder/W{i:010d}/bench@example.com"
+
+
+def order_fields(i, status=None):
+    """第 i 个订单的页面字段"""
+    status = status or STATUSES[i % len(STATUSES)]
+    fields = {
+        'orderNumber': f"W{i:010d}",
+        'orderDate': 'Jan 15, 2026',
+        'productName': 'iPhone 17 Pro Max 256GB Deep Blue',
+        'status': status,
+        'deliveryDate': 'Feb 02, 2026',
+        'trackingUrl': '-',
+        'trackingNumber': '-',
+    }
+    if status in ('SHIPPED', 'DELIVERED'):
+        number = f"1Z{i:016d}"
+        fields['trackingUrl'] = f"https://www.ups.com/track?loc=en_US&InquiryNumber1={number}"
+        fields['trackingNumber'] = number
+    return fields
+
+
+def order_result(i, age_seconds=60):
+    """第 i 个订单上次查询成功的结果（与 OrderMonitor._build_result 的结构一致）"""
+    fields = order_fields(i)
+    result = {
+        'success': True,
+        'url': order_url(i),
+        'timestamp': (datetime.now() - timedelta(seconds=age_seconds)).isoformat(),
+        'queryCount': 3,
+        'bytesRead': 180000,
+        'fingerprint': fingerprint_fields(fields),
+    }
+    result.update(fields)
+    return result
+
+
+class MonitorFixture:
+    """一个有 size 个订单和查询结果的监控器（在单独的目录中）"""
+
+    def __init__(self, workdir, size):
+        from web_monitor import OrderMonitor
+
+        self.size = size
+        self.urls = [order_url(i) for i in range(size)]
+        self.results = {url: order_result(i) for i, url in enumerate(self.urls)}
+
+        os.makedirs(workdir, exist_ok=True)
+        previous = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with open('orders.txt', 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.urls) + '\n')
+            with open('monitor_config.json', 'w') as f:
+                # 不写通知发件箱，基准测试只关心监控本身
+                json.dump({'notify_outbox': False}, f)
+            # 监控器创建时把文件路径转换为绝对路径，切换回原目录后仍读写这个目录
+            self.monitor = OrderMonitor()
+        finally:
+            os.chdir(previous)
+        self.reset()
+        self.monitor.compact_history()
+
+    def reset(self):
+        """恢复初始结果（修改结果的测试在每轮之前调用）"""
+        self.monitor.state.load(self.results, [])
+        self.monitor.scheduler.clear()
+        with self.monitor.history_lock:
+            self.monitor.dirty_urls = set()
+            self.monitor.pending_ops = []
+
+
+class Benchmark:
+    """计时并与基线比较"""
+
+    def __init__(self):
+        self.baselines = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+                self.baselines = json.load(f)
+        self.results = {}
+
+    def run(self, name, func, rounds=5, setup=None):
+        times = []
+        while len(times) < rounds or (sum(times) < MIN_BENCH_SECONDS and len(times) < MAX_ROUNDS):
+            if setup:
+                setup()
+            # 上一轮产生的垃圾先回收，避免在计时中触发
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        self.results[name] = best
+
+        baseline = self.baselines.get(name)
+        if baseline is not None and not UPDATE:
+            limit = baseline * (1 + TOLERANCE)
+            if best > limit and best - baseline > MIN_REGRESSION_SECONDS:
+                pytest.fail(f"性能退化: {name} 用时 {best * 1000:.1f} ms，"
+                            f"基线 {baseline * 1000:.1f} ms（允许 {limit * 1000:.1f} ms）")
+        return best
+
+    def save(self):
+        baselines = dict(self.baselines)
+        baselines.update({name: round(seconds, 6) for name, seconds in self.results.items()})
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write('\n')
+
+
+_benchmark = Benchmark()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def silent_notifier(tmp_path_factory):
+    """
+    没有机器人的通知器：在创建任何监控器之前替换单例
+
+    否则会读取当前目录（仓库根目录）的 telegram_config.json，
+    部署环境中运行基准测试时状态变化会真的发送到 Telegram，通知耗时也会算进测试时间。
+    """
+    import notifier
+    from notifier import TelegramNotifier
+
+    previous = notifier._notifier_instance
+    instance = TelegramNotifier(str(tmp_path_factory.mktemp('telegram') / 'telegram_config.json'))
+    notifier._notifier_instance = instance
+    yield instance
+    notifier._notifier_instance = previous
+    # 没有创建任何机器人发送队列，即没有发出消息
+    assert not instance.bots and not instance.workers, '基准测试不应发送 Telegram 消息'
+
+
+@pytest.fixture
+def bench(request):
+    """bench(func, rounds=5, setup=None)：计时 func，与该测试的基线比较"""
+    name = request.node.nodeid
+
+    def run(func, rounds=5, setup=None):
+        return _benchmark.run(name, func, rounds, setup)
+
+    return run
+
+
+_monitors = {}
+
+
+@pytest.fixture
+def monitor_fixture(tmp_path_factory):
+    """按规模缓存的监控器：monitor_fixture(size)"""
+    def get(size):
+        if size not in _monitors:
+            _monitors[size] = MonitorFixture(str(tmp_path_factory.mktemp(f"monitor_{size}")), size)
+        fixture = _monitors[size]
+        fixture.reset()
+        return fixture
+    return get
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _benchmark.results:
+        return
+    terminalreporter.section('基准测试')
+    for name, seconds in _benchmark.results.items():
+        baseline = _benchmark.baselines.get(name)
+        line = f"{name:<60} {seconds * 1000:10.2f} ms"
+        if baseline:
+            line += f"   基线 {baseline * 1000:10.2f} ms   {seconds / baseline:5.2f}x"
+        terminalreporter.write_line(line)
+    if UPDATE:
+        _benchmark.save()
+        terminalreporter.write_line(f"💾 基线已更新: {BASELINE_FILE}")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+熔断器 - 苹果订单页面大面积失败时暂停查询，只用少量探测请求判断是否恢复
+
+- closed（正常）：一轮检查中失败比例超过阈值时断开
+- open（熔断）：不再发出请求，冷却时间过后进入探测
+- half_open（探测）：只放行几个探测请求，全部成功则恢复，任一失败重新熔断
+- 只统计后台检查的请求；链接无效等客户端错误不算苹果失败
+"""
+
+import threading
+import time
+
+from concurrency_limiter import OK, THROTTLE_SIGNALS
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+CONNECTION = 'connection'
+# 计入失败比例的结果：苹果限流、出错、超时或连接不上
+UPSTREAM_FAILURES = THROTTLE_SIGNALS | {CONNECTION}
+
+
+class CircuitOpenError(Exception):
+    """熔断中，请求没有发出"""
+
+    def __init__(self, retry_in=None):
+        msg = '苹果订单页面大量失败，已暂停查询'
+        if retry_in:
+            msg += f'（{int(retry_in)} 秒后重试）'
+        super().__init__(msg)
+
+
+class CircuitBreaker:
+    """熔断器"""
+
+    def __init__(self, failure_ratio=0.5, min_samples=20, cooldown=60, probes=3):
+        self.lock = threading.Lock()
+        self.enabled = True
+        self.failure_ratio = failure_ratio
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.probes = probes
+        self.state = CLOSED
+        self.total = 0          # 本轮检查的请求数
+        self.failures = 0       # 本轮检查的失败数
+        self.opened_at = None
+        self.probes_started = 0
+        self.probes_succeeded = 0
+        self.trips = 0
+        self.last_reason = None
+        self.on_change = None   # 状态变化回调 (state, reason)
+
+    def configure(self, enabled=True, failure_ratio=None, min_samples=None, cooldown=None, probes=None):
+        with self.lock:
+            self.enabled = enabled
+            if not enabled:
+                self.state = CLOSED
+            if failure_ratio is not None:
+                self.failure_ratio = failure_ratio
+            if min_samples is not None:
+                self.min_samples = max(1, int(min_samples))
+            if cooldown is not None:
+                self.cooldown = cooldown
+            if probes is not None:
+                self.probes = max(1, int(probes))
+
+    def begin_sweep(self):
+        """一轮检查开始，重新统计失败比例"""
+        with self.lock:
+            self.total = 0
+            self.failures = 0
+
+    def retry_in(self):
+        """熔断中时距离开始探测的秒数，否则为 0"""
+        with self.lock:
+            if self.state != OPEN:
+                return 0
+            return max(0, self.opened_at + self.cooldown - time.time())
+
+    def sweep_budget(self, count):
+        """本轮检查可以查询的订单数：正常时全部，熔断冷却中为 0，探测时只查询几个"""
+        with self.lock:
+            if not self.enabled or self.state == CLOSED:
+                return count
+            if self.state == OPEN and time.time() < self.opened_at + self.cooldown:
+                return 0
+            return min(count, self.probes)
+
+    def allow(self):
+        """是否可以发出请求（探测阶段会占用一个探测名额）"""
+        with self.lock:
+            if not self.enabled or self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.time() < self.opened_at + self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self.probes_started = 0
+                self.probes_succeeded = 0
+            if self.probes_started >= self.probes:
+                return False
+            self.probes_started += 1
+            return True
+
+    def record_outcome(self, outcome):
+        """按抓取结果记录：其他失败（链接无效等）不计入，探测时归还探测名额"""
+        if outcome == OK or outcome in UPSTREAM_FAILURES:
+            self.record(outcome == OK, outcome)
+            return
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes_started > self.probes_succeeded:
+                self.probes_started -= 1
+
+    def record(self, success, reason=None):
+        """记录一次请求的结果"""
+        changed = None
+        with self.lock:
+            if not self.enabled:
+                return
+            if self.state == HALF_OPEN:
+                if not success:
+                    changed = self._open(f'探测失败: {reason}')
+                else:
+                    self.probes_succeeded += 1
+                    if self.probes_succeeded >= self.probes:
+                        self.state = CLOSED
+                        self.total = 0
+                        self.failures = 0
+                        changed = (CLOSED, f'{self.probes} 个探测请求全部成功')
+            elif self.state == CLOSED:
+                self.total += 1
+                if not success:
+                    self.failures += 1
+                    self.last_reason = reason
+                if (self.total >= self.min_samples and
+                        self.failures / self.total >= self.failure_ratio):
+                    changed = self._open(f'失败 {self.failures}/{self.total}（最近: {reason or self.last_reason}）')
+        if changed and self.on_change:
+            self.on_change(*changed)
+
+    def _open(self, reason):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.trips += 1
+        self.last_reason = reason
+        return (OPEN, reason)
+
+    def get_stats(self):
+        with self.lock:
+            retry_in = 0
+            if self.state == OPEN:
+                retry_in = max(0, int(self.opened_at + self.cooldown - time.time()))
+            return {
+                'enabled': self.enabled,
+                'state': self.state,
+                'degraded': self.state != CLOSED,
+                'failureRatio': round(self.failures / self.total, 3) if self.total else 0,
+                'samples': self.total,
+                'retryIn': retry_in,
+                'trips': self.trips,
+                'lastReason': self.last_reason,
+            }
+
+
+# 单例
+_breaker = None
+_breaker_lock = threading.Lock()
+
+def get_breaker():
+    """获取共享熔断器"""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
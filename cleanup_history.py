@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """清理不在 orders.txt 中的历史记录"""
 
-import json
+from history_store import HistoryStore
 
 # 读取 orders.txt 中的所有订单 URL
 with open('orders.txt', 'r') as f:
@@ -13,11 +13,11 @@ with open('orders.txt', 'r') as f:
 
 print(f'orders.txt 中的订单数: {len(valid_urls)}')
 
-# 读取历史记录
-with open('order_history.json', 'r') as f:
-    data = json.load(f)
+# 读取历史记录（快照 + 日志）
+store = HistoryStore('order_history.json')
+data = store.load()
 
-results = data.get('results', {})
+results = data['results']
 print(f'历史记录中的订单数: {len(results)}')
 
 # 找出不在 orders.txt 中的订单
@@ -34,9 +34,7 @@ if invalid_urls:
     for url in invalid_urls:
         del results[url]
     
-    data['results'] = results
-    with open('order_history.json', 'w') as f:
-        json.dump(data, f, indent=2)
+    store.compact(results, data['changes'], data['last_check_time'], data['check_count'])
     
     print(f'✅ 已删除 {len(invalid_urls)} 个无效订单')
     print(f'剩余订单数: {len(results)}')
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+自适应并发控制 - 按苹果服务器的响应情况调整同时进行的查询数（AIMD）
+
+- 响应正常且延迟没有明显升高：并发上限缓慢增加（每轮约 +1）
+- 403/429/5xx、超时、跳转登录页或页面不完整：并发上限立即减半
+- 其他失败（链接无效、连接失败等）不调整上限
+- 线程引擎和异步引擎共用同一个限制器，只有后台检查（检查和优先通道）经过限制器
+"""
+
+import threading
+import time
+from collections import deque
+
+
+OK = 'ok'
+TIMEOUT = 'timeout'
+# 说明苹果在限流或过载的结果，出现时并发上限减半
+THROTTLE_SIGNALS = {'http_403', 'http_429', 'http_5xx', TIMEOUT, 'signin', 'incomplete'}
+
+# 延迟超过基准延迟的倍数时视为变慢，不再增加并发
+LATENCY_FACTOR = 2.0
+# 变慢时上限乘以的系数；被限流或出错时乘以的系数
+SLOW_DECREASE = 0.9
+THROTTLE_DECREASE = 0.5
+# 两次减小之间至少间隔的秒数（同一批请求的多个失败只减一次）；
+# 收到限流信号后这段时间内也不增加
+DECREASE_COOLDOWN = 1.0
+# 基准延迟的平滑系数
+LATENCY_ALPHA = 0.05
+
+
+def classify_response(status_code, final_url, fields):
+    """根据抓取结果判断是否被限流，返回 OK 或原因"""
+    if status_code in (403, 429):
+        return f'http_{status_code}'
+    if status_code >= 500:
+        return 'http_5xx'
+    if 'signin' in (final_url or '').lower():
+        return 'signin'
+    if fields.get('orderNumber', '-') == '-' or fields.get('status', '-') == '-':
+        return 'incomplete'
+    return OK
+
+
+class AdaptiveLimiter:
+    """AIMD 并发限制器"""
+
+    def __init__(self, initial=10, min_limit=2, max_limit=64):
+        self.cond = threading.Condition()
+        self.enabled = True
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial)
+        self.inflight = 0
+        self.baseline_ms = None       # 正常响应的平滑延迟
+        self.last_decrease = 0
+        self.last_signal = 0           # 最近一次限流/变慢信号的时间
+        self.increases = 0
+        self.decreases = 0
+        self.signals = {}              # {原因: 次数}
+        self.adjustments = deque(maxlen=20)  # 最近的调整记录
+
+    def configure(self, enabled=True, min_limit=None, max_limit=None):
+        with self.cond:
+            self.enabled = enabled
+            if min_limit is not None:
+                self.min_limit = max(1, int(min_limit))
+            if max_limit is not None:
+                self.max_limit = max(self.min_limit, int(max_limit))
+            self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+            self.cond.notify_all()
+
+    def _has_room(self):
+        return not self.enabled or self.inflight < int(self.limit)
+
+    def acquire(self):
+        """取得一个查询名额（已达到上限时阻塞）"""
+        with self.cond:
+            while not self._has_room():
+                self.cond.wait()
+            self.inflight += 1
+
+    def try_acquire(self):
+        """不阻塞地尝试取得名额（异步引擎使用）"""
+        with self.cond:
+            if not self._has_room():
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self, outcome, latency_ms):
+        """归还名额并根据结果调整上限（不是限流信号的失败只归还名额）"""
+        now = time.time()
+        with self.cond:
+            saturated = self.inflight >= int(self.limit)
+            self.inflight -= 1
+            if outcome == OK:
+                self._on_success(latency_ms, saturated, now)
+            elif outcome in THROTTLE_SIGNALS:
+                self.signals[outcome] = self.signals.get(outcome, 0) + 1
+                self.last_signal = now
+                self._decrease(THROTTLE_DECREASE, outcome, now)
+            self.cond.notify_all()
+
+    def _on_success(self, latency_ms, saturated, now):
+        if self.baseline_ms is None:
+            self.baseline_ms = latency_ms
+        slow = latency_ms > self.baseline_ms * LATENCY_FACTOR
+        self.baseline_ms += LATENCY_ALPHA * (latency_ms - self.baseline_ms)
+        if slow:
+            self.signals['slow'] = self.signals.get('slow', 0) + 1
+            self.last_signal = now
+            self._decrease(SLOW_DECREASE, 'slow', now)
+        elif saturated and self.limit < self.max_limit and now - self.last_signal >= DECREASE_COOLDOWN:
+            # 只有名额用满时才增加，避免订单不多时上限虚高
+            before = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if int(self.limit) > before:
+                self.increases += 1
+                self._record(before, int(self.limit), 'healthy', now)
+
+    def _decrease(self, factor, reason, now):
+        if now - self.last_decrease < DECREASE_COOLDOWN or self.limit <= self.min_limit:
+            return
+        before = int(self.limit)
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.last_decrease = now
+        if int(self.limit) < before:
+            self.decreases += 1
+            self._record(before, int(self.limit), reason, now)
+
+    def _record(self, before, after, reason, now):
+        self.adjustments.append({
+            'time': time.strftime('%H:%M:%S', time.localtime(now)),
+            'from': before,
+            'to': after,
+            'reason': reason,
+        })
+
+    def get_stats(self):
+        with self.cond:
+            return {
+                'enabled': self.enabled,
+                'limit': int(self.limit),
+                'inflight': self.inflight,
+                'minLimit': self.min_limit,
+                'maxLimit': self.max_limit,
+                'baselineLatencyMs': round(self.baseline_ms, 1) if self.baseline_ms is not None else None,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'signals': dict(self.signals),
+                'recent': list(self.adjustments),
+            }
+
+
+# 单例
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_limiter(initial=None):
+    """获取共享并发限制器（initial 只在第一次创建时使用）"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveLimiter(initial or 10)
+        return _limiter
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+事件中心 - 把监控数据的变化推送给所有打开的仪表盘（Server-Sent Events）
+"""
+
+import json
+import queue
+import threading
+
+
+class Subscription:
+    """一个仪表盘连接的事件队列"""
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflow = False  # 队列满了（客户端太慢），需要重新发送快照
+
+    def get(self, timeout=None):
+        """取下一条已编码的事件，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """发布/订阅：每条事件只序列化一次，再放入每个订阅者的队列"""
+
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        sub = Subscription(self.max_queue)
+        with self.lock:
+            self.subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            if sub in self.subscribers:
+                self.subscribers.remove(sub)
+
+    def has_subscribers(self):
+        return bool(self.subscribers)
+
+    def publish(self, event, data):
+        """发布事件；没有订阅者时不做任何事"""
+        if not self.subscribers:
+            return
+        payload = encode_event(event, data)
+        with self.lock:
+            self.published += 1
+            for sub in self.subscribers:
+                if sub.overflow:
+                    continue
+                try:
+                    sub.queue.put_nowait(payload)
+                except queue.Full:
+                    # 丢弃增量后客户端状态不再准确，让它断开重连拿新快照
+                    sub.overflow = True
+                    self.dropped += 1
+
+    def get_stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'published': self.published,
+            'dropped': self.dropped,
+        }
+
+
+def encode_event(event, data):
+    """编码为 SSE 格式"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+共享订单抓取客户端 - 所有查询复用同一个 keep-alive 连接池
+"""
+
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from circuit_breaker import CONNECTION, CircuitOpenError, get_breaker
+from concurrency_limiter import OK, TIMEOUT, classify_response, get_limiter
+from order_extractor import StreamingOrderExtractor, extract_order_fields, fingerprint_fields
+from single_flight import SingleFlight
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# 流式读取的块大小
+STREAM_CHUNK_SIZE = 16 * 1024
+# 等待其他调用方进行中的同一订单查询的最长时间（请求超时的倍数，包括对方等待并发名额的时间）
+SHARED_WAIT_FACTOR = 2
+# 提前结束时剩余内容不超过这么多字节就读完再归还连接池（比重新握手便宜），否则断开连接
+STREAM_DRAIN_LIMIT = 64 * 1024
+
+
+# 每个主机实际建立的连接次数（HTTPS 即 TLS 握手次数）
+_connect_lock = threading.Lock()
+_connect_counts = {}
+
+
+def shared_page(page):
+    """复用其他调用方抓取的页面：本次没有读取网络数据"""
+    return dict(page, shared=True, bytesRead=0, earlyExit=False)
+
+
+def _host_key(host, port):
+    return f"{host}:{port}" if port else host
+
+
+def _record_connect(host, port):
+    key = _host_key(host, port)
+    with _connect_lock:
+        _connect_counts[key] = _connect_counts.get(key, 0) + 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        super().connect()
+        _record_connect(self.host, self.port)
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        super().connect()
+        _record_connect(self.host, self.port)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _CountingAdapter(HTTPAdapter):
+    """统计握手次数的连接池适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+class FetchClient:
+    """线程安全的 HTTP 客户端，连接池大小与查询线程数一致"""
+
+    def __init__(self, pool_size=10):
+        self.pool_size = max(1, int(pool_size))
+        self.lock = threading.Lock()
+        self.session = None
+        self.adapter = None
+        self.retired_requests = {}  # 已替换连接池的累计请求数 {host: count}
+        self.flight = SingleFlight()  # 同一订单的并发查询合并 + 短时间结果缓存
+        self.stream_stats = {
+            'queries': 0,       # 订单页面查询次数
+            'earlyExits': 0,    # 提前结束下载的次数
+            'bytesRead': 0,     # 实际读取的字节数（网络传输）
+            'bytesSkipped': 0,  # 提前结束而未下载的字节数（有 Content-Length 时）
+        }
+        self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        # 不在不同订单之间保留 Cookie（与每次新建 Session 的行为一致），
+        # 单次请求内的重定向仍然会携带 Cookie
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        adapter = _CountingAdapter(pool_connections=10, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        self.session = session
+        self.adapter = adapter
+
+    def resize(self, pool_size):
+        """调整连接池大小（线程数变化时调用）"""
+        pool_size = max(1, int(pool_size))
+        with self.lock:
+            if pool_size == self.pool_size:
+                return
+
+            # 保留旧连接池的请求统计
+            for host, count in self._collect_pool_requests().items():
+                self.retired_requests[host] = self.retired_requests.get(host, 0) + count
+
+            old_session = self.session
+            self.pool_size = pool_size
+            self._build_session()
+
+        old_session.close()
+
+    def set_cache_ttl(self, ttl):
+        """设置查询结果的缓存秒数（0 表示只合并进行中的查询）"""
+        self.flight.ttl = max(0, ttl or 0)
+
+    def get(self, url, timeout=30, **kwargs):
+        """GET 请求（自动跟随重定向）"""
+        with self.lock:
+            session = self.session
+        return session.get(url, timeout=timeout, allow_redirects=True, **kwargs)
+
+    def fetch_order(self, url, timeout=30, stream=False, sweep=False):
+        """
+        抓取订单页面并提取订单字段
+
+        stream=True 时分块读取页面，所需字段全部找到后停止解析：剩余内容较少时读完并归还连接，
+        否则断开连接（下次查询需要重新握手）；字段不全时回退为对完整页面的提取。
+
+        sweep=True（后台检查）时同时进行的查询数由自适应并发限制器控制：被限流、超时或页面不完整时自动减少；
+        页面上的手动查询不经过限制器，不会排在检查后面等待。
+        后台检查大面积失败时熔断器断开，检查的请求不再发出，直接抛出 CircuitOpenError；
+        手动查询不受熔断影响，也不计入熔断统计。
+
+        同一订单（按规范化链接）同时只发出一个请求，并发的调用方共享结果；
+        成功的页面缓存 flight.ttl 秒，期间的查询直接复用（返回的页面带 shared=True）。
+
+        Returns:
+            dict: fields, fingerprint, finalUrl, statusCode, bytesRead, earlyExit, elapsedMs
+        """
+        page, shared = self.flight.do(
+            url, lambda: self._guarded_fetch(url, timeout, stream, sweep),
+            cacheable=lambda page: classify_response(page['statusCode'], page['finalUrl'], page['fields']) == OK,
+            wait_timeout=timeout * SHARED_WAIT_FACTOR
+        )
+        return shared_page(page) if shared else page
+
+    def _guarded_fetch(self, url, timeout, stream, sweep):
+        """抓取页面；后台检查经过熔断器和并发限制器"""
+        if not sweep:
+            return self._fetch_order(url, timeout, stream)
+        breaker = get_breaker()
+        if not breaker.allow():
+            raise CircuitOpenError(breaker.retry_in())
+        limiter = get_limiter()
+        limiter.acquire()
+        start = time.time()
+        # 链接无效等客户端错误保持 'error'，不调整并发，也不计入熔断
+        outcome = 'error'
+        try:
+            page = self._fetch_order(url, timeout, stream)
+            outcome = classify_response(page['statusCode'], page['finalUrl'], page['fields'])
+            return page
+        except requests.exceptions.Timeout:
+            outcome = TIMEOUT
+            raise
+        except requests.exceptions.ConnectionError:
+            outcome = CONNECTION
+            raise
+        finally:
+            limiter.release(outcome, (time.time() - start) * 1000)
+            breaker.record_outcome(outcome)
+
+    def _fetch_order(self, url, timeout, stream):
+        start = time.time()
+        with self.lock:
+            session = self.session
+
+        response = session.get(url, timeout=timeout, allow_redirects=True, stream=stream)
+        early_exit = False
+        skipped = 0
+        try:
+            if stream:
+                extractor = StreamingOrderExtractor(response.encoding)
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    if extractor.feed(chunk):
+                        early_exit = True
+                        break
+                # 字段不全时 finish() 会对完整页面重新提取
+                fields = extractor.finish()
+                bytes_read = response.raw.tell()
+                if early_exit:
+                    skipped = self._finish_early(response, bytes_read)
+                    bytes_read = response.raw.tell()
+            else:
+                html = response.text
+                fields = extract_order_fields(html)
+                bytes_read = response.raw.tell() or len(response.content)
+        finally:
+            # 读完的连接归还连接池；提前结束且剩余较多时关闭连接
+            response.close()
+
+        with self.lock:
+            self.stream_stats['queries'] += 1
+            self.stream_stats['earlyExits'] += 1 if early_exit else 0
+            self.stream_stats['bytesRead'] += bytes_read
+            self.stream_stats['bytesSkipped'] += skipped
+
+        return {
+            'fields': fields,
+            'fingerprint': fingerprint_fields(fields),
+            'finalUrl': response.url,
+            'statusCode': response.status_code,
+            'bytesRead': bytes_read,
+            'earlyExit': early_exit,
+            'elapsedMs': int((time.time() - start) * 1000),
+        }
+
+    def _finish_early(self, response, bytes_read):
+        """
+        提前结束解析后处理剩余内容，返回没有下载的字节数
+
+        剩余不超过 STREAM_DRAIN_LIMIT 时读完丢弃，连接可以复用；
+        长度未知或剩余较多时不再下载，由调用方的 response.close() 断开连接。
+        """
+        try:
+            remaining = int(response.headers.get('Content-Length', 0)) - bytes_read
+        except ValueError:
+            return 0
+        if remaining <= 0:
+            return 0
+        if remaining > STREAM_DRAIN_LIMIT:
+            return remaining
+        # 不解压，直接读完剩余内容；读完后连接先归还连接池，之后的 response.close() 不再影响它
+        while response.raw.read(STREAM_CHUNK_SIZE, decode_content=False):
+            pass
+        response.raw.release_conn()
+        return 0
+
+    def _collect_pool_requests(self):
+        """读取当前连接池的请求数，调用方需持有 self.lock"""
+        counts = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue  # 并发时已被淘汰
+            host = _host_key(pool.host, pool.port)
+            counts[host] = counts.get(host, 0) + pool.num_requests
+        return counts
+
+    def get_stats(self):
+        """连接池统计：握手次数（新建连接数）与连接复用次数"""
+        with self.lock:
+            requests_by_host = dict(self.retired_requests)
+            for host, count in self._collect_pool_requests().items():
+                requests_by_host[host] = requests_by_host.get(host, 0) + count
+            pool_size = self.pool_size
+            stream_stats = dict(self.stream_stats)
+        with _connect_lock:
+            connects_by_host = dict(_connect_counts)
+
+        hosts = {}
+        total_handshakes = 0
+        total_requests = 0
+        for host in set(requests_by_host) | set(connects_by_host):
+            handshakes = connects_by_host.get(host, 0)
+            count = requests_by_host.get(host, 0)
+            hosts[host] = {
+                'handshakes': handshakes,
+                'requests': count,
+                'reused': max(0, count - handshakes),
+            }
+            total_handshakes += handshakes
+            total_requests += count
+
+        return {
+            'poolSize': pool_size,
+            'handshakes': total_handshakes,
+            'requests': total_requests,
+            'reused': max(0, total_requests - total_handshakes),
+            'hosts': hosts,
+            'stream': stream_stats,
+            'singleFlight': self.flight.get_stats(),
+        }
+
+
+# 单例
+_client = None
+_client_lock = threading.Lock()
+
+def get_fetch_client(pool_size=None):
+    """获取共享抓取客户端，传入 pool_size 时按需调整连接池大小"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FetchClient(pool_size or 10)
+            return _client
+    if pool_size:
+        _client.resize(pool_size)
+    return _client
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+订单历史存储 - 快照 + 追加日志
+
+- 快照: order_history.json（与原来的格式相同，旧文件可直接读取）
+- 日志: order_history.json.journal，每行一条 JSON 变更记录
+  每次保存只追加变化的订单，日志超过一定长度后合并进快照
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+
+# 快照中保留的状态变更记录条数
+MAX_CHANGES = 100
+
+
+class HistoryStore:
+    """
+    日志操作:
+        {"op": "put", "url": ..., "result": {...}}   新增/更新订单结果
+        {"op": "del", "url": ...}                     删除订单结果
+        {"op": "clear"}                               清空所有结果
+        {"op": "change", "change": {...}}             追加状态变更记录
+        {"op": "drop_changes", "url": ...}            删除某个订单的状态变更记录
+        {"op": "meta", "last_check_time": ..., "check_count": ...}
+    每条记录带递增的 seq，快照记录已合并的最大 seq，重放时跳过已合并的记录。
+    """
+
+    def __init__(self, snapshot_file='order_history.json', journal_file=None, compact_min=1000):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or snapshot_file + '.journal'
+        self.compact_min = compact_min
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.journal_ops = 0  # 日志中尚未合并的记录数
+
+    def load(self):
+        """读取快照并重放日志，返回完整状态"""
+        state = {
+            'results': {},
+            'changes': [],
+            'last_check_time': None,
+            'check_count': 0,
+        }
+        snapshot_seq = 0
+
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if 'results' in data:
+                state['results'] = data.get('results', {})
+                state['changes'] = data.get('changes', [])
+                state['last_check_time'] = data.get('last_check_time')
+                state['check_count'] = data.get('check_count', 0)
+                snapshot_seq = data.get('journal_seq', 0)
+            else:
+                # 更早的格式：整个文件就是 {url: result}
+                state['results'] = data
+
+        max_seq = snapshot_seq
+        applied = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue  # 崩溃时写了一半的行
+                    seq = op.get('seq', 0)
+                    if seq <= snapshot_seq:
+                        continue
+                    self._apply(state, op)
+                    max_seq = max(max_seq, seq)
+                    applied += 1
+
+        state['changes'] = state['changes'][-MAX_CHANGES:]
+        with self.lock:
+            self.seq = max_seq
+            self.journal_ops = applied
+        return state
+
+    def _apply(self, state, op):
+        kind = op.get('op')
+        if kind == 'put':
+            state['results'][op['url']] = op['result']
+        elif kind == 'del':
+            state['results'].pop(op['url'], None)
+        elif kind == 'clear':
+            state['results'].clear()
+        elif kind == 'change':
+            state['changes'].append(op['change'])
+        elif kind == 'drop_changes':
+            state['changes'] = [c for c in state['changes'] if c.get('url') != op['url']]
+        elif kind == 'meta':
+            state['last_check_time'] = op.get('last_check_time')
+            state['check_count'] = op.get('check_count', 0)
+
+    def append(self, ops):
+        """追加日志记录（写入后 fsync）"""
+        if not ops:
+            return
+        with self.lock:
+            lines = []
+            for op in ops:
+                self.seq += 1
+                op['seq'] = self.seq
+                lines.append(json.dumps(op, ensure_ascii=False))
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_ops += len(ops)
+
+    def needs_compaction(self, result_count):
+        """日志长度超过订单数（且不少于 compact_min）时需要合并，保证写入开销均摊为 O(1)"""
+        return self.journal_ops > max(self.compact_min, result_count)
+
+    def current_seq(self):
+        """已写入日志的最大 seq（合并时要在取状态快照之前读取）"""
+        with self.lock:
+            return self.seq
+
+    def compact(self, results, changes, last_check_time=None, check_count=0, upto_seq=None):
+        """把完整状态写成快照（临时文件 + 重命名），然后从日志中去掉已合并的记录
+
+        upto_seq 是取状态快照之前的 seq：在那之后追加的记录不一定在快照里，
+        留在日志中，重放时再补上（不传则认为快照包含全部记录）
+        """
+        with self.lock:
+            if upto_seq is None:
+                upto_seq = self.seq
+            data = {
+                'results': results,
+                'changes': changes[-MAX_CHANGES:],
+                'last_check_time': last_check_time,
+                'check_count': check_count,
+                'last_save': datetime.now().isoformat(),
+                'journal_seq': upto_seq,
+            }
+            tmp_file = self.snapshot_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+
+            kept = []
+            if upto_seq < self.seq and os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            op = json.loads(line)
+                        except ValueError:
+                            continue
+                        if op.get('seq', 0) > upto_seq:
+                            kept.append(line.rstrip('\n'))
+
+            if kept:
+                # 快照之后追加的记录保留下来（同样先写临时文件再替换，崩溃时旧日志仍完整）
+                tmp_file = self.journal_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(kept) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.journal_file)
+            else:
+                # 快照已包含全部记录，日志可以清空
+                with open(self.journal_file, 'w', encoding='utf-8'):
+                    pass
+            self.journal_ops = len(kept)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Web 服务压力测试 - 并发请求 /api/query，同时探测仪表盘接口的响应延迟
+
+用法:
+    python load_test.py --order-url https://www.apple.com/xc/us/vieworder/W123/a@b.com
+    python load_test.py --base http://127.0.0.1:8846 --concurrency 20 --requests 200
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def report(name, latencies, errors, elapsed=None):
+    line = (f"  {name:<22} 请求 {len(latencies) + errors:>5}  失败 {errors:>4}  "
+            f"p50 {percentile(latencies, 50) * 1000:8.1f} ms  "
+            f"p99 {percentile(latencies, 99) * 1000:8.1f} ms  "
+            f"max {max(latencies, default=0) * 1000:8.1f} ms")
+    if elapsed:
+        line += f"  {len(latencies) / elapsed:6.1f} 个/秒"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web 服务压力测试')
+    parser.add_argument('--base', default='http://127.0.0.1:8846', help='服务地址')
+    parser.add_argument('--order-url', default='https://www.apple.com/xc/us/vieworder/W0000000000/test@example.com',
+                        help='用于 /api/query 的订单链接')
+    parser.add_argument('--concurrency', type=int, default=10, help='并发请求数')
+    parser.add_argument('--requests', type=int, default=100, help='/api/query 请求总数')
+    parser.add_argument('--probe-interval', type=float, default=0.2, help='仪表盘探测间隔（秒）')
+    args = parser.parse_args()
+
+    local = threading.local()
+
+    def get_session():
+        # 每个线程一个 Session，复用 keep-alive 连接
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    query_latencies = []
+    query_errors = [0]
+    lock = threading.Lock()
+
+    def query_once(_):
+        start = time.perf_counter()
+        try:
+            response = get_session().post(f"{args.base}/api/query", json={'url': args.order_url}, timeout=120)
+            response.raise_for_status()
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                query_latencies.append(elapsed)
+            else:
+                query_errors[0] += 1
+
+    # 后台探测仪表盘接口，观察慢查询期间其他请求是否被阻塞
+    probe_latencies = []
+    probe_errors = [0]
+    stop = threading.Event()
+
+    def probe():
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                session.get(f"{args.base}/api/monitor/status", timeout=60).raise_for_status()
+                probe_latencies.append(time.perf_counter() - start)
+            except Exception:
+                probe_errors[0] += 1
+            stop.wait(args.probe_interval)
+
+    print(f"🚀 {args.base}  并发 {args.concurrency}  请求 {args.requests}")
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    probe_thread.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(query_once, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    probe_thread.join()
+
+    print(f"⏱ 总耗时 {elapsed:.1f} 秒")
+    report('POST /api/query', query_latencies, query_errors[0], elapsed)
+    report('GET /api/monitor/status', probe_latencies, probe_errors[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,15 @@
 苹果订单监控模块 - 自动检测状态变化并发送邮件提醒
 """
 
-import re
-import requests
 import json
 import time
 import os
 from datetime import datetime
 from threading import Thread, Event
 from notifier import get_notifier
+from fetch_client import get_fetch_client
 from order_loader import load_orders_from_file
+from history_store import HistoryStore
 
 
 class OrderMonitor:
@@ -36,6 +36,7 @@ class OrderMonitor:
         
         # 订单历史状态 {url: {'status': 'xxx', 'last_check': 'xxx', 'history': []}}
         self.order_history = {}
+        self.history_store = HistoryStore(self.data_file)
         
         self.load_config()
         self.load_history()
@@ -65,27 +66,26 @@ class OrderMonitor:
     
     def load_history(self):
         """加载订单历史（兼容 web_monitor 的数据格式）"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 兼容 web_monitor 的格式 {results: ..., changes: ...}
-                    if 'results' in data:
-                        self.order_history = data['results']
-                    else:
-                        self.order_history = data
-            except Exception as e:
-                print(f"加载历史失败: {e}")
+        try:
+            self.order_history = self.history_store.load()['results']
+        except Exception as e:
+            print(f"加载历史失败: {e}")
 
     def save_history(self):
-        """保存订单历史（使用与 web_monitor 兼容的格式）"""
+        """保存完整订单历史快照（使用与 web_monitor 兼容的格式）"""
+        try:
+            self.history_store.compact(self.order_history, [])
+            return True
+        except Exception as e:
+            print(f"保存历史失败: {e}")
+            return False
+
+    def save_order_history(self, url):
+        """只追加单个订单的变化，日志过长时合并为快照"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'results': self.order_history,
-                    'changes': [],
-                    'last_save': datetime.now().isoformat()
-                }, f, ensure_ascii=False, indent=2)
+            self.history_store.append([{'op': 'put', 'url': url, 'result': self.order_history[url]}])
+            if self.history_store.needs_compaction(len(self.order_history)):
+                self.save_history()
             return True
         except Exception as e:
             print(f"保存历史失败: {e}")
@@ -99,15 +99,7 @@ class OrderMonitor:
     def query_order(self, url, timeout=30):
         """查询单个订单"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-            }
-            
-            session = requests.Session()
-            response = session.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-            html = response.text
+            page = get_fetch_client().fetch_order(url, timeout=timeout)
             
             result = {
                 'success': True,
@@ -120,34 +112,9 @@ class OrderMonitor:
                 'timestamp': datetime.now().isoformat()
             }
             
-            # 提取订单号
-            order_match = re.search(r'"orderNumber"\s*:\s*"([^"]+)"', html)
-            if order_match:
-                result['orderNumber'] = order_match.group(1)
-            
-            # 提取下单日期
-            order_date_match = re.search(r'"orderPlacedDate"\s*:\s*"([^"]+)"', html)
-            if order_date_match:
-                result['orderDate'] = order_date_match.group(1)
-            
-            # 提取产品名称
-            product_match = re.search(r'"productName"\s*:\s*"([^"]+)"', html)
-            if product_match:
-                result['productName'] = product_match.group(1)
-            
-            # 提取状态 (使用 currentStatus)
-            status_match = re.search(r'"currentStatus"\s*:\s*"([^"]+)"', html)
-            if status_match:
-                result['status'] = status_match.group(1)
-            else:
-                status_match = re.search(r'"statusDescription"\s*:\s*"([^"]+)"', html)
-                if status_match:
-                    result['status'] = status_match.group(1)
-            
-            # 提取配送日期
-            delivery_match = re.search(r'"deliveryDate"\s*:\s*"([^"]+)"', html)
-            if delivery_match:
-                result['deliveryDate'] = delivery_match.group(1)
+            fields = page['fields']
+            for key in ('orderNumber', 'orderDate', 'productName', 'status', 'deliveryDate'):
+                result[key] = fields[key]
             
             return result
             
@@ -225,7 +192,7 @@ class OrderMonitor:
                 'orderNumber': result.get('orderNumber'),
                 'productName': result.get('productName'),
             }
-            self.save_history()
+            self.save_order_history(url)
             
             # 状态变更或首次查询到取消状态时发送通知
             should_send = False
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+通知发件箱 - 状态变更通知先持久化，再由后台投递，进程重启后继续发送
+
+- 文件: notification_outbox.jsonl，每行一条 JSON 记录（追加写入后 fsync）
+- 每次状态变化对每个机器人只投递一次：变化用 (旧状态, 旧状态开始的时间, 新状态) 标识，
+  崩溃重启后重新检测到的同一变化会被跳过，订单以后再次变成同一状态仍会通知
+- 已投递的记录保留 DELIVERED_TTL 秒，删除订单时一并删除
+- Telegram 拒绝（4xx，429 除外）的通知重试 MAX_REJECTS 次后放弃
+- 已完成的记录超过一定数量后整体重写（临时文件 + 重命名）
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+
+# 已投递记录的保留秒数（只需覆盖崩溃到下次保存历史之间重复检测到的变化）
+DELIVERED_TTL = 7 * 24 * 3600
+# 被 Telegram 拒绝（如 chat not found）的通知最多投递次数
+MAX_REJECTS = 3
+
+
+def transition_id(old_status, since, new_status):
+    """一次状态变化的标识：since 为旧状态开始的时间（首次查询时为空）"""
+    return f"{old_status or ''}@{since or ''}>{new_status}"
+
+
+class NotificationOutbox:
+    """
+    记录:
+        {"op": "add", "entry": {...}}          新通知，entry['bots'] 为待投递的机器人 id
+        {"op": "sent", "id": ..., "bot": ..., "time": ...}  已投递到某个机器人
+        {"op": "drop", "id": ..., "bot": ...}  不再投递（机器人已删除或通知被拒绝）
+        {"op": "forget", "urls": [...]}        订单已删除，清除它的通知和投递记录
+        {"op": "delivered", "keys": [...]}     合并后保留的已投递组合 [url, transition, bot, time]
+    """
+
+    def __init__(self, filepath='notification_outbox.jsonl', compact_min=500):
+        self.filepath = filepath
+        self.compact_min = compact_min
+        self.lock = threading.Lock()
+        self.entries = {}       # {id: entry}，entry['pending'] 为尚未投递的机器人集合
+        self.pending_keys = {}  # {(url, transition, bot): id}
+        self.delivered = {}     # {(url, transition, bot): 投递时间}
+        self.rejects = {}       # {(id, bot): 被拒绝次数}，只在内存中计数
+        self.ops = 0            # 文件中的记录数
+        self.load()
+
+    def load(self):
+        """读取发件箱文件，恢复未投递的通知"""
+        if not os.path.exists(self.filepath):
+            return
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的行
+                self._apply(op)
+                self.ops += 1
+        self._prune(time.time())
+
+    @staticmethod
+    def _key(entry, bot_id):
+        # 旧版本的记录没有 transition，按新状态去重
+        return (entry['url'], entry.get('transition', entry['newStatus']), bot_id)
+
+    def _apply(self, op):
+        kind = op.get('op')
+        if kind == 'add':
+            entry = op['entry']
+            entry['pending'] = set(entry['bots'])
+            self.entries[entry['id']] = entry
+            for bot_id in entry['pending']:
+                self.pending_keys[self._key(entry, bot_id)] = entry['id']
+        elif kind in ('sent', 'drop'):
+            entry = self.entries.get(op['id'])
+            if entry is None:
+                return
+            bot_id = op['bot']
+            key = self._key(entry, bot_id)
+            entry['pending'].discard(bot_id)
+            self.pending_keys.pop(key, None)
+            self.rejects.pop((entry['id'], bot_id), None)
+            if kind == 'sent':
+                self.delivered[key] = op.get('time') or time.time()
+            if not entry['pending']:
+                del self.entries[entry['id']]
+        elif kind == 'forget':
+            urls = set(op['urls'])
+            for entry_id in [entry_id for entry_id, entry in self.entries.items() if entry['url'] in urls]:
+                del self.entries[entry_id]
+            self.pending_keys = {key: entry_id for key, entry_id in self.pending_keys.items() if key[0] not in urls}
+            self.delivered = {key: sent for key, sent in self.delivered.items() if key[0] not in urls}
+        elif kind == 'delivered':
+            now = time.time()
+            for key in op['keys']:
+                # 旧版本为 [url, status, bot]，没有投递时间
+                sent = key[3] if len(key) > 3 else now
+                self.delivered[tuple(key[:3])] = sent
+
+    def _prune(self, now):
+        """删除超过保留时间的已投递记录"""
+        self.delivered = {key: sent for key, sent in self.delivered.items() if now - sent < DELIVERED_TTL}
+
+    def _append(self, ops):
+        lines = ''.join(json.dumps(op, ensure_ascii=False) + '\n' for op in ops)
+        with open(self.filepath, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.ops += len(ops)
+
+    def add(self, result, old_status, bot_ids, since=None):
+        """
+        记录一条状态变更通知（写入磁盘后才返回）
+
+        since 为旧状态开始的时间，与新旧状态一起标识这次变化；
+        同一变化已投递或正在等待投递的机器人会被跳过，所有机器人都已覆盖时返回 None。
+        """
+        url = result.get('url')
+        status = result.get('status')
+        transition = transition_id(old_status, since, status)
+        with self.lock:
+            bots = [bot_id for bot_id in bot_ids
+                    if (url, transition, bot_id) not in self.delivered
+                    and (url, transition, bot_id) not in self.pending_keys]
+            if not bots:
+                return None
+            entry = {
+                'id': uuid.uuid4().hex,
+                'url': url,
+                'transition': transition,
+                'newStatus': status,
+                'oldStatus': old_status,
+                'result': result,
+                'bots': bots,
+                'created': time.time(),
+            }
+            self._append([{'op': 'add', 'entry': dict(entry)}])
+            self._apply({'op': 'add', 'entry': entry})
+            return entry
+
+    def mark_sent(self, entry_ids, bot_id):
+        """记录已投递到某个机器人"""
+        self._mark('sent', entry_ids, bot_id, time=time.time())
+
+    def drop(self, entry_ids, bot_id):
+        """放弃投递到某个机器人（机器人已删除）"""
+        self._mark('drop', entry_ids, bot_id)
+
+    def reject(self, entry_ids, bot_id):
+        """
+        记录 Telegram 拒绝了通知（不可重试的错误），达到 MAX_REJECTS 次后放弃投递
+
+        Returns:
+            list: 放弃投递的通知 id
+        """
+        dropped = []
+        with self.lock:
+            for entry_id in entry_ids:
+                key = (entry_id, bot_id)
+                self.rejects[key] = self.rejects.get(key, 0) + 1
+                if self.rejects[key] >= MAX_REJECTS:
+                    dropped.append(entry_id)
+        if dropped:
+            self.drop(dropped, bot_id)
+        return dropped
+
+    def forget(self, urls):
+        """订单已删除：清除未投递的通知和已投递记录，重新添加后按新订单通知"""
+        urls = set(urls)
+        with self.lock:
+            known = (any(entry['url'] in urls for entry in self.entries.values()) or
+                     any(key[0] in urls for key in self.delivered))
+            if not known:
+                return
+            op = {'op': 'forget', 'urls': sorted(urls)}
+            self._append([op])
+            self._apply(op)
+            self._maybe_compact()
+
+    def _mark(self, kind, entry_ids, bot_id, **fields):
+        with self.lock:
+            ops = [dict({'op': kind, 'id': entry_id, 'bot': bot_id}, **fields) for entry_id in entry_ids
+                   if entry_id in self.entries and bot_id in self.entries[entry_id]['pending']]
+            if not ops:
+                return
+            self._append(ops)
+            for op in ops:
+                self._apply(op)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.ops > max(self.compact_min, 2 * (len(self.entries) + 1)):
+            self._compact()
+
+    def pending(self):
+        """未投递的通知 [(entry, bot_id)]，按创建时间排序"""
+        with self.lock:
+            entries = sorted(self.entries.values(), key=lambda e: e['created'])
+            return [(entry, bot_id) for entry in entries for bot_id in sorted(entry['pending'])]
+
+    def is_pending(self, entry_id, bot_id):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            return entry is not None and bot_id in entry['pending']
+
+    def _compact(self):
+        """只保留未投递的通知和未过期的已投递组合，重写文件"""
+        self._prune(time.time())
+        ops = [{'op': 'delivered', 'keys': [list(key) + [sent] for key, sent in self.delivered.items()]}]
+        for entry in self.entries.values():
+            data = {k: v for k, v in entry.items() if k != 'pending'}
+            data['bots'] = sorted(entry['pending'])
+            ops.append({'op': 'add', 'entry': data})
+        tmp_file = self.filepath + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(op, ensure_ascii=False) + '\n' for op in ops))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.filepath)
+        self.ops = len(ops)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'pending': sum(len(entry['pending']) for entry in self.entries.values()),
+                'delivered': len(self.delivered),
+            }
@@ -4,11 +4,231 @@
 """
 
 import requests
+import heapq
+import html
+import itertools
 import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
+from functools import partial
 import uuid
 
+from notification_outbox import NotificationOutbox
+
+
+TELEGRAM_API = 'https://api.telegram.org'
+
+# Telegram 限速：同一个聊天约每秒 1 条，同一个机器人 token 约每秒 30 条
+CHAT_RATE = 1.0
+CHAT_BURST = 1
+TOKEN_RATE = 30.0
+TOKEN_BURST = 30
+# 网络错误、5xx 等临时错误的最大重试次数和首次退避秒数（429 按 retry_after 一直重试）
+MAX_SEND_RETRIES = 5
+RETRY_BACKOFF = 2.0
+
+# Telegram 单条消息最大长度（按 UTF-16 码元计算，emoji 等占 2 个）
+TELEGRAM_MAX_LENGTH = 4096
+# 拆分 HTML 消息时不能切开的片段：标签、实体、单个字符
+HTML_TOKEN_RE = re.compile(r'<[^>]*>|&[^;\s]*;|.', re.S)
+# 汇总消息中各状态的排列顺序
+DIGEST_STATUS_ORDER = ['SHIPPED', 'DELIVERED', 'PREPARED_FOR_SHIPMENT', 'PROCESSING', 'PLACED']
+
+# 发件箱中发送失败的通知多久后重新投递（秒）
+OUTBOX_RETRY_INTERVAL = 60
+
+# 发送优先级：数值越小越先发送
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+
+
+class TokenBucket:
+    """令牌桶：rate 个/秒，最多积累 burst 个"""
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+        self.blocked_until = 0  # 收到 429 后在 retry_after 之前不再发送
+    
+    def delay(self, now):
+        """还需等待多少秒才能取到一个令牌"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+
+class RateLimiter:
+    """按聊天和按机器人 token 的令牌桶（多个机器人共用同一个 token 时共享限额）"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+    
+    def _bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if key[0] == 'chat':
+                bucket = TokenBucket(CHAT_RATE, CHAT_BURST)
+            else:
+                bucket = TokenBucket(TOKEN_RATE, TOKEN_BURST)
+            self.buckets[key] = bucket
+        return bucket
+    
+    def acquire(self, bot_token, chat_id):
+        """尝试取得发送许可：返回 0 表示已取得，否则返回需要等待的秒数"""
+        keys = (('token', bot_token), ('chat', bot_token, str(chat_id)))
+        now = time.time()
+        with self.lock:
+            buckets = [self._bucket(key) for key in keys]
+            wait = max(bucket.delay(now) for bucket in buckets)
+            if wait > 0:
+                return wait
+            for bucket in buckets:
+                bucket.tokens -= 1
+            return 0
+    
+    def block(self, bot_token, chat_id, retry_after):
+        """收到 429：该聊天在 retry_after 秒内不再发送"""
+        until = time.time() + retry_after
+        with self.lock:
+            bucket = self._bucket(('chat', bot_token, str(chat_id)))
+            bucket.blocked_until = max(bucket.blocked_until, until)
+            bucket.tokens = min(bucket.tokens, 0)
+
+
+class BotWorker:
+    """
+    单个机器人的发送队列 - 后台线程按优先级发送
+    
+    每个机器人一个队列和线程：某个机器人很慢或被阻塞时，不影响其他机器人和调用方。
+    发送速度受令牌桶限制；429 时按 retry_after 等待后重发，紧急消息（CANCELED）排在最前面。
+    """
+    
+    def __init__(self, notifier, bot_id):
+        self.notifier = notifier
+        self.bot_id = bot_id
+        self.cond = threading.Condition()
+        self.ready = []    # [(priority, seq, item)]
+        self.delayed = []  # [(ready_at, seq, priority, item)] 等待退避的消息
+        self.seq = itertools.count()
+        self.session = requests.Session()  # 复用到 api.telegram.org 的连接
+        self.stats = {
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'rateLimited': 0,
+            'retries': 0,
+            'lastLatencyMs': None,
+            'avgLatencyMs': None,
+            'maxLatencyMs': 0,
+            'lastError': None,
+        }
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f'notify-{bot_id[:8]}')
+        self.thread.start()
+    
+    def submit(self, text, parse_mode, urgent=False):
+        """加入发送队列，返回 Future，结果为 (success, msg, retryable)，retryable 表示失败后能否再次投递"""
+        future = Future()
+        item = {'text': text, 'parse_mode': parse_mode, 'future': future, 'attempts': 0}
+        priority = PRIORITY_URGENT if urgent else PRIORITY_NORMAL
+        with self.cond:
+            heapq.heappush(self.ready, (priority, next(self.seq), item))
+            self.cond.notify()
+        return future
+    
+    def _next(self):
+        """取出下一条可以发送的消息（阻塞）"""
+        with self.cond:
+            while True:
+                now = time.time()
+                while self.delayed and self.delayed[0][0] <= now:
+                    _, seq, priority, item = heapq.heappop(self.delayed)
+                    heapq.heappush(self.ready, (priority, seq, item))
+                if self.ready:
+                    return heapq.heappop(self.ready)
+                timeout = self.delayed[0][0] - now if self.delayed else None
+                self.cond.wait(timeout)
+    
+    def _requeue(self, entry, delay=0):
+        priority, seq, item = entry
+        with self.cond:
+            if delay > 0:
+                heapq.heappush(self.delayed, (time.time() + delay, seq, priority, item))
+            else:
+                heapq.heappush(self.ready, entry)
+            self.cond.notify()
+    
+    def _run(self):
+        limiter = self.notifier.rate_limiter
+        while True:
+            entry = self._next()
+            item = entry[2]
+            # 发送时再读取配置：排队期间机器人可能被修改、停用或删除
+            bot = self.notifier.get_bot(self.bot_id)
+            if not bot or not bot.get('enabled', True):
+                self.stats['dropped'] += 1
+                item['future'].set_result((False, '机器人已停用或删除', True))
+                continue
+            
+            # 限速：放回队列再等待，等待期间新来的紧急消息可以插到前面
+            wait = limiter.acquire(bot['bot_token'], bot['chat_id'])
+            if wait > 0:
+                self._requeue(entry)
+                time.sleep(min(wait, 1.0))
+                continue
+            
+            start = time.time()
+            try:
+                success, msg, retry_after, retryable = self.notifier._post_to_bot(
+                    bot['bot_token'], bot['chat_id'], item['text'], item['parse_mode'], session=self.session)
+            except Exception as e:
+                success, msg, retry_after, retryable = False, f"请求失败: {str(e)}", None, True
+            latency_ms = (time.time() - start) * 1000
+            
+            if retry_after is not None:
+                # 429：按 Telegram 要求的时间暂停该聊天，消息保留原位置重发
+                self.stats['rateLimited'] += 1
+                print(f"⏳ Telegram 限速 ({bot['name']})，{retry_after} 秒后重发")
+                limiter.block(bot['bot_token'], bot['chat_id'], retry_after)
+                self._requeue(entry)
+                continue
+            
+            if not success and retryable and item['attempts'] < MAX_SEND_RETRIES:
+                item['attempts'] += 1
+                self.stats['retries'] += 1
+                self._requeue(entry, RETRY_BACKOFF * (2 ** (item['attempts'] - 1)))
+                continue
+            
+            self._record(success, msg, latency_ms)
+            item['future'].set_result((success, msg, retryable))
+    
+    def _record(self, success, msg, latency_ms):
+        stats = self.stats
+        if success:
+            stats['sent'] += 1
+        else:
+            stats['failed'] += 1
+            stats['lastError'] = msg
+        count = stats['sent'] + stats['failed']
+        avg = stats['avgLatencyMs'] or 0
+        stats['avgLatencyMs'] = round(avg + (latency_ms - avg) / count, 1)
+        stats['lastLatencyMs'] = round(latency_ms, 1)
+        stats['maxLatencyMs'] = round(max(stats['maxLatencyMs'], latency_ms), 1)
+    
+    def get_stats(self):
+        with self.cond:
+            depth = len(self.ready) + len(self.delayed)
+        return dict(self.stats, queueDepth=depth)
+
 
 class TelegramNotifier:
     """Telegram 通知器 - 支持多机器人"""
@@ -16,6 +236,20 @@ class TelegramNotifier:
     def __init__(self, config_file='telegram_config.json'):
         self.config_file = config_file
         self.bots = []  # 机器人列表
+        self.workers = {}  # {bot_id: BotWorker}
+        self.workers_lock = threading.Lock()
+        self.rate_limiter = RateLimiter()
+        # 汇总模式（由监控器开启）
+        self.digest_enabled = False
+        self.digest_window = 0
+        self.digest_batches = 0  # 进行中的检查轮数
+        self.digest_items = []   # [entry]，entry 含 result、oldStatus（启用发件箱时还有 id）
+        self.digest_timer = None
+        self.digest_lock = threading.Lock()
+        # 持久化发件箱（由监控器开启）
+        self.outbox = None
+        self.outbox_inflight = set()  # 已放入发送队列、等待结果的 (entry_id, bot_id)
+        self.outbox_lock = threading.Lock()
         self.load_config()
     
     def load_config(self):
@@ -108,6 +342,32 @@ class TelegramNotifier:
         """获取启用的机器人列表"""
         return [b for b in self.bots if b.get('enabled', True)]
     
+    def get_bot(self, bot_id):
+        """按 id 获取机器人配置"""
+        for bot in self.bots:
+            if bot['id'] == bot_id:
+                return bot
+        return None
+    
+    def _get_worker(self, bot_id):
+        with self.workers_lock:
+            worker = self.workers.get(bot_id)
+            if worker is None:
+                worker = BotWorker(self, bot_id)
+                self.workers[bot_id] = worker
+            return worker
+    
+    def get_dispatch_stats(self):
+        """各机器人发送队列的统计（队列长度、发送延迟等）"""
+        stats = []
+        for bot_id, worker in list(self.workers.items()):
+            bot = self.get_bot(bot_id)
+            item = worker.get_stats()
+            item['id'] = bot_id
+            item['name'] = bot['name'] if bot else '(已删除)'
+            stats.append(item)
+        return stats
+    
     def test_connection(self, bot_token=None, chat_id=None):
         """测试连接"""
         # 如果提供了参数，测试指定的机器人
@@ -128,7 +388,7 @@ class TelegramNotifier:
             return False, "配置不完整"
         
         try:
-            url = f"https://api.telegram.org/bot{bot_token}/getMe"
+            url = f"{TELEGRAM_API}/bot{bot_token}/getMe"
             response = requests.get(url, timeout=10)
             data = response.json()
             
@@ -141,8 +401,14 @@ class TelegramNotifier:
         except Exception as e:
             return False, f"请求失败: {str(e)}"
     
-    def send_message(self, text, parse_mode='HTML', bot_token=None, chat_id=None):
-        """发送文本消息"""
+    def send_message(self, text, parse_mode='HTML', bot_token=None, chat_id=None, wait=False, urgent=False):
+        """
+        发送文本消息
+        
+        发送给所有启用的机器人时，消息放入每个机器人各自的队列后立即返回；
+        wait=True 时等待所有机器人发送完成（各机器人并行发送）再返回结果。
+        urgent=True 的消息在队列中排在普通消息前面。
+        """
         # 如果指定了机器人，只发送给该机器人
         if bot_token and chat_id:
             return self._send_to_bot(bot_token, chat_id, text, parse_mode)
@@ -152,9 +418,13 @@ class TelegramNotifier:
         if not enabled_bots:
             return False, "没有启用的机器人"
         
+        futures = [(bot, self._get_worker(bot['id']).submit(text, parse_mode, urgent)) for bot in enabled_bots]
+        if not wait:
+            return True, f"已加入 {len(futures)} 个机器人的发送队列"
+        
         results = []
-        for bot in enabled_bots:
-            success, msg = self._send_to_bot(bot['bot_token'], bot['chat_id'], text, parse_mode)
+        for bot, future in futures:
+            success, msg, _ = future.result()
             results.append({
                 'bot_name': bot['name'],
                 'success': success,
@@ -168,13 +438,24 @@ class TelegramNotifier:
         else:
             return False, "所有机器人发送失败"
     
-    def _send_to_bot(self, bot_token, chat_id, text, parse_mode='HTML'):
+    def _send_to_bot(self, bot_token, chat_id, text, parse_mode='HTML', session=None):
         """发送消息到单个机器人"""
+        success, msg, _, _ = self._post_to_bot(bot_token, chat_id, text, parse_mode, session)
+        return success, msg
+    
+    def _post_to_bot(self, bot_token, chat_id, text, parse_mode='HTML', session=None):
+        """
+        发送消息到单个机器人
+        
+        Returns:
+            (success, msg, retry_after, retryable): retry_after 为 429 要求的等待秒数（否则 None），
+            retryable 表示失败是否可以重试（网络错误、5xx）
+        """
         if not bot_token or not chat_id:
-            return False, "配置不完整"
+            return False, "配置不完整", None, False
         
         try:
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+            url = f"{TELEGRAM_API}/bot{bot_token}/sendMessage"
             payload = {
                 'chat_id': chat_id,
                 'text': text,
@@ -182,19 +463,176 @@ class TelegramNotifier:
                 'disable_web_page_preview': False
             }
             
-            response = requests.post(url, json=payload, timeout=10)
+            response = (session or requests).post(url, json=payload, timeout=10)
             data = response.json()
             
             if data.get('ok'):
-                return True, "发送成功"
-            else:
-                return False, data.get('description', '发送失败')
+                return True, "发送成功", None, False
+            if data.get('error_code') == 429 or response.status_code == 429:
+                retry_after = (data.get('parameters') or {}).get('retry_after', 1)
+                return False, data.get('description', '请求过于频繁'), retry_after, True
+            return False, data.get('description', '发送失败'), None, response.status_code >= 500
                 
         except Exception as e:
-            return False, f"请求失败: {str(e)}"
+            return False, f"请求失败: {str(e)}", None, True
+    
+    def send_order_notification(self, result, old_status=None, wait=False, since=None):
+        """
+        发送订单状态变更通知（默认只加入发送队列，不等待发送完成）
+        
+        开启发件箱时，通知先写入磁盘再发送，同一次状态变化（since 为旧状态开始的时间）对每个机器人只发送一次。
+        开启汇总模式时，非取消的变更先收集起来，检查结束或汇总窗口到期后合并成一条消息发送；
+        CANCELED 始终立即单独发送。
+        """
+        if wait:
+            text, is_urgent = self.format_order_notification(result, old_status)
+            return self.send_message(text, wait=True, urgent=is_urgent)
+        
+        enabled_bots = self.get_enabled_bots()
+        if not enabled_bots:
+            return False, "没有启用的机器人"
+        
+        if self.outbox is not None:
+            entry = self.outbox.add(result, old_status, [bot['id'] for bot in enabled_bots], since=since)
+            if entry is None:
+                return True, "该状态已通知过，跳过"
+        else:
+            entry = {'id': None, 'result': result, 'oldStatus': old_status}
+        
+        is_urgent = result.get('status') == 'CANCELED'
+        if not is_urgent and self.digest_enabled and (self.digest_batches > 0 or self.digest_window > 0):
+            self._add_to_digest(entry)
+            return True, "已加入汇总通知"
+        
+        # 取消通知优先发送
+        count = self._deliver([entry], urgent=is_urgent)
+        return True, f"已加入 {count} 个机器人的发送队列"
+    
+    def _deliver(self, entries, urgent=False, bot_ids=None):
+        """
+        把通知放入各机器人的发送队列：一条时发送完整通知，多条时发送汇总
+        
+        发件箱中的通知只发给尚未投递、也不在队列中的机器人，发送成功后记录到发件箱。
+        
+        Returns:
+            int: 加入了发送队列的机器人数
+        """
+        count = 0
+        for bot in self.get_enabled_bots():
+            bot_id = bot['id']
+            if bot_ids is not None and bot_id not in bot_ids:
+                continue
+            pending = [entry for entry in entries if entry.get('id') is None or self._claim(entry['id'], bot_id)]
+            if not pending:
+                continue
+            
+            if len(pending) == 1:
+                text, is_urgent = self.format_order_notification(pending[0]['result'], pending[0]['oldStatus'])
+                pages = [(text, pending)]
+            else:
+                is_urgent = False
+                pages = self.format_digest(pending)
+            
+            worker = self._get_worker(bot_id)
+            for text, page_entries in pages:
+                future = worker.submit(text, 'HTML', urgent or is_urgent)
+                entry_ids = [entry['id'] for entry in page_entries if entry.get('id')]
+                if entry_ids:
+                    future.add_done_callback(partial(self._on_outbox_sent, entry_ids, bot_id))
+            count += 1
+        return count
+    
+    def enable_outbox(self, filepath='notification_outbox.jsonl', retry_interval=OUTBOX_RETRY_INTERVAL):
+        """
+        开启持久化发件箱：启动时重新投递上次未发送成功的通知，之后定期重试失败的通知
+        """
+        if self.outbox is not None:
+            return
+        self.outbox = NotificationOutbox(filepath)
+        stats = self.outbox.get_stats()
+        if stats['pending']:
+            print(f"📮 发件箱中有 {stats['pending']} 条未投递的通知，开始重新发送")
+        
+        def drain_loop():
+            while True:
+                try:
+                    self.drain_outbox()
+                except Exception as e:
+                    print(f"投递发件箱通知失败: {e}")
+                time.sleep(retry_interval)
+        
+        threading.Thread(target=drain_loop, daemon=True, name='notify-outbox').start()
+    
+    def drain_outbox(self):
+        """重新投递发件箱中未发送成功的通知（不包括队列中和等待汇总的）"""
+        if self.outbox is None:
+            return
+        with self.digest_lock:
+            waiting = {entry.get('id') for entry in self.digest_items}
+        
+        by_bot = {}
+        for entry, bot_id in self.outbox.pending():
+            if entry['id'] in waiting:
+                continue
+            by_bot.setdefault(bot_id, []).append(entry)
+        
+        for bot_id, entries in by_bot.items():
+            bot = self.get_bot(bot_id)
+            if bot is None:
+                # 机器人已删除，不再投递
+                self.outbox.drop([entry['id'] for entry in entries], bot_id)
+                continue
+            if not bot.get('enabled', True):
+                continue  # 停用的机器人重新启用后再发送
+            canceled = [entry for entry in entries if entry['newStatus'] == 'CANCELED']
+            others = [entry for entry in entries if entry['newStatus'] != 'CANCELED']
+            for entry in canceled:
+                self._deliver([entry], urgent=True, bot_ids={bot_id})
+            if others:
+                self._deliver(others, bot_ids={bot_id})
+    
+    def _claim(self, entry_id, bot_id):
+        """发件箱中的通知是否需要发给该机器人（是则标记为队列中）"""
+        key = (entry_id, bot_id)
+        with self.outbox_lock:
+            if key in self.outbox_inflight or not self.outbox.is_pending(entry_id, bot_id):
+                return False
+            self.outbox_inflight.add(key)
+            return True
+    
+    def _on_outbox_sent(self, entry_ids, bot_id, future):
+        success, msg, retryable = future.result()
+        try:
+            if success:
+                self.outbox.mark_sent(entry_ids, bot_id)
+            elif not retryable:
+                # Telegram 拒绝（如 chat not found）：重试几次后放弃，不再每分钟重发
+                dropped = self.outbox.reject(entry_ids, bot_id)
+                if dropped:
+                    print(f"🗑️ 发件箱放弃 {len(dropped)} 条通知 ({bot_id[:8]}): {msg}")
+        except Exception as e:
+            print(f"写入发件箱失败: {e}")
+        finally:
+            with self.outbox_lock:
+                for entry_id in entry_ids:
+                    self.outbox_inflight.discard((entry_id, bot_id))
+    
+    def forget_orders(self, urls):
+        """订单已删除：清除发件箱中这些订单的通知和投递记录"""
+        if self.outbox is not None:
+            self.outbox.forget(urls)
+    
+    def get_outbox_stats(self):
+        """发件箱统计：未投递数、已投递数；未开启时返回 None"""
+        if self.outbox is None:
+            return None
+        stats = self.outbox.get_stats()
+        with self.outbox_lock:
+            stats['inflight'] = len(self.outbox_inflight)
+        return stats
     
-    def send_order_notification(self, result, old_status=None):
-        """发送订单状态变更通知"""
+    def format_order_notification(self, result, old_status=None):
+        """生成单个订单的通知内容，返回 (text, is_urgent)"""
         status = result.get('status', 'Unknown')
         status_display = self._format_status(status)
         
@@ -251,7 +689,160 @@ class TelegramNotifier:
 
 <a href="{result.get('url')}">🔗 查看订单详情</a>"""
 
-        return self.send_message(text)
+        return text, is_urgent
+    
+    def configure_digest(self, enabled, window=0):
+        """设置汇总模式：window 秒内的变更合并发送（0 表示只在检查结束时合并）"""
+        self.digest_enabled = enabled
+        self.digest_window = window
+        if not enabled:
+            self.flush_digest()
+    
+    def begin_digest(self):
+        """一轮检查开始：之后的变更在 end_digest 时合并发送"""
+        with self.digest_lock:
+            self.digest_batches += 1
+    
+    def end_digest(self):
+        """一轮检查结束：发送汇总"""
+        with self.digest_lock:
+            self.digest_batches = max(0, self.digest_batches - 1)
+            if self.digest_batches > 0:
+                return
+        self.flush_digest()
+    
+    def _add_to_digest(self, entry):
+        with self.digest_lock:
+            self.digest_items.append(entry)
+            # 汇总窗口：第一条变更到达后开始计时，长时间的检查也会定期发送
+            if self.digest_window > 0 and self.digest_timer is None:
+                self.digest_timer = threading.Timer(self.digest_window, self.flush_digest)
+                self.digest_timer.daemon = True
+                self.digest_timer.start()
+    
+    def flush_digest(self):
+        """发送已收集的变更：只有一条时发送完整通知，多条时按新状态分组合并"""
+        with self.digest_lock:
+            items = self.digest_items
+            self.digest_items = []
+            if self.digest_timer is not None:
+                self.digest_timer.cancel()
+                self.digest_timer = None
+        if items:
+            self._deliver(items)
+    
+    def send_first_status(self, results):
+        """发送新订单的首次查询结果（按状态分组合并成一条消息）"""
+        items = []
+        for result in results:
+            if not result.get('success'):
+                result = dict(result, status='查询失败')
+            items.append({'result': result, 'oldStatus': None})
+        for text, _ in self.format_digest(items, title='新订单首次查询'):
+            self.send_message(text)
+    
+    @staticmethod
+    def _message_length(text):
+        """Telegram 计算的消息长度（UTF-16 码元数）"""
+        return len(text.encode('utf-16-le')) // 2
+    
+    @classmethod
+    def _split_line(cls, line, limit):
+        """
+        把超过 limit 的一行硬拆成多段
+        
+        不切开标签和实体；段尾补上未闭合标签的结束标签，下一段开头重新打开。
+        """
+        if cls._message_length(line) <= limit:
+            return [line]
+        
+        pieces = []
+        current = ''
+        size = 0
+        open_tags = []  # [(开始标签, 结束标签)]
+        for token in HTML_TOKEN_RE.findall(line):
+            if token.startswith('</'):
+                # 结束标签的长度已经预留过，一定放得下
+                if open_tags:
+                    open_tags.pop()
+                current += token
+                size += cls._message_length(token)
+                continue
+            
+            tag = None
+            if token.startswith('<'):
+                tag = (token, f"</{token[1:-1].split()[0]}>")
+            length = cls._message_length(token)
+            closing = ''.join(end for _, end in reversed(open_tags))
+            reserve = cls._message_length(closing) + (cls._message_length(tag[1]) if tag else 0)
+            if current and size + length + reserve > limit:
+                pieces.append(current + closing)
+                current = ''.join(start for start, _ in open_tags)
+                size = cls._message_length(current)
+            if tag:
+                open_tags.append(tag)
+            current += token
+            size += length
+        if current:
+            pieces.append(current)
+        return pieces
+    
+    def format_digest(self, items, title='订单状态汇总'):
+        """
+        汇总消息：按新状态分组，每个订单一行
+        
+        超过 Telegram 单条消息长度上限（UTF-16 码元）时按行拆分成多条，单独一行就超长的再硬拆。
+        
+        Returns:
+            list: [(text, 该条消息包含的 items)]
+        """
+        groups = {}
+        for item in items:
+            groups.setdefault(item['result'].get('status', 'Unknown'), []).append(item)
+        
+        lines = []  # [(line, item)]，分组标题行的 item 为 None
+        for status in DIGEST_STATUS_ORDER + [s for s in groups if s not in DIGEST_STATUS_ORDER]:
+            if status not in groups:
+                continue
+            lines.append(('', None))
+            lines.append((f"<b>{self._format_status(status)}</b>（{len(groups[status])}）", None))
+            for item in groups[status]:
+                result, old_status = item['result'], item['oldStatus']
+                order_number = html.escape(str(result.get('orderNumber', 'N/A')))
+                product = html.escape(str(result.get('productName', 'N/A')))
+                line = f'• <a href="{html.escape(str(result.get("url", "")))}">{order_number}</a> {product}'
+                if old_status and old_status not in ('-', '首次查询'):
+                    line += f"（{html.escape(str(old_status))} →）"
+                tracking_number = result.get('trackingNumber', '')
+                if status == 'SHIPPED' and tracking_number and tracking_number != '-':
+                    line += f" 📮 <code>{html.escape(str(tracking_number))}</code>"
+                lines.append((line, item))
+        
+        header = f"📬 <b>{title}</b>（{len(items)} 个订单）"
+        footer = f"\n<b>检测时间:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        
+        # 按行装入消息，留出页码的位置
+        limit = TELEGRAM_MAX_LENGTH - self._message_length(header) - self._message_length(footer) - 20
+        chunks = [[]]
+        size = 0
+        for line, item in lines:
+            pieces = self._split_line(line, limit - 1)
+            for i, piece in enumerate(pieces):
+                # 被拆开的行，订单记在最后一段所在的消息上：全部发出才算投递成功
+                piece_item = item if i == len(pieces) - 1 else None
+                length = self._message_length(piece) + 1
+                if size + length > limit and chunks[-1]:
+                    chunks.append([])
+                    size = 0
+                chunks[-1].append((piece, piece_item))
+                size += length
+        
+        messages = []
+        for i, chunk in enumerate(chunks, 1):
+            page = f" ({i}/{len(chunks)})" if len(chunks) > 1 else ''
+            text = header + page + '\n' + '\n'.join(line for line, _ in chunk) + footer
+            messages.append((text, [item for _, item in chunk if item is not None]))
+        return messages
     
     def _format_status(self, status):
         """格式化状态"""
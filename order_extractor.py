@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+订单页面字段提取 - 单次扫描提取所有订单字段
+"""
+
+import codecs
+import hashlib
+import re
+
+
+# 所有订单字段合并为一个正则，一次扫描即可找到全部字段
+FIELD_PATTERN = re.compile(
+    r'"(orderNumber|orderPlacedDate|productName|currentStatus|statusDescription|'
+    r'deliveryDate|trackingUrl|trackingNumber)"\s*:\s*"([^"]+)"'
+)
+# trackingUrl 缺失时的备用 UPS 链接。不并入上面的正则：页面中 "h" 非常多，
+# 合并后每个字符都要尝试匹配，反而比单独搜索慢数倍
+UPS_URL_PATTERN = re.compile(r'(https?://[^"\s]+ups\.com[^"\s]+)')
+
+# 从追踪链接中提取单号 (支持多种 URL 格式)
+# 格式1: InquiryNumber1=单号 或 InquiryNumber=单号
+# 格式2: trackingNumber=单号
+TRACKING_NUMBER_PATTERNS = (
+    re.compile(r'[?&]InquiryNumber\d*=([A-Z0-9]+)'),
+    re.compile(r'[?&]trackingNumber=([A-Z0-9]+)'),
+)
+
+# 找到这些字段后即可提前结束扫描
+PRIMARY_KEYS = ('orderNumber', 'orderPlacedDate', 'productName', 'currentStatus', 'deliveryDate', 'trackingUrl')
+
+# 流式读取时每次增量扫描向前回看的字符数（覆盖跨块的字段）
+SCAN_OVERLAP = 2048
+
+# 流式读取时必须拿到的字段；只有已发货/已送达的订单才需要物流信息
+REQUIRED_KEYS = ('orderNumber', 'orderPlacedDate', 'productName', 'currentStatus', 'deliveryDate')
+TRACKING_STATUSES = ('SHIPPED', 'DELIVERED')
+
+EMPTY_FIELDS = {
+    'orderNumber': '-',
+    'orderDate': '-',
+    'productName': '-',
+    'status': '-',
+    'deliveryDate': '-',
+    'trackingUrl': '-',
+    'trackingNumber': '-',
+}
+
+
+def extract_tracking_number(tracking_url):
+    """从物流追踪链接中提取单号，未找到返回 None"""
+    for pattern in TRACKING_NUMBER_PATTERNS:
+        m = pattern.search(tracking_url)
+        if m:
+            return m.group(1)
+    return None
+
+
+class OrderFieldScanner:
+    """订单字段扫描器 - 每个字段只保留第一次出现的值"""
+
+    def __init__(self):
+        self.found = {}  # {json字段名: 值}
+        self.ups_url = None
+
+    def is_complete(self):
+        """主要字段是否已全部找到"""
+        if any(key not in self.found for key in PRIMARY_KEYS):
+            return False
+        # 链接里没有单号时还需要 trackingNumber 字段
+        return ('trackingNumber' in self.found or
+                extract_tracking_number(self.found['trackingUrl']) is not None)
+
+    def has_required_fields(self):
+        """流式读取是否可以提前结束"""
+        if any(key not in self.found for key in REQUIRED_KEYS):
+            return False
+        if self.found['currentStatus'] in TRACKING_STATUSES:
+            return self.is_complete()
+        return True
+
+    def scan(self, text, start=0, end=None):
+        """扫描 text[start:end]，返回最后一个匹配的结束位置"""
+        last_end = start
+        if end is None:
+            end = len(text)
+        for m in FIELD_PATTERN.finditer(text, start, end):
+            last_end = m.end()
+            key = m.group(1)
+            if key not in self.found:
+                self.found[key] = m.group(2)
+                if self.is_complete():
+                    break
+        return last_end
+
+    def scan_fallback(self, text):
+        """trackingUrl 缺失时在整个页面中查找 UPS 物流链接"""
+        if 'trackingUrl' not in self.found and self.ups_url is None:
+            m = UPS_URL_PATTERN.search(text)
+            if m:
+                self.ups_url = m.group(1)
+
+    def to_fields(self):
+        """转换为订单结果字段，缺失字段为 '-'"""
+        found = self.found
+        fields = dict(EMPTY_FIELDS)
+        fields['orderNumber'] = found.get('orderNumber', '-')
+        fields['orderDate'] = found.get('orderPlacedDate', '-')
+        fields['productName'] = found.get('productName', '-')
+        fields['status'] = found.get('currentStatus', found.get('statusDescription', '-'))
+        fields['deliveryDate'] = found.get('deliveryDate', '-')
+
+        # 物流追踪链接和单号 (UPS tracking)
+        tracking_url = found.get('trackingUrl') or self.ups_url
+        if tracking_url:
+            fields['trackingUrl'] = tracking_url
+            tracking_number = extract_tracking_number(tracking_url)
+            if tracking_number:
+                fields['trackingNumber'] = tracking_number
+
+        # 如果没有从 URL 提取到，直接使用追踪单号字段
+        if fields['trackingNumber'] == '-' and 'trackingNumber' in found:
+            fields['trackingNumber'] = found['trackingNumber']
+
+        return fields
+
+
+def fingerprint_fields(fields):
+    """订单字段的指纹：页面中订单相关内容没有变化时指纹相同"""
+    payload = '\x1f'.join(f"{key}={fields[key]}" for key in sorted(fields))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def extract_order_fields(html):
+    """
+    单次扫描订单页面，提取所有订单字段
+
+    Returns:
+        dict: orderNumber, orderDate, productName, status, deliveryDate,
+              trackingUrl, trackingNumber（缺失为 '-'）
+    """
+    scanner = OrderFieldScanner()
+    scanner.scan(html)
+    scanner.scan_fallback(html)
+    return scanner.to_fields()
+
+
+class StreamingOrderExtractor:
+    """增量提取器 - 分块喂入页面内容，所需字段齐全后即可停止读取"""
+
+    def __init__(self, encoding=None):
+        try:
+            decoder_cls = codecs.getincrementaldecoder(encoding or 'utf-8')
+        except LookupError:
+            decoder_cls = codecs.getincrementaldecoder('utf-8')
+        self.decoder = decoder_cls(errors='replace')
+        self.scanner = OrderFieldScanner()
+        self.html = ''
+        self.pos = 0
+        self.done = False
+
+    def feed(self, chunk):
+        """喂入一块字节数据，返回是否已可以停止读取"""
+        self.html += self.decoder.decode(chunk)
+        last_end = self.scanner.scan(self.html, self.pos)
+        self.pos = max(last_end, len(self.html) - SCAN_OVERLAP)
+        self.done = self.scanner.has_required_fields()
+        return self.done
+
+    def finish(self):
+        """返回订单字段；没有提前结束时对完整页面重新提取"""
+        if self.done:
+            return self.scanner.to_fields()
+        self.html += self.decoder.decode(b'', final=True)
+        return extract_order_fields(self.html)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+订单登记表 - orders.txt 的内存索引
+
+- 文件只在启动和被外部修改（如 telegram_bot.py）时读取，按 inode/修改时间/大小判断
+- 订单保存在按插入顺序排列的 dict 中，查找、添加、删除都是 O(1)
+- 添加单个订单只追加一行；批量添加、删除都只整体重写一次文件（临时文件 + 重命名）
+"""
+
+import os
+import threading
+
+
+ORDERS_FILE_HEADER = "# 苹果订单链接列表\n# 每行一个链接\n\n"
+
+
+class OrderRegistry:
+    """订单登记表"""
+
+    def __init__(self, filepath='orders.txt'):
+        self.filepath = filepath
+        self.lock = threading.RLock()
+        self.orders = {}        # {url: None}，dict 保持插入顺序
+        self.url_list = []      # 缓存的订单列表
+        self.file_stamp = None  # 上次读取/写入后的 (inode, mtime_ns, size)
+        self.loads = 0          # 读取文件的次数
+        self.on_reload = None   # 文件被外部修改并重新读取后的回调，参数为新增的链接列表
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.filepath)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        orders = {}
+        if os.path.exists(self.filepath):
+            try:
+                with open(self.filepath, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith('#') and line.startswith('http'):
+                            orders[line] = None
+            except Exception as e:
+                print(f"读取订单失败: {e}")
+                return
+        self.orders = orders
+        self.url_list = list(orders)
+        self.loads += 1
+
+    def refresh(self):
+        """文件被外部修改过时重新读取，返回是否重新读取"""
+        with self.lock:
+            stamp = self._stamp()
+            if stamp == self.file_stamp and self.loads:
+                return False
+            # 先记录再读取：读取期间文件又被修改时，下次还会重新读取
+            external = self.loads > 0
+            old_orders = self.orders
+            self.file_stamp = stamp
+            self._load()
+            if external and self.on_reload:
+                self.on_reload([url for url in self.url_list if url not in old_orders])
+            return True
+
+    def version(self):
+        """文件版本标识，用于 ETag"""
+        with self.lock:
+            self.refresh()
+            stamp = self.file_stamp
+        return f"{stamp[0]}.{stamp[1]}" if stamp else '0'
+
+    def urls(self):
+        """所有订单链接（按添加顺序）"""
+        with self.lock:
+            self.refresh()
+            return list(self.url_list)
+
+    def __contains__(self, url):
+        with self.lock:
+            self.refresh()
+            return url in self.orders
+
+    def __len__(self):
+        with self.lock:
+            self.refresh()
+            return len(self.orders)
+
+    def add(self, urls):
+        """
+        添加订单（去重后一次写入：单个链接追加，多个链接原子重写）
+
+        Returns:
+            (added, existed): 新添加的链接列表、已存在的链接列表
+        """
+        added = []
+        existed = []
+        with self.lock:
+            self.refresh()
+            seen = set()
+            for url in urls:
+                if url in self.orders or url in seen:
+                    existed.append(url)
+                    continue
+                seen.add(url)
+                added.append(url)
+            if not added:
+                return added, existed
+
+            if len(added) > 1:
+                orders = dict(self.orders)
+                for url in added:
+                    orders[url] = None
+                self._write(orders)
+                return added, existed
+
+            url = added[0]
+            new_file = not os.path.exists(self.filepath)
+            with open(self.filepath, 'a', encoding='utf-8') as f:
+                if new_file:
+                    f.write(ORDERS_FILE_HEADER)
+                f.write(f"{url}\n")
+            self.orders[url] = None
+            self.url_list.append(url)
+            self.file_stamp = self._stamp()
+        return added, existed
+
+    def remove(self, urls):
+        """
+        批量删除订单（一次重写文件：临时文件 + 重命名）
+
+        Returns:
+            list: 实际删除的链接
+        """
+        with self.lock:
+            self.refresh()
+            removed = [url for url in dict.fromkeys(urls) if url in self.orders]
+            if not removed:
+                return removed
+            remaining = dict(self.orders)
+            for url in removed:
+                del remaining[url]
+            self._write(remaining)
+        return removed
+
+    def replace(self, urls):
+        """用新的订单列表替换全部订单（一次原子重写），返回去重后的订单数"""
+        with self.lock:
+            self._write(dict.fromkeys(urls))
+            return len(self.orders)
+
+    def clear(self):
+        """清空所有订单，返回清空的数量"""
+        with self.lock:
+            self.refresh()
+            count = len(self.orders)
+            self._write({})
+        return count
+
+    def _write(self, orders):
+        """整体重写订单文件，写入成功后才更新内存"""
+        tmp_file = self.filepath + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(ORDERS_FILE_HEADER)
+            f.write(''.join(f"{url}\n" for url in orders))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.filepath)
+        self.orders = orders
+        self.url_list = list(orders)
+        self.file_stamp = self._stamp()
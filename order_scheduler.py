@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+订单查询调度器 - 按订单状态和距上次变化的时间自适应安排下次查询
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+
+
+# 终态订单不再查询
+TERMINAL_STATUSES = ('CANCELED', 'DELIVERED')
+
+# 各状态的查询间隔（相对于 config['interval'] 的倍数）
+# 即将发货的订单查得勤一些，刚下单的订单离发货还早，可以慢一些
+DEFAULT_STATUS_FACTORS = {
+    'PLACED': 2.0,
+    'PROCESSING': 1.0,
+    'PREPARED_FOR_SHIPMENT': 0.5,
+    'SHIPPED': 1.0,
+}
+
+
+class OrderScheduler:
+    """
+    自适应调度器
+
+    - 每个订单记录下次到期时间，最小堆按到期时间排序
+    - 状态没有变化时按 backoff 倍数逐渐拉长间隔，最长不超过 max_factor 倍
+    - 状态变化后间隔重置为该状态的基础间隔
+    """
+
+    def __init__(self, base_interval=300, status_intervals=None, backoff=1.5, max_factor=4.0):
+        self.base_interval = base_interval
+        self.status_intervals = status_intervals or {}  # {status: 秒}，覆盖默认倍数
+        self.backoff = backoff
+        self.max_factor = max_factor
+
+        self.lock = threading.Lock()
+        self.heap = []     # [(due, url)]，过期条目惰性删除
+        self.entries = {}  # {url: {'due', 'status', 'streak'}}
+
+    def configure(self, base_interval=None, status_intervals=None, backoff=None, max_factor=None):
+        """更新调度参数（已安排的到期时间不变）"""
+        with self.lock:
+            if base_interval is not None:
+                self.base_interval = base_interval
+            if status_intervals is not None:
+                self.status_intervals = status_intervals
+            if backoff is not None:
+                self.backoff = backoff
+            if max_factor is not None:
+                self.max_factor = max_factor
+
+    def interval_for(self, status):
+        """某个状态的基础查询间隔（秒）"""
+        if status in self.status_intervals:
+            return self.status_intervals[status]
+        return self.base_interval * DEFAULT_STATUS_FACTORS.get(status, 1.0)
+
+    def _push(self, url, due, status, streak):
+        self.entries[url] = {'due': due, 'status': status, 'streak': streak}
+        heapq.heappush(self.heap, (due, url))
+        # 过期条目太多时重建堆，避免无限增长
+        if len(self.heap) > 2 * len(self.entries) + 1000:
+            self.heap = [(entry['due'], u) for u, entry in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def sync(self, urls, results):
+        """为还没有安排的订单建立调度（根据上次查询时间推算）"""
+        now = time.time()
+        with self.lock:
+            for url in urls:
+                if url in self.entries:
+                    continue
+                prev = results.get(url)
+                if not prev or not prev.get('success'):
+                    # 从未查询或上次失败：立即到期
+                    self._push(url, now, '-', 0)
+                    continue
+                status = prev.get('status', '-')
+                if status in TERMINAL_STATUSES:
+                    continue
+                try:
+                    last = datetime.fromisoformat(prev.get('timestamp')).timestamp()
+                except (TypeError, ValueError):
+                    last = now
+                self._push(url, last + self.interval_for(status), status, 0)
+
+    def record(self, url, status, changed):
+        """记录一次查询结果并安排下次查询"""
+        now = time.time()
+        with self.lock:
+            if status in TERMINAL_STATUSES:
+                self.entries.pop(url, None)
+                return
+
+            entry = self.entries.get(url)
+            base = self.interval_for(status)
+            if changed or entry is None or entry['status'] != status:
+                streak = 0
+                interval = base
+            else:
+                # 状态没有变化：逐渐拉长间隔
+                streak = entry['streak'] + 1
+                interval = min(base * (self.backoff ** streak), base * self.max_factor)
+            self._push(url, now + interval, status, streak)
+
+    def remove(self, url):
+        with self.lock:
+            self.entries.pop(url, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.heap = []
+
+    def is_due(self, url, now=None):
+        """订单是否已到期（没有调度记录的订单视为到期）"""
+        now = now or time.time()
+        with self.lock:
+            entry = self.entries.get(url)
+        return entry is None or entry['due'] <= now
+
+    def next_due(self):
+        """最近一个到期时间，没有待查询订单时返回 None"""
+        with self.lock:
+            while self.heap:
+                due, url = self.heap[0]
+                entry = self.entries.get(url)
+                if entry is not None and entry['due'] == due:
+                    return due
+                heapq.heappop(self.heap)  # 已删除或已重新安排
+            return None
+
+    def count_due(self, urls, now=None):
+        """统计 (现在到期数, 稍后到期数)"""
+        now = now or time.time()
+        due_now = 0
+        due_later = 0
+        with self.lock:
+            for url in urls:
+                entry = self.entries.get(url)
+                if entry is None:
+                    continue
+                if entry['due'] <= now:
+                    due_now += 1
+                else:
+                    due_later += 1
+        return due_now, due_later
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+订单结果状态 - 查询线程并发写入，接口和持久化读取快照
+
+- 写入在锁内只做一次 dict 操作；同一订单的"读取-比较-写入"由按链接分段的锁保证顺序
+- 保存的结果 dict 不再原地修改（修改时复制一份再替换），所以快照只需浅复制
+- 快照在两次写入之间复用，读取方可以放心遍历，不会遇到"迭代时 dict 大小变化"
+"""
+
+import threading
+
+
+# 按链接分段的锁数量
+URL_LOCK_STRIPES = 64
+
+
+class ResultsState:
+    """订单结果和状态变更记录"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.url_locks = [threading.RLock() for _ in range(URL_LOCK_STRIPES)]
+        self._results = {}        # {url: result}
+        self._changes = []        # 状态变更记录
+        self._results_view = None  # 缓存的结果快照，写入后失效
+        self._changes_view = None
+
+    def url_lock(self, url):
+        """该订单的锁：持有期间其他线程不会同时合并同一订单的结果"""
+        return self.url_locks[hash(url) % URL_LOCK_STRIPES]
+
+    def load(self, results, changes):
+        with self.lock:
+            self._results = dict(results)
+            self._changes = list(changes)
+            self._results_view = None
+            self._changes_view = None
+
+    # ---- 结果 ----
+
+    def get(self, url, default=None):
+        with self.lock:
+            return self._results.get(url, default)
+
+    def __contains__(self, url):
+        with self.lock:
+            return url in self._results
+
+    def __len__(self):
+        with self.lock:
+            return len(self._results)
+
+    def put(self, url, result):
+        with self.lock:
+            self._results[url] = result
+            self._results_view = None
+
+    def update(self, url, **fields):
+        """复制一份结果并修改部分字段，返回新结果（订单不存在时返回 None）"""
+        with self.lock:
+            old = self._results.get(url)
+            if old is None:
+                return None
+            new = dict(old, **fields)
+            self._results[url] = new
+            self._results_view = None
+            return new
+
+    def pop(self, url):
+        with self.lock:
+            result = self._results.pop(url, None)
+            if result is not None:
+                self._results_view = None
+            return result
+
+    def clear(self):
+        """清空所有结果，返回清空的数量"""
+        with self.lock:
+            count = len(self._results)
+            self._results = {}
+            self._results_view = None
+            return count
+
+    def snapshot(self):
+        """当前结果的只读快照 {url: result}（调用方不要修改）"""
+        with self.lock:
+            if self._results_view is None:
+                self._results_view = dict(self._results)
+            return self._results_view
+
+    # ---- 状态变更记录 ----
+
+    def add_change(self, change):
+        with self.lock:
+            self._changes.append(change)
+            self._changes_view = None
+
+    def drop_changes(self, urls):
+        """删除这些订单的状态变更记录"""
+        urls = set(urls)
+        with self.lock:
+            self._changes = [change for change in self._changes if change.get('url') not in urls]
+            self._changes_view = None
+
+    def changes(self):
+        """状态变更记录的只读快照"""
+        with self.lock:
+            if self._changes_view is None:
+                self._changes_view = tuple(self._changes)
+            return self._changes_view
+
+    def snapshot_all(self):
+        """同一时刻的结果和状态变更记录（用于写入历史快照）"""
+        with self.lock:
+            if self._results_view is None:
+                self._results_view = dict(self._results)
+            if self._changes_view is None:
+                self._changes_view = tuple(self._changes)
+            return self._results_view, self._changes_view
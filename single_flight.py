@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+同一订单的并发查询合并 - 同时查询同一链接的调用方共享一次请求和结果
+
+- 监控检查、手动检查、批量查询页面和优先通道可能同时查询同一订单，只发出一次请求
+- 成功的页面在短时间内（ttl 秒）缓存，批量查询可以复用监控刚拿到的结果
+- 请求失败不缓存，等待中的调用方收到同一个异常
+- 等待其他调用方的请求有超时，发起请求的一方异常退出时也不会让等待方一直阻塞
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# 缓存条目超过这个数量时清理过期条目
+CACHE_PRUNE_SIZE = 5000
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_url(url):
+    """规范化订单链接：协议和主机小写、去掉默认端口、末尾斜杠和锚点、查询参数排序"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class SingleFlight:
+    """按规范化链接合并进行中的请求，并短时间缓存结果"""
+
+    def __init__(self, ttl=0):
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.inflight = {}  # {key: Future}
+        self.cache = {}     # {key: (缓存时间, 结果)}
+        self.stats = {
+            'fetches': 0,   # 实际发出的请求
+            'shared': 0,    # 等待其他调用方进行中的请求
+            'cacheHits': 0, # 直接使用缓存
+        }
+
+    def claim(self, url):
+        """
+        查询前调用，返回 (kind, key, value):
+            ('cached', key, 结果)   缓存中有未过期的结果
+            ('wait', key, Future)   其他调用方正在查询，等待这个 Future
+            ('lead', key, Future)   由调用方查询，完成后必须调用 finish()
+        """
+        key = canonical_url(url)
+        now = time.time()
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                if now - cached[0] < self.ttl:
+                    self.stats['cacheHits'] += 1
+                    return 'cached', key, cached[1]
+                del self.cache[key]
+            future = self.inflight.get(key)
+            if future is not None:
+                self.stats['shared'] += 1
+                return 'wait', key, future
+            future = Future()
+            self.inflight[key] = future
+            self.stats['fetches'] += 1
+            return 'lead', key, future
+
+    def finish(self, key, future, value=None, error=None, cacheable=True):
+        """
+        查询完成：唤醒等待的调用方，成功且 cacheable 时写入缓存
+
+        发起方被取消或中断（BaseException）时，等待方收到普通异常，按查询失败处理。
+        """
+        if error is not None and not isinstance(error, Exception):
+            error = RuntimeError(f'同一订单的查询被中断: {type(error).__name__}')
+        with self.lock:
+            self.inflight.pop(key, None)
+            if error is None and cacheable and self.ttl > 0:
+                now = time.time()
+                if len(self.cache) >= CACHE_PRUNE_SIZE:
+                    self.cache = {k: v for k, v in self.cache.items() if now - v[0] < self.ttl}
+                self.cache[key] = (now, value)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def do(self, url, fetch, cacheable=None, wait_timeout=None):
+        """
+        查询链接：并发的相同查询只执行一次 fetch()
+
+        wait_timeout 为等待其他调用方进行中的查询的最长秒数，超时抛出 TimeoutError。
+
+        Returns:
+            (结果, 是否与其他调用方共享)
+        """
+        kind, key, value = self.claim(url)
+        if kind == 'cached':
+            return value, True
+        if kind == 'wait':
+            try:
+                return value.result(timeout=wait_timeout), True
+            except FutureTimeoutError:
+                raise TimeoutError(f'等待同一订单的查询超过 {wait_timeout} 秒') from None
+        try:
+            result = fetch()
+        except BaseException as e:
+            self.finish(key, value, error=e)
+            raise
+        self.finish(key, value, result, cacheable=cacheable(result) if cacheable else True)
+        return result, False
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, ttl=self.ttl, inflight=len(self.inflight), cached=len(self.cache))
@@ -88,7 +88,8 @@ def main():
         notifier.send_message(
             "🛑 <b>订单监控系统已停止</b>\n\n"
             "如需再次启动，请运行:\n"
-            "<code>python start_all.py</code>"
+            "<code>python start_all.py</code>",
+            wait=True  # 进程即将退出，等待发送完成
         )
         
         print("✅ 系统已停止")
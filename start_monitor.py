@@ -77,7 +77,7 @@ def main():
         notifier.send_message("""🛑 <b>苹果订单监控已停止</b>
 
 监控程序已手动停止
-如需再次启动，请运行 start_monitor.py""")
+如需再次启动，请运行 start_monitor.py""", wait=True)  # 进程即将退出，等待发送完成
         
         print("✅ 监控已停止")
 
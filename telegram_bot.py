@@ -1,14 +1,31 @@
 #!/usr/bin/env python3
 """
 Telegram Bot 消息监听 - 自动接收订单链接并更新文件
+
+两种接收方式：
+- 长轮询（默认）：getUpdates 挂起最多 50 秒，有新消息立即返回，空闲时几乎没有请求
+- Webhook：Telegram 把消息推送到本地接收端（通过 nginx 反向代理对外）
 """
 
+import json
 import requests
 import re
+import secrets
 import time
 import threading
 from datetime import datetime
-from order_loader import add_order_to_file, load_orders_from_file
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from order_registry import OrderRegistry
+
+
+# getUpdates 长轮询的挂起时间（秒）和每次最多取回的消息数
+LONG_POLL_TIMEOUT = 50
+UPDATES_LIMIT = 100
+# 网络出错后重试前等待的秒数
+POLL_ERROR_DELAY = 5
+# Webhook 接收端默认监听的本地端口
+WEBHOOK_PORT = 8847
 
 
 class TelegramOrderBot:
@@ -23,26 +40,34 @@ class TelegramOrderBot:
         self.thread = None
         self.last_check = None
     
-    def get_updates(self):
-        """获取新消息"""
+    def get_updates(self, timeout=LONG_POLL_TIMEOUT):
+        """
+        获取新消息（长轮询：没有消息时 Telegram 挂起最多 timeout 秒）
+        
+        Returns:
+            list: 新消息；请求失败时返回 None
+        """
         try:
             url = f"{self.base_url}/getUpdates"
             params = {
                 'offset': self.offset,
-                'limit': 10,
+                'limit': UPDATES_LIMIT,
+                'timeout': timeout,
+                'allowed_updates': json.dumps(['message']),
             }
-            response = requests.get(url, params=params, timeout=30)
+            # 本地超时要比长轮询时间长，否则空闲时会被当成请求失败
+            response = self.session.get(url, params=params, timeout=timeout + 10)
             data = response.json()
             
             if data.get('ok'):
                 return data.get('result', [])
             else:
                 print(f"获取消息失败: {data.get('description')}")
-                return []
+                return None
                 
         except Exception as e:
             print(f"请求失败: {e}")
-            return []
+            return None
     
     def send_message(self, text, reply_to_message_id=None):
         """发送消息"""
@@ -57,7 +82,7 @@ class TelegramOrderBot:
             if reply_to_message_id:
                 payload['reply_to_message_id'] = reply_to_message_id
             
-            response = requests.post(url, json=payload, timeout=10)
+            response = self.session.post(url, json=payload, timeout=10)
             data = response.json()
             
             return data.get('ok', False)
@@ -95,6 +120,11 @@ class TelegramOrderBot:
         self.last_check = None
         self.clear_pending = False  # 等待确认清空
         self.pending_urls = []  # 等待添加的链接（清空后）
+        self.registry = OrderRegistry('orders.txt')  # 批量添加/删除只写一次文件
+        self.session = requests.Session()  # 复用到 api.telegram.org 的连接
+        self.process_lock = threading.Lock()  # 消息按顺序处理（长轮询和 Webhook 共用）
+        self.webhook_server = None
+        self.webhook_secret = None
     
     def process_message(self, message):
         """处理单条消息"""
@@ -122,14 +152,14 @@ class TelegramOrderBot:
         # 提取订单链接
         urls = self.extract_order_urls(text)
         
-        if not urls:
+        if not urls or text.startswith('/'):
             # 不是订单链接，可能是命令或普通消息
             if text.startswith('/'):
                 self.handle_command(text, message_id)
             return
         
         # 加载现有订单
-        existing_urls = load_orders_from_file('orders.txt')
+        existing_urls = self.registry.urls()
         
         # 如果有现有订单，询问是否清空
         if existing_urls and len(existing_urls) > 0:
@@ -155,40 +185,41 @@ class TelegramOrderBot:
     
     def do_clear_and_add(self, message_id):
         """执行清空并添加新订单"""
-        # 清空文件
-        with open('orders.txt', 'w', encoding='utf-8') as f:
-            f.write("# 苹果订单链接列表\n# 每行一个链接\n\n")
-        
-        # 添加新订单
-        self.add_urls(self.pending_urls, message_id, prefix="✅ <b>已清空原有订单</b>\n\n")
+        # 清空并写入新订单（一次写入）
+        self.add_urls(self.pending_urls, message_id, prefix="✅ <b>已清空原有订单</b>\n\n", replace=True)
         
         # 重置状态
         self.clear_pending = False
         self.pending_urls = []
     
-    def add_urls(self, urls, message_id, prefix=""):
-        """添加 URL 到文件"""
-        added = []
-        existed = []
-        invalid = []
+    def add_urls(self, urls, message_id, prefix="", replace=False):
+        """添加 URL 到文件（内存中去重，一次写入；replace=True 时替换全部订单）"""
+        valid = [url for url in urls if 'vieworder' in url]
+        invalid = [url for url in urls if 'vieworder' not in url]
         
-        existing_urls = load_orders_from_file('orders.txt')
-        existing_set = set(existing_urls)
-        
-        for url in urls:
-            if 'vieworder' not in url:
-                invalid.append(url)
-                continue
-            
-            if url in existing_set:
-                existed.append(url)
-                continue
-            
-            if add_order_to_file(url, 'orders.txt'):
-                added.append(url)
-                existing_set.add(url)
+        try:
+            if replace:
+                # 替换时只在本次消息内去重：第二次及以后出现的链接记为已存在
+                added = []
+                existed = []
+                seen = set()
+                for url in valid:
+                    if url in seen:
+                        existed.append(url)
+                        continue
+                    seen.add(url)
+                    added.append(url)
+                self.registry.replace(added)
+            else:
+                added, existed = self.registry.add(valid)
+        except Exception as e:
+            print(f"❌ 添加失败: {e}")
+            self.send_message(f"❌ <b>添加失败</b>: {e}", message_id)
+            return
         
         reply = prefix + self.format_reply(added, existed, invalid)
+        if added:
+            reply += "\n\n⚡ 监控服务会立即查询新订单，首次查询结果稍后发送"
         self.send_message(reply, message_id)
     
     def format_reply(self, added, existed, invalid):
@@ -214,7 +245,7 @@ class TelegramOrderBot:
             lines.append("")
         
         # 显示当前总数
-        total = len(load_orders_from_file('orders.txt'))
+        total = len(self.registry)
         lines.append(f"📦 <b>当前监控订单总数: {total}</b>")
         lines.append(f"<i>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</i>")
         
@@ -227,13 +258,35 @@ class TelegramOrderBot:
             return match.group(1)
         return url[:30] + '...'
     
+    def delete_orders(self, targets, message_id):
+        """按链接或订单号批量删除订单（一次重写文件）"""
+        if not targets:
+            self.send_message("用法: <code>/delete 订单链接或订单号</code>（可一次多个）", message_id)
+            return
+        
+        targets = set(targets)
+        urls = [url for url in self.registry.urls()
+                if url in targets or self.extract_order_no(url) in targets]
+        removed = self.registry.remove(urls)
+        
+        lines = []
+        if removed:
+            lines.append(f"🗑️ <b>已删除 {len(removed)} 个订单</b>")
+            for url in removed:
+                lines.append(f"  • {self.extract_order_no(url)}")
+        else:
+            lines.append("⚠️ <b>没有找到要删除的订单</b>")
+        lines.append("")
+        lines.append(f"📦 <b>当前监控订单总数: {len(self.registry)}</b>")
+        self.send_message('\n'.join(lines), message_id)
+    
     def handle_command(self, text, message_id):
         """处理命令"""
         cmd = text.lower().split()[0]
         
         if cmd == '/list' or cmd == '/orders':
             # 列出所有订单
-            urls = load_orders_from_file('orders.txt')
+            urls = self.registry.urls()
             if not urls:
                 self.send_message("📭 <b>暂无监控订单</b>\n\n发送订单链接即可添加", message_id)
                 return
@@ -259,14 +312,18 @@ class TelegramOrderBot:
         
         elif cmd == '/confirm_clear':
             # 确认清空
-            with open('orders.txt', 'w', encoding='utf-8') as f:
-                f.write("# 苹果订单链接列表\n# 每行一个链接\n\n")
+            self.registry.clear()
             self.send_message("✅ <b>已清空所有订单</b>", message_id)
         
+        elif cmd == '/delete':
+            # 删除指定订单：/delete 后跟一个或多个订单链接或订单号
+            self.delete_orders(text.split()[1:], message_id)
+        
         elif cmd == '/help':
             help_text = """<b>🤖 命令列表</b>
 
 /list 或 /orders - 查看当前监控订单
+/delete 链接或订单号 - 删除指定订单（可一次多个）
 /clear - 清空所有订单
 /help - 显示帮助
 
@@ -288,6 +345,7 @@ class TelegramOrderBot:
 
 <b>命令:</b>
 /list - 查看当前订单
+/delete - 删除指定订单
 /clear - 清空所有订单
 /help - 显示帮助
 
@@ -302,11 +360,21 @@ class TelegramOrderBot:
             # 这些命令在 process_message 中处理
             pass
     
-    def check_messages(self):
-        """检查一次消息"""
-        updates = self.get_updates()
+    def check_messages(self, timeout=LONG_POLL_TIMEOUT):
+        """检查一次消息，返回是否请求成功"""
+        updates = self.get_updates(timeout)
+        if updates is None:
+            return False
         
         for update in updates:
+            self.handle_update(update)
+        return True
+    
+    def handle_update(self, update):
+        """处理一条更新（重复推送的更新会被跳过）"""
+        with self.process_lock:
+            if update['update_id'] < self.offset:
+                return
             # 更新偏移量
             self.offset = update['update_id'] + 1
             
@@ -314,22 +382,19 @@ class TelegramOrderBot:
             if 'message' in update:
                 self.process_message(update['message'])
     
-    def run_once(self):
-        """运行一次检查"""
+    def run_once(self, timeout=LONG_POLL_TIMEOUT):
+        """运行一次检查，返回是否请求成功"""
         try:
-            self.check_messages()
+            return self.check_messages(timeout)
         except Exception as e:
             print(f"处理消息出错: {e}")
+            return True
     
-    def start_polling(self):
-        """启动轮询"""
-        if self.running:
-            return False
-        
-        self.running = True
+    def _announce(self, mode):
         print(f"\n🤖 Telegram Bot 启动")
         print(f"   Bot Token: {self.bot_token[:15]}...")
         print(f"   Chat ID: {self.chat_id}")
+        print(f"   接收方式: {mode}")
         print(f"   正在监听消息...\n")
         
         # 发送启动消息
@@ -338,46 +403,155 @@ class TelegramOrderBot:
             "直接发送订单链接即可添加监控。\n"
             "发送 /help 查看帮助"
         )
+    
+    def start_polling(self):
+        """启动长轮询"""
+        if self.running:
+            return False
+        
+        self.running = True
+        # 之前设置过 Webhook 时 getUpdates 会被拒绝，先删除（保留未处理的消息）
+        self._call_api('deleteWebhook', {'drop_pending_updates': False})
+        self._announce(f"长轮询（{LONG_POLL_TIMEOUT} 秒）")
         
         def polling_loop():
             while self.running:
-                self.run_once()
-                time.sleep(2)  # 每2秒检查一次
+                # 长轮询：没有消息时请求在服务端挂起，有消息立即返回，不需要本地等待
+                if not self.run_once():
+                    time.sleep(POLL_ERROR_DELAY)
         
         self.thread = threading.Thread(target=polling_loop, daemon=True)
         self.thread.start()
         return True
     
+    def start_webhook(self, public_url, port=WEBHOOK_PORT, host='127.0.0.1', secret=None):
+        """
+        启动 Webhook 接收端：Telegram 把消息 POST 到 public_url（由 nginx 转发到本地端口）
+        
+        请求头中的 secret_token 不匹配的请求会被拒绝。
+        """
+        if self.running:
+            return False
+        
+        self.webhook_secret = secret or secrets.token_urlsafe(32)
+        self.webhook_server = WebhookServer((host, port), make_webhook_handler(self))
+        self.thread = threading.Thread(target=self.webhook_server.serve_forever, daemon=True)
+        self.thread.start()
+        
+        ok, msg = self._call_api('setWebhook', {
+            'url': public_url,
+            'secret_token': self.webhook_secret,
+            'allowed_updates': ['message'],
+            'max_connections': 1,  # 按顺序推送，和长轮询的处理顺序一致
+        })
+        if not ok:
+            print(f"❌ 设置 Webhook 失败: {msg}")
+            self.webhook_server.shutdown()
+            self.webhook_server.server_close()
+            self.webhook_server = None
+            return False
+        
+        self.running = True
+        self._announce(f"Webhook（{public_url} → http://{host}:{port}）")
+        return True
+    
+    def _call_api(self, method, payload):
+        """调用 Bot API，返回 (success, msg)"""
+        try:
+            response = self.session.post(f"{self.base_url}/{method}", json=payload, timeout=10)
+            data = response.json()
+            if data.get('ok'):
+                return True, data.get('description', '成功')
+            return False, data.get('description', '请求失败')
+        except Exception as e:
+            return False, f"请求失败: {e}"
+    
     def stop(self):
-        """停止轮询"""
+        """停止轮询或 Webhook 接收端"""
         self.running = False
+        if self.webhook_server:
+            self._call_api('deleteWebhook', {'drop_pending_updates': False})
+            self.webhook_server.shutdown()
+            self.webhook_server.server_close()
+            self.webhook_server = None
+        # 长轮询请求可能还在挂起，线程是守护线程，不必等到请求返回
         if self.thread:
             self.thread.join(timeout=5)
         print("Bot 已停止")
 
 
+class WebhookServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_webhook_handler(bot):
+    """生成 Webhook 请求处理类"""
+    
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not secrets.compare_digest(
+                    self.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), bot.webhook_secret):
+                self._reply(403)
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                update = json.loads(self.rfile.read(length))
+            except ValueError:
+                self._reply(400)
+                return
+            try:
+                bot.handle_update(update)
+            except Exception as e:
+                print(f"处理消息出错: {e}")
+            # 总是返回 200，否则 Telegram 会不断重发同一条消息
+            self._reply(200)
+        
+        def _reply(self, code):
+            self.send_response(code)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return WebhookHandler
+
+
 # 便捷函数
-def start_telegram_bot():
-    """启动 Telegram Bot"""
+def start_telegram_bot(webhook_url=None, webhook_port=WEBHOOK_PORT):
+    """启动 Telegram Bot（指定 webhook_url 时使用 Webhook，否则使用长轮询）"""
     from notifier import get_notifier
     
     notifier = get_notifier()
-    config = notifier.get_config()
+    enabled_bots = notifier.get_enabled_bots()
     
-    if not config.get('enabled'):
+    if not enabled_bots:
         print("❌ Telegram 未配置，无法启动 Bot")
         return None
     
+    # 使用第一个启用的机器人接收消息
     bot = TelegramOrderBot(
-        bot_token=notifier.bot_token,
-        chat_id=notifier.chat_id
+        bot_token=enabled_bots[0]['bot_token'],
+        chat_id=enabled_bots[0]['chat_id']
     )
-    bot.start_polling()
+    if webhook_url:
+        if not bot.start_webhook(webhook_url, port=webhook_port):
+            return None
+    else:
+        bot.start_polling()
     return bot
 
 
 if __name__ == '__main__':
-    bot = start_telegram_bot()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Telegram 订单 Bot')
+    parser.add_argument('--webhook', metavar='URL',
+                        help='使用 Webhook 接收消息，URL 为 nginx 对外的地址，如 https://example.com/telegram-webhook')
+    parser.add_argument('--webhook-port', type=int, default=WEBHOOK_PORT, help='Webhook 本地监听端口')
+    args = parser.parse_args()
+    
+    bot = start_telegram_bot(args.webhook, args.webhook_port)
     
     if bot:
         print("按 Ctrl+C 停止")
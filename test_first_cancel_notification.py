@@ -41,7 +41,7 @@ def test_first_check_canceled():
     print("\n📤 发送通知...")
     
     # 首次查询（old_status = None）
-    success, msg = notifier.send_order_notification(result, old_status=None)
+    success, msg = notifier.send_order_notification(result, old_status=None, wait=True)
     
     if success:
         print(f"✅ {msg}")
@@ -56,7 +56,7 @@ def test_first_check_canceled():
     print("=" * 60)
     
     # 状态变更（有旧状态）
-    success, msg = notifier.send_order_notification(result, old_status='PROCESSING')
+    success, msg = notifier.send_order_notification(result, old_status='PROCESSING', wait=True)
     
     if success:
         print(f"✅ {msg}")
@@ -78,7 +78,7 @@ def test_first_check_canceled():
     print("   （这种情况不会发送通知，除非后续状态变更）")
     
     # 这个通知会发送，但显示为"新订单"
-    success, msg = notifier.send_order_notification(result_normal, old_status=None)
+    success, msg = notifier.send_order_notification(result_normal, old_status=None, wait=True)
     if success:
         print(f"✅ {msg}")
         print("   （虽然会发送，但显示为'新订单'，不是紧急警告）")
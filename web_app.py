@@ -12,6 +12,7 @@ import json
 import webbrowser
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+from fetch_client import get_fetch_client
 
 # 全局线程池
 executor = ThreadPoolExecutor(max_workers=10)
@@ -607,15 +608,7 @@ def query_order(url, timeout=30):
         return {'success': False, 'error': '链接格式错误', 'url': url}
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        }
-        
-        session = requests.Session()
-        response = session.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-        html = response.text
+        page = get_fetch_client().fetch_order(url, timeout=timeout)
         
         result = {
             'success': True,
@@ -627,39 +620,15 @@ def query_order(url, timeout=30):
             'deliveryDate': '-',
         }
         
-        # 提取订单号
-        order_match = re.search(r'"orderNumber"\s*:\s*"([^"]+)"', html)
-        if order_match:
-            result['orderNumber'] = order_match.group(1)
-        
-        # 提取下单日期
-        order_date_match = re.search(r'"orderPlacedDate"\s*:\s*"([^"]+)"', html)
-        if order_date_match:
-            result['orderDate'] = order_date_match.group(1)
-        
-        # 提取产品名称
-        product_match = re.search(r'"productName"\s*:\s*"([^"]+)"', html)
-        if product_match:
-            result['productName'] = product_match.group(1)
-        
-        # 提取状态 (使用 currentStatus，更标准)
-        status_match = re.search(r'"currentStatus"\s*:\s*"([^"]+)"', html)
-        if status_match:
-            result['status'] = status_match.group(1)
-        else:
-            # 备用：使用 statusDescription
-            status_match = re.search(r'"statusDescription"\s*:\s*"([^"]+)"', html)
-            if status_match:
-                result['status'] = status_match.group(1)
-        
-        # 提取配送日期
-        delivery_match = re.search(r'"deliveryDate"\s*:\s*"([^"]+)"', html)
-        if delivery_match:
-            result['deliveryDate'] = delivery_match.group(1)
+        # 页面中没有订单号时保留链接中的订单号
+        fields = page['fields']
+        for key in ('orderNumber', 'orderDate', 'productName', 'status', 'deliveryDate'):
+            if fields[key] != '-':
+                result[key] = fields[key]
         
         # 如果没找到关键数据
         if result['productName'] == '-' and result['status'] == '-':
-            if 'signin' in response.url.lower():
+            if 'signin' in page['finalUrl'].lower():
                 result['status'] = '需要登录'
             else:
                 result['status'] = '无法获取数据'
@@ -3,47 +3,200 @@
 苹果订单 Web 监控管理
 """
 
-import re
-import requests
 import json
 import time
 import os
 from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from notifier import get_notifier
+from fetch_client import get_fetch_client
+import async_sweep
+from order_scheduler import OrderScheduler
+from history_store import HistoryStore
+from event_hub import EventHub
+from order_registry import OrderRegistry
+from results_state import ResultsState
+from concurrency_limiter import get_limiter
+from circuit_breaker import OPEN, CircuitOpenError, get_breaker
 
+# 提前这么多秒到期的订单并入本轮检查，避免频繁唤醒
+SCHEDULE_SLACK = 5
+# 两次检查之间最短等待秒数
+MIN_SCHEDULE_WAIT = 5
+# 检查订单文件是否被外部修改（如 Telegram Bot 添加订单）的间隔（秒）
+ORDERS_WATCH_INTERVAL = 1
 
 
 class OrderMonitor:
     """订单监控器 - Web 版"""
     
     def __init__(self):
-        self.orders_file = 'orders.txt'
-        self.config_file = 'monitor_config.json'
-        self.history_file = 'order_history.json'
+        # 创建时转换为绝对路径，之后切换工作目录也不会读写到别的文件
+        self.orders_file = os.path.abspath('orders.txt')
+        self.config_file = os.path.abspath('monitor_config.json')
+        self.history_file = os.path.abspath('order_history.json')
+        self.outbox_file = os.path.abspath('notification_outbox.jsonl')
         
         self.running = False
         self.stop_event = threading.Event()
         self.monitor_thread = None
+        self.watch_thread = None
         self.last_check_time = None
         self.check_count = 0
         
         # 默认配置
         self.config = {
             'interval': 300,  # 默认5分钟
-            'threads': 10,
+            'threads': 10,  # 初始并发数（关闭自适应并发时为固定并发数）
             'timeout': 30,
             'auto_start': False,
+            'stream_fetch': False,  # 分块读取页面，字段齐全后提前结束（剩余较多时断开连接，无法复用）
+            'engine': 'threads',  # 检查引擎: threads（线程池）或 async（asyncio，需要 aiohttp）
+            'async_concurrency': 200,  # async 引擎的最大并发请求数
+            'adaptive_concurrency': True,  # 按苹果的响应情况自动调整并发数（AIMD）
+            'min_threads': 2,  # 自适应并发的下限
+            'max_threads': 64,  # 自适应并发的上限
+            'fetch_cache_ttl': 10,  # 查询结果缓存秒数，期间同一订单的查询直接复用（0 为只合并同时进行的查询）
+            'adaptive_schedule': True,  # 按订单状态自适应安排查询时间
+            'status_intervals': {},  # 各状态的查询间隔（秒），如 {"PLACED": 1800}
+            'schedule_backoff': 1.5,  # 状态没有变化时间隔的增长倍数
+            'schedule_max_factor': 4.0,  # 间隔最多增长到基础间隔的倍数
+            'server_workers': 32,  # Web 服务同时处理的请求数
+            'server_keepalive': True,  # Web 服务使用 HTTP/1.1 keep-alive
+            'keepalive_timeout': 10,  # keep-alive 空闲连接超时（秒）
+            'batch_max_concurrency': 50,  # 批量查询接口允许的最大并发数
+            'events_heartbeat': 15,  # 仪表盘事件流的心跳间隔（秒）
+            'notify_digest': True,  # 一轮检查中的状态变更合并成一条汇总通知（CANCELED 仍立即发送）
+            'digest_window': 60,  # 汇总窗口（秒），检查时间较长时每隔这么久发送一次汇总
+            'notify_outbox': True,  # 通知先写入发件箱再发送，重启或断网后继续投递
+            'circuit_breaker': True,  # 苹果页面大面积失败时暂停查询，只用少量订单探测
+            'breaker_failure_ratio': 0.5,  # 一轮检查中失败比例达到这个值时熔断
+            'breaker_min_samples': 20,  # 至少查询这么多次后才判断失败比例
+            'breaker_cooldown': 60,  # 熔断后等待多少秒开始探测
+            'breaker_probes': 3,  # 探测时查询的订单数，全部成功则恢复
+            'breaker_notify': True,  # 熔断和恢复时发送 Telegram 通知
         }
         
-        # 监控结果
-        self.results = {}  # {url: last_result}
-        self.status_changes = []  # 状态变更记录
+        # 监控结果：{url: last_result} 和状态变更记录，读取使用快照（self.results / self.status_changes）
+        self.state = ResultsState()
+        self.last_sweep = {}  # 最近一轮检查的统计
+        
+        # 历史存储：只追加变化的订单，定期合并快照
+        self.history_store = HistoryStore(self.history_file)
+        self.history_lock = threading.Lock()
+        self.dirty_urls = set()  # 待保存的订单
+        self.pending_ops = []  # 待保存的其他操作（清空、状态变更记录等）
+        self.saved_meta = None
+        
+        # 推送给仪表盘的变化事件
+        self.events = EventHub()
+        
+        # 订单列表：内存索引，文件被外部修改时自动重新读取
+        self.registry = OrderRegistry(self.orders_file)
+        self.registry.on_reload = self._on_orders_reloaded
+        # 数据版本号：results、status_changes 或订单列表变化时递增，用于接口的 ETag
+        self.version = 0
+        self.version_lock = threading.Lock()
+        
+        # 查询线程池：检查和优先通道共用，同时查询的订单数不超过线程数
+        self.query_pool = None
+        self.query_pool_size = 0
+        self.query_pool_lock = threading.Lock()
+        
+        # 优先查询通道：新添加的订单不等下一轮检查，插队立即查询
+        self.priority_lock = threading.Lock()
+        self.priority_urls = {}  # {url: 是否发送首次查询结果}，按加入顺序
+        self.priority_inflight = set()
+        self.priority_workers = 0  # 线程池中处理优先通道的任务数
+        self.priority_done = []  # 本批已完成的 (是否发送首次查询结果, 结果)
+        self.priority_started = None  # 本批开始时间
+        self.priority_stats = {'done': 0, 'lastBatch': 0, 'lastSeconds': None}
         
         self.load_config()
         self.load_history()
+        
+        # 通知发件箱：状态变更在写入历史之前先持久化，崩溃后重启会继续投递，不会重复发送
+        if self.config.get('notify_outbox', True):
+            get_notifier().enable_outbox(self.outbox_file)
+        
+        # 自适应调度器
+        self.scheduler = OrderScheduler()
+        self._configure_scheduler()
+        
+        # 熔断器：苹果页面大面积失败时暂停查询，状态变化推送到仪表盘和 Telegram
+        get_breaker().on_change = self._on_breaker_change
+        self._configure_breaker()
+    
+    def _configure_concurrency(self):
+        """设置自适应并发限制器，返回线程池需要的线程数"""
+        adaptive = self.config.get('adaptive_concurrency', True)
+        get_limiter(self.config['threads']).configure(
+            enabled=adaptive,
+            min_limit=self.config.get('min_threads', 2),
+            max_limit=self.config.get('max_threads', 64)
+        )
+        # 自适应时线程数按上限准备，实际并发由限制器控制
+        return self.config.get('max_threads', 64) if adaptive else self.config['threads']
+    
+    def _query_pool(self):
+        """检查和优先通道共用的查询线程池（线程数随配置变化时重建）"""
+        workers = self._configure_concurrency()
+        with self.query_pool_lock:
+            if self.query_pool is None or self.query_pool_size != workers:
+                if self.query_pool is not None:
+                    # 已提交的任务仍会执行完
+                    self.query_pool.shutdown(wait=False)
+                self.query_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+                self.query_pool_size = workers
+            return self.query_pool, workers
+    
+    def _fetch_client(self):
+        """按当前配置（连接池大小、结果缓存时间）取得共享抓取客户端"""
+        client = get_fetch_client(self._configure_concurrency())
+        client.set_cache_ttl(self.config.get('fetch_cache_ttl', 10))
+        return client
+    
+    def batch_concurrency(self, requested):
+        """批量查询的并发数：不超过配置的上限，也不超过抓取连接池的大小"""
+        limit = min(self.config.get('batch_max_concurrency', 50), self._fetch_client().pool_size)
+        return min(max(1, requested), limit)
+    
+    def _configure_breaker(self):
+        get_breaker().configure(
+            enabled=self.config.get('circuit_breaker', True),
+            failure_ratio=self.config.get('breaker_failure_ratio', 0.5),
+            min_samples=self.config.get('breaker_min_samples', 20),
+            cooldown=self.config.get('breaker_cooldown', 60),
+            probes=self.config.get('breaker_probes', 3)
+        )
+    
+    def _on_breaker_change(self, state, reason):
+        """熔断器状态变化：记录日志、推送仪表盘，按配置发送 Telegram 通知"""
+        if state == OPEN:
+            print(f"⛔ 熔断：苹果订单页面大量失败，暂停查询 ({reason})")
+            text = (f"⛔ <b>苹果订单页面大量失败，已暂停查询</b>\n\n"
+                    f"原因: {reason}\n"
+                    f"{self.config.get('breaker_cooldown', 60)} 秒后用少量订单探测，恢复后自动继续")
+        else:
+            print(f"✅ 熔断恢复：{reason}，继续正常查询")
+            text = f"✅ <b>苹果订单页面已恢复，继续正常查询</b>\n\n{reason}"
+        self.publish_status()
+        if self.config.get('breaker_notify', True):
+            try:
+                get_notifier().send_message(text, urgent=True)
+            except Exception as e:
+                print(f"发送熔断通知失败: {e}")
+    
+    def _configure_scheduler(self):
+        self.scheduler.configure(
+            base_interval=self.config['interval'],
+            status_intervals=self.config.get('status_intervals') or {},
+            backoff=self.config.get('schedule_backoff', 1.5),
+            max_factor=self.config.get('schedule_max_factor', 4.0)
+        )
     
     def load_config(self):
         if os.path.exists(self.config_file):
@@ -67,362 +220,689 @@ class OrderMonitor:
             return False
     
     def load_history(self):
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    data = json.load(f)
-                    self.results = data.get('results', {})
-                    self.status_changes = data.get('changes', [])
-                    self.last_check_time = data.get('last_check_time', None)
-                    self.check_count = data.get('check_count', 0)
-            except Exception as e:
-                print(f"加载历史失败: {e}")
+        try:
+            state = self.history_store.load()
+            self.state.load(state['results'], state['changes'])
+            self.last_check_time = state['last_check_time']
+            self.check_count = state['check_count']
+            self.saved_meta = (self.last_check_time, self.check_count)
+        except Exception as e:
+            print(f"加载历史失败: {e}")
+    
+    @property
+    def results(self):
+        """所有订单结果的只读快照 {url: result}"""
+        return self.state.snapshot()
+    
+    @property
+    def status_changes(self):
+        """状态变更记录的只读快照"""
+        return self.state.changes()
     
     def save_history(self):
+        """保存变化的部分：追加到日志，日志过长时合并为快照"""
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump({
-                    'results': self.results,
-                    'changes': self.status_changes[-100:],  # 只保留最近100条
-                    'last_check_time': self.last_check_time,
-                    'check_count': self.check_count,
-                    'last_save': datetime.now().isoformat()
-                }, f, indent=2)
+            with self.history_lock:
+                ops = self.pending_ops
+                self.pending_ops = []
+                dirty = self.dirty_urls
+                self.dirty_urls = set()
+            
+            for url in dirty:
+                result = self.state.get(url)
+                if result is None:
+                    ops.append({'op': 'del', 'url': url})
+                else:
+                    ops.append({'op': 'put', 'url': url, 'result': result})
+            
+            meta = (self.last_check_time, self.check_count)
+            if meta != self.saved_meta:
+                ops.append({'op': 'meta', 'last_check_time': self.last_check_time, 'check_count': self.check_count})
+                self.saved_meta = meta
+            
+            self.history_store.append(ops)
+            
+            if self.history_store.needs_compaction(len(self.state)):
+                self.compact_history()
             return True
         except Exception as e:
             print(f"保存历史失败: {e}")
             return False
     
+    def compact_history(self):
+        """把完整状态写入快照，并从日志中去掉快照已包含的记录"""
+        # 先取 seq 再取快照：取快照期间其他线程追加的日志记录会保留下来，不会被清掉
+        seq = self.history_store.current_seq()
+        results, changes = self.state.snapshot_all()
+        self.history_store.compact(results, changes, self.last_check_time, self.check_count, upto_seq=seq)
+    
+    def bump_version(self):
+        """数据已修改，版本号加一"""
+        with self.version_lock:
+            self.version += 1
+            return self.version
+    
+    def mark_dirty(self, url, publish=True):
+        """标记订单结果已修改，下次 save_history 时写入，并推送给仪表盘"""
+        with self.history_lock:
+            self.dirty_urls.add(url)
+        self.bump_version()
+        if not publish:
+            return
+        result = self.state.get(url)
+        if result is None:
+            self.events.publish('result_removed', {'url': url})
+        else:
+            self.events.publish('order', {'url': url, 'result': result})
+    
+    def set_result(self, url, result):
+        """更新订单结果"""
+        result.pop('unchanged', None)  # 只用于本次查询的标记，不保存
+        self.state.put(url, result)
+        self.mark_dirty(url)
+    
+    def remove_result(self, url, publish=True):
+        """删除订单结果，返回是否存在（批量操作时 publish=False，由批量事件通知仪表盘）"""
+        if self.state.pop(url) is None:
+            return False
+        self.mark_dirty(url, publish)
+        return True
+    
+    def clear_results(self):
+        """清空所有订单结果，返回清空的数量"""
+        count = self.state.clear()
+        with self.history_lock:
+            self.dirty_urls.clear()
+            self.pending_ops.append({'op': 'clear'})
+        self.bump_version()
+        self.events.publish('results_cleared', {})
+        return count
+    
+    def add_change(self, change):
+        """追加状态变更记录"""
+        self.state.add_change(change)
+        with self.history_lock:
+            self.pending_ops.append({'op': 'change', 'change': change})
+        self.bump_version()
+        self.events.publish('change', change)
+    
     def get_orders(self):
         """获取所有订单链接"""
-        orders = []
-        if os.path.exists(self.orders_file):
+        return self.registry.urls()
+    
+    def orders_version(self):
+        """订单文件版本标识，用于识别外部编辑"""
+        return self.registry.version()
+    
+    def _on_orders_reloaded(self, added):
+        """订单文件被外部修改（如 Telegram Bot 添加了订单）：新订单立即查询并把首次结果发到 Telegram"""
+        self.bump_version()
+        self.events.publish('orders', {'orders': self.registry.url_list})
+        new_urls = [url for url in added if url not in self.state]
+        if new_urls:
+            print(f"📥 订单文件新增 {len(new_urls)} 个订单，加入优先查询")
+            self.prioritize(new_urls, notify_first=True)
+    
+    def _watch_orders(self):
+        """监视订单文件（监控运行期间）：Bot 添加的订单在约 1 秒内进入优先查询通道"""
+        while not self.stop_event.wait(ORDERS_WATCH_INTERVAL):
             try:
-                with open(self.orders_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#') and line.startswith('http'):
-                            orders.append(line)
+                self.registry.refresh()
             except Exception as e:
-                print(f"读取订单失败: {e}")
-        return orders
+                print(f"检查订单文件失败: {e}")
+    
+    def prioritize(self, urls, notify_first=False):
+        """
+        新订单加入优先查询通道：立即查询，不等待下一轮检查
+        
+        优先通道与检查共用查询线程池：检查进行中时，检查的线程先取优先通道中的订单，
+        同时查询的订单数不会因此增加。notify_first=True 时查询完成后把首次结果发送到 Telegram。
+        
+        Returns:
+            int: 新加入通道的订单数
+        """
+        count = 0
+        with self.priority_lock:
+            for url in urls:
+                if url in self.priority_inflight or url in self.priority_urls:
+                    continue
+                self.priority_urls[url] = notify_first
+                count += 1
+            if not count:
+                return 0
+            pool, workers = self._query_pool()
+            extra = min(len(self.priority_urls), workers) - self.priority_workers
+            self.priority_workers += max(0, extra)
+        for _ in range(extra):
+            pool.submit(self._run_priority_lane)
+        return count
+    
+    def _take_priority(self):
+        """取出优先通道中的下一个订单，没有时返回 None"""
+        with self.priority_lock:
+            if not self.priority_urls:
+                return None
+            url = next(iter(self.priority_urls))
+            notify_first = self.priority_urls.pop(url)
+            self.priority_inflight.add(url)
+            if self.priority_started is None:
+                self.priority_started = time.time()
+            return url, notify_first
+    
+    def _check_priority(self, url, notify_first):
+        """查询优先通道中的一个订单；本批最后一个完成时保存历史并发送首次查询结果"""
+        try:
+            result = self.check_one(url, sweep=True)
+        except Exception as e:
+            print(f"优先查询出错: {e}")
+            result = self._error_result(url, e)
+        with self.priority_lock:
+            self.priority_inflight.discard(url)
+            self.priority_done.append((notify_first, result))
+            if self.priority_urls or self.priority_inflight:
+                return
+            batch = self.priority_done
+            started = self.priority_started
+            self.priority_done = []
+            self.priority_started = None
+        
+        self.priority_stats['done'] += len(batch)
+        self.priority_stats['lastBatch'] = len(batch)
+        self.priority_stats['lastSeconds'] = round(time.time() - started, 2)
+        print(f"⚡ 优先查询完成 {len(batch)} 个新订单，耗时 {self.priority_stats['lastSeconds']} 秒")
+        self.save_history()
+        
+        first_results = [result for notify, result in batch if notify and not result.get('skipped')]
+        if first_results:
+            try:
+                get_notifier().send_first_status(first_results)
+            except Exception as e:
+                print(f"发送首次查询结果失败: {e}")
+    
+    def _run_priority_lane(self):
+        """线程池任务：查询优先通道中的订单，直到通道为空"""
+        try:
+            while True:
+                item = self._take_priority()
+                if item is None:
+                    return
+                self._check_priority(*item)
+        finally:
+            with self.priority_lock:
+                self.priority_workers -= 1
     
     def add_order(self, url):
         """添加订单"""
         if not url or not url.startswith('http'):
             return False, "无效的链接"
         
-        orders = self.get_orders()
-        if url in orders:
+        details = self.add_orders([url])
+        if details['success']:
+            return True, "添加成功"
+        if details['skipped']:
             return False, "订单已存在"
+        return False, details['failed'][0]['reason']
+    
+    def add_orders(self, urls):
+        """
+        批量添加订单：内存中校验去重，一次写入订单文件，一次保存历史
+        
+        Returns:
+            dict: {'success': [url], 'failed': [{url, reason}], 'skipped': [{url, reason}]}
+        """
+        details = {'success': [], 'failed': [], 'skipped': []}
+        valid = []
+        for url in urls:
+            url = (url or '').strip()
+            if not url:
+                continue
+            if not url.startswith('http'):
+                details['failed'].append({'url': url, 'reason': '无效的链接格式'})
+                continue
+            valid.append(url)
         
         try:
-            with open(self.orders_file, 'a', encoding='utf-8') as f:
-                f.write(f"{url}\n")
-            
-            # 从结果中删除该订单的历史记录（如果有）
-            # 这样下次监控时会强制重新查询
-            if url in self.results:
-                print(f"⚠️ 删除订单 {url} 的历史记录，将在下次监控时重新查询")
-                del self.results[url]
-                self.save_history()
-            
-            return True, "添加成功"
+            added, existed = self.registry.add(valid)
         except Exception as e:
-            return False, str(e)
+            details['failed'].extend({'url': url, 'reason': str(e)} for url in valid)
+            return details
+        details['success'] = added
+        details['skipped'] = [{'url': url, 'reason': '订单已存在'} for url in existed]
+        if not added:
+            return details
+        
+        # 从结果中删除这些订单的历史记录（如果有）
+        # 这样下次监控时会强制重新查询
+        stale = [url for url in added if url in self.state]
+        for url in stale:
+            print(f"⚠️ 删除订单 {url} 的历史记录，将在下次监控时重新查询")
+            self.remove_result(url, publish=False)
+        for url in added:
+            self.scheduler.remove(url)
+        if stale:
+            self.save_history()
+        
+        self.bump_version()
+        self.events.publish('orders_added', {'urls': added})
+        return details
     
     def delete_order(self, url):
         """删除订单"""
-        orders = self.get_orders()
-        if url not in orders:
+        details = self.delete_orders([url])
+        if details['error']:
+            return False, details['error']
+        if not details['deleted']:
             return False, "订单不存在"
+        return True, "删除成功"
+    
+    def delete_orders(self, urls):
+        """
+        批量删除订单：一次重写订单文件，一次保存历史
         
+        Returns:
+            dict: {'deleted': [url], 'missing': [url], 'error': 错误信息或 None}
+        """
+        urls = [url.strip() for url in urls if url and url.strip()]
+        details = {'deleted': [], 'missing': [], 'error': None}
         try:
-            # 重写文件
-            with open(self.orders_file, 'w', encoding='utf-8') as f:
-                f.write("# 苹果订单链接列表\n# 每行一个链接\n\n")
-                for order in orders:
-                    if order != url:
-                        f.write(f"{order}\n")
-            
-            # 从结果中删除
-            if url in self.results:
-                del self.results[url]
+            deleted = self.registry.remove(urls)
+        except Exception as e:
+            details['error'] = str(e)
+            return details
+        deleted_set = set(deleted)
+        details['deleted'] = deleted
+        details['missing'] = [url for url in dict.fromkeys(urls) if url not in deleted_set]
+        if not deleted:
+            return details
+        
+        # 从结果中删除
+        for url in deleted:
+            if self.remove_result(url, publish=False):
                 print(f"🗑️ 删除订单历史记录: {url}")
-            
-            # 同时从状态变更记录中删除相关记录
-            self.status_changes = [
-                change for change in self.status_changes 
-                if change.get('url') != url
-            ]
-            
-            # 保存历史记录(持久化删除操作)
-            self.save_history()
-            
-            return True, "删除成功"
+            self.scheduler.remove(url)
+        
+        # 同时从状态变更记录和通知发件箱中删除相关记录（重新添加后按新订单通知）
+        self.state.drop_changes(deleted_set)
+        try:
+            get_notifier().forget_orders(deleted)
         except Exception as e:
-            return False, str(e)
+            print(f"清除发件箱记录失败: {e}")
+        with self.history_lock:
+            self.pending_ops.extend({'op': 'drop_changes', 'url': url} for url in deleted)
+        
+        # 保存历史记录(持久化删除操作)
+        self.save_history()
+        self.bump_version()
+        self.events.publish('orders_deleted', {'urls': deleted})
+        return details
     
-    def query_order(self, url):
-        """查询单个订单"""
+    def query_order(self, url, timeout=None, sweep=False):
+        """
+        查询单个订单（timeout 默认使用配置中的超时）
+        
+        sweep=True 表示后台检查（检查和优先通道），经过自适应并发限制器；
+        手动查询和批量查询页面不经过限制器。
+        """
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-            }
-            
-            session = requests.Session()
-            response = session.get(url, headers=headers, timeout=self.config['timeout'], allow_redirects=True)
-            html = response.text
+            client = self._fetch_client()
+            page = client.fetch_order(url, timeout=timeout or self.config['timeout'],
+                                      stream=self.config.get('stream_fetch', False), sweep=sweep)
+            return self._build_result(url, page)
             
-            # 获取之前的查询次数
-            previous_query_count = 0
-            if url in self.results:
-                previous_query_count = self.results[url].get('queryCount', 0)
-            
-            result = {
-                'success': True,
-                'url': url,
-                'orderNumber': '-',
-                'orderDate': '-',
-                'productName': '-',
-                'status': '-',
-                'deliveryDate': '-',
-                'trackingUrl': '-',
-                'trackingNumber': '-',
-                'timestamp': datetime.now().isoformat(),
-                'queryCount': previous_query_count + 1  # 查询次数加1
-            }
+        except Exception as e:
+            return self._error_result(url, e)
+    
+    def _build_result(self, url, page):
+        """
+        根据抓取到的页面构造查询结果
+        
+        订单内容的指纹和上次成功查询相同时，直接复用上次的结果并标记 unchanged，
+        _apply_result 只更新查询次数和时间。
+        """
+        # 获取之前的查询次数
+        previous_query_count = 0
+        previous = self.state.get(url)
+        if previous:
+            previous_query_count = previous.get('queryCount', 0)
+            if previous.get('success') and previous.get('fingerprint') == page['fingerprint']:
+                return dict(previous, unchanged=True, timestamp=datetime.now().isoformat(),
+                            queryCount=previous_query_count + 1, bytesRead=page['bytesRead'])
+        
+        result = {
+            'success': True,
+            'url': url,
+            'orderNumber': '-',
+            'orderDate': '-',
+            'productName': '-',
+            'status': '-',
+            'deliveryDate': '-',
+            'trackingUrl': '-',
+            'trackingNumber': '-',
+            'timestamp': datetime.now().isoformat(),
+            'queryCount': previous_query_count + 1,  # 查询次数加1
+            'bytesRead': page['bytesRead'],
+            'fingerprint': page['fingerprint']
+        }
+        
+        result.update(page['fields'])
+        
+        return result
+    
+    def _error_result(self, url, error):
+        result = {
+            'success': False,
+            'url': url,
+            'error': str(error),
+            'timestamp': datetime.now().isoformat()
+        }
+        if isinstance(error, CircuitOpenError):
+            # 熔断中请求没有发出，不算查询失败
+            result['skipped'] = True
+        return result
+    
+    def check_one(self, url, sweep=False):
+        """查询单个订单并合并结果"""
+        return self._apply_result(url, self.query_order(url, sweep=sweep))
+    
+    def _apply_result(self, url, result):
+        """检查状态变化、发送通知并合并查询结果"""
+        # 同一订单可能同时在优先通道、检查和手动查询中，按订单加锁依次合并
+        if result.get('skipped'):
+            # 熔断中没有查询：保留旧结果，订单仍然到期，恢复后再查询
+            return result
+        with self.state.url_lock(url):
+            return self._merge_result(url, result)
+    
+    def _merge_result(self, url, result):
+        previous = self.state.get(url)
+        if result.get('unchanged') and previous is not None:
+            # 订单内容没有变化：只在内存中更新查询次数和时间，不比较状态、不写历史
+            self.state.update(url, queryCount=result['queryCount'], timestamp=result['timestamp'])
+            self.scheduler.record(url, previous.get('status'), changed=False)
+            return result
+        
+        old_status = None
+        
+        # 检查状态变化
+        if previous is not None:
+            old_status = previous.get('status')
+            new_status = result.get('status')
             
-            # 提取订单号
-            m = re.search(r'"orderNumber"\s*:\s*"([^"]+)"', html)
-            if m:
-                result['orderNumber'] = m.group(1)
+            print(f"📊 检查订单: {result.get('orderNumber')}, 旧状态={old_status}, 新状态={new_status}, 查询成功={result.get('success')}")
             
-            # 提取下单日期
-            m = re.search(r'"orderPlacedDate"\s*:\s*"([^"]+)"', html)
-            if m:
-                result['orderDate'] = m.group(1)
+            # 只有在查询成功且新旧状态都是有效状态时，才判断状态变化
+            # 过滤掉 '-', None, '' 等无效状态
+            valid_statuses = ['PLACED', 'PROCESSING', 'PREPARED_FOR_SHIPMENT', 'SHIPPED', 'DELIVERED', 'CANCELED']
+            old_valid = old_status in valid_statuses
+            new_valid = new_status in valid_statuses
             
-            # 提取产品名称
-            m = re.search(r'"productName"\s*:\s*"([^"]+)"', html)
-            if m:
-                result['productName'] = m.group(1)
+            print(f"   旧状态有效={old_valid}, 新状态有效={new_valid}, 状态是否变化={old_status != new_status}")
             
-            # 提取状态
-            m = re.search(r'"currentStatus"\s*:\s*"([^"]+)"', html)
-            if m:
-                result['status'] = m.group(1)
+            # 只要状态发生变化就发送通知（但两个状态都必须是有效的）
+            if (old_status != new_status and 
+                result.get('success') and 
+                old_valid and 
+                new_valid):
+                # 记录状态变化
+                change = {
+                    'url': url,
+                    'orderNumber': result.get('orderNumber'),
+                    'productName': result.get('productName'),
+                    'oldStatus': old_status,
+                    'newStatus': new_status,
+                    'timestamp': datetime.now().isoformat()
+                }
+                self.add_change(change)
+
+                # 发送 Telegram 通知
+                try:
+                    notifier = get_notifier()
+                    enabled_bots = notifier.get_enabled_bots()
+                    if enabled_bots:
+                        status_emoji = {
+                            'CANCELED': '🚨',
+                            'SHIPPED': '📦',
+                            'DELIVERED': '✅',
+                            'PROCESSING': '⚙️',
+                            'PREPARED_FOR_SHIPMENT': '📋',
+                            'PLACED': '📝'
+                        }
+                        emoji = status_emoji.get(new_status, '📢')
+                        print(f"{emoji} 订单 {result.get('orderNumber')} 状态变更: {old_status} → {new_status}，发送通知到 {len(enabled_bots)} 个机器人")
+                        # 旧状态开始的时间标识这次变化：崩溃重启后重新检测到时不会重复通知
+                        notifier.send_order_notification(result, old_status, since=previous.get('statusSince', ''))
+                    else:
+                        print(f"⚠️ 没有启用的 Telegram 机器人，跳过通知")
+                except Exception as e:
+                    print(f"发送通知失败: {e}")
+        else:
+            # 第一次查询该订单
+            print(f"🆕 首次查询订单: {result.get('orderNumber')}, 状态={result.get('status')}, 查询成功={result.get('success')}")
+            # 只有首次查询就是 CANCELED 状态时才发送通知
+            if result.get('success') and result.get('status') == 'CANCELED':
+                print(f"🚨 首次查询订单 {result.get('orderNumber')}，状态: CANCELED，发送通知")
+                try:
+                    notifier = get_notifier()
+                    enabled_bots = notifier.get_enabled_bots()
+                    if enabled_bots:
+                        notifier.send_order_notification(result, None)
+                    else:
+                        print(f"⚠️ 没有启用的 Telegram 机器人，跳过通知")
+                except Exception as e:
+                    print(f"发送通知失败: {e}")
             else:
-                m = re.search(r'"statusDescription"\s*:\s*"([^"]+)"', html)
-                if m:
-                    result['status'] = m.group(1)
-            
-            # 提取配送日期
-            m = re.search(r'"deliveryDate"\s*:\s*"([^"]+)"', html)
-            if m:
-                result['deliveryDate'] = m.group(1)
+                # 其他状态的首次查询不发送通知
+                print(f"📥 首次查询订单 {result.get('orderNumber')}，状态: {result.get('status')}（不发送通知）")
+        
+        # 只有查询成功且信息完整时才更新历史记录
+        # 避免查询失败的结果覆盖之前的有效数据
+        if result.get('success'):
+            order_number = result.get('orderNumber', '-')
+            status = result.get('status', '-')
             
-            # 提取物流追踪链接和单号 (UPS tracking)
-            m = re.search(r'"trackingUrl"\s*:\s*"([^"]+)"', html)
-            if m:
-                result['trackingUrl'] = m.group(1)
-                # 从 URL 中提取追踪单号 (支持多种 URL 格式)
-                # 格式1: InquiryNumber1=单号 或 InquiryNumber=单号
-                tracking_match = re.search(r'[?&]InquiryNumber\d*=([A-Z0-9]+)', m.group(1))
-                if not tracking_match:
-                    # 格式2: trackingNumber=单号
-                    tracking_match = re.search(r'[?&]trackingNumber=([A-Z0-9]+)', m.group(1))
-                if tracking_match:
-                    result['trackingNumber'] = tracking_match.group(1)
+            # 检查是否获取到有效信息
+            if order_number != '-' and status != '-':
+                # 信息完整,更新结果（statusSince 记录当前状态第一次查询到的时间）
+                if previous is not None and previous.get('success') and previous.get('status') == status:
+                    result['statusSince'] = previous.get('statusSince') or previous.get('timestamp')
+                else:
+                    result['statusSince'] = result.get('timestamp')
+                self.set_result(url, result)
+                print(f"✅ 更新订单记录: {order_number}, 状态={status}")
             else:
-                # 尝试其他可能的字段名
-                m = re.search(r'(https?://[^"\s]+ups\.com[^"\s]+)', html)
-                if m:
-                    result['trackingUrl'] = m.group(1)
-                    # 从 URL 中提取追踪单号
-                    tracking_match = re.search(r'[?&]InquiryNumber\d*=([A-Z0-9]+)', m.group(1))
-                    if not tracking_match:
-                        tracking_match = re.search(r'[?&]trackingNumber=([A-Z0-9]+)', m.group(1))
-                    if tracking_match:
-                        result['trackingNumber'] = tracking_match.group(1)
-            
-            # 如果没有从 URL 提取到，尝试直接提取追踪单号
-            if result['trackingNumber'] == '-':
-                m = re.search(r'"trackingNumber"\s*:\s*"([^"]+)"', html)
-                if m:
-                    result['trackingNumber'] = m.group(1)
-            
-            return result
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'url': url,
-                'error': str(e),
-                'timestamp': datetime.now().isoformat()
-            }
-    
-    def check_all_orders(self):
-        """检查所有订单 - 智能检查，只查询信息不完整的订单"""
+                # 信息不完整,保留旧记录(如果有的话)
+                if previous is not None:
+                    print(f"⚠️ 查询结果不完整,保留旧记录: {previous.get('orderNumber')}")
+                    # 只更新查询次数和时间戳
+                    self.state.update(url, queryCount=result.get('queryCount', 1), timestamp=result.get('timestamp'))
+                    self.mark_dirty(url)
+                else:
+                    # 首次查询就不完整,仍然保存,但标记为失败
+                    result['success'] = False
+                    self.set_result(url, result)
+                    print(f"⚠️ 首次查询结果不完整: {url}")
+        else:
+            # 查询失败,保留旧记录(如果有的话)
+            if previous is not None:
+                print(f"❌ 查询失败,保留旧记录: {previous.get('orderNumber')}")
+                # 只更新查询次数和时间戳
+                self.state.update(url, queryCount=result.get('queryCount', 1), timestamp=result.get('timestamp'))
+                self.mark_dirty(url)
+            else:
+                # 首次查询就失败,保存失败记录
+                self.set_result(url, result)
+                print(f"❌ 首次查询失败: {url}")
+        
+        # 安排下次查询
+        current = self.state.get(url) or {}
+        if current.get('success'):
+            new_status = current.get('status')
+            self.scheduler.record(url, new_status, changed=new_status != old_status)
+        else:
+            self.scheduler.record(url, '-', changed=True)
+        
+        return result
+    
+    def check_all_orders(self, due_only=False):
+        """
+        检查所有订单 - 智能检查，只查询信息不完整的订单
+        
+        due_only=True 时只查询调度器中已到期的订单（监控循环使用），
+        手动检查时查询所有未完成的订单。
+        """
         orders = self.get_orders()
         if not orders:
             return []
         
         results = []
+        known = self.results  # 本轮开始时的快照
+        self._configure_scheduler()
+        self.scheduler.sync(orders, known)
+        due_before = time.time() + SCHEDULE_SLACK
+        due_later = 0
         
         # 第一步：识别需要查询的订单
         orders_to_check = []
         for url in orders:
-            # 如果从未查询过，需要查询
-            if url not in self.results:
-                orders_to_check.append(url)
+            # 新订单正在优先通道中查询
+            if url in self.priority_inflight or url in self.priority_urls:
                 continue
             
-            # 如果之前查询失败，需要重新查询
-            prev_result = self.results[url]
-            if not prev_result.get('success'):
+            # 如果从未查询过，需要查询
+            if url not in known:
                 orders_to_check.append(url)
                 continue
             
             # 如果订单已取消或已送达，跳过查询（终态）
+            prev_result = known[url]
             status = prev_result.get('status', '')
-            if status in ['CANCELED', 'DELIVERED']:
+            if prev_result.get('success') and status in ['CANCELED', 'DELIVERED']:
                 continue
             
-            # 其他所有状态都需要持续查询（追踪状态变化）
+            # 之前查询失败的订单需要重新查询，其他所有状态都需要持续查询（追踪状态变化）
             # 包括: SHIPPED, PROCESSING, PREPARED_FOR_SHIPMENT, PLACED 等
+            # 按调度只查询已到期的订单
+            if due_only and not self.scheduler.is_due(url, due_before):
+                due_later += 1
+                continue
             orders_to_check.append(url)
         
-        print(f"📊 总订单数: {len(orders)}, 需要查询: {len(orders_to_check)}, 已完成: {len(orders) - len(orders_to_check)}")
+        finished = len(orders) - len(orders_to_check) - due_later
+        print(f"📊 总订单数: {len(orders)}, 现在到期: {len(orders_to_check)}, 稍后到期: {due_later}, 已完成: {finished}")
+        
+        # 熔断中：冷却期间不查询，冷却结束后只用几个订单探测
+        breaker = get_breaker()
+        self._configure_breaker()
+        budget = breaker.sweep_budget(len(orders_to_check))
+        if orders_to_check and budget == 0:
+            print(f"⛔ 熔断中，{int(breaker.retry_in())} 秒后开始探测，本轮跳过 {len(orders_to_check)} 个订单")
+            self.publish_status()
+            return []
+        if budget < len(orders_to_check):
+            # 优先用上次查询成功的订单探测，排除链接本身有问题的情况
+            orders_to_check.sort(key=lambda url: not known.get(url, {}).get('success'))
+            orders_to_check = orders_to_check[:budget]
+            print(f"🩺 熔断探测：只查询 {budget} 个订单")
+        breaker.begin_sweep()
         
         # 如果没有需要查询的订单，直接返回
         if not orders_to_check:
-            print("✅ 所有订单信息已完整，无需查询")
+            if due_later:
+                print("✅ 暂无到期的订单")
+            else:
+                print("✅ 所有订单信息已完整，无需查询")
             self.last_check_time = datetime.now().isoformat()
             self.check_count += 1
             self.save_history()
+            self.publish_status()
             return []
         
-        def check_one(url):
-            result = self.query_order(url)
-            
-            # 检查状态变化
-            if url in self.results:
-                old_status = self.results[url].get('status')
-                new_status = result.get('status')
-                
-                print(f"📊 检查订单: {result.get('orderNumber')}, 旧状态={old_status}, 新状态={new_status}, 查询成功={result.get('success')}")
-                
-                # 只有在查询成功且新旧状态都是有效状态时，才判断状态变化
-                # 过滤掉 '-', None, '' 等无效状态
-                valid_statuses = ['PLACED', 'PROCESSING', 'PREPARED_FOR_SHIPMENT', 'SHIPPED', 'DELIVERED', 'CANCELED']
-                old_valid = old_status in valid_statuses
-                new_valid = new_status in valid_statuses
-                
-                print(f"   旧状态有效={old_valid}, 新状态有效={new_valid}, 状态是否变化={old_status != new_status}")
-                
-                # 只要状态发生变化就发送通知（但两个状态都必须是有效的）
-                if (old_status != new_status and 
-                    result.get('success') and 
-                    old_valid and 
-                    new_valid):
-                    # 记录状态变化
-                    change = {
-                        'url': url,
-                        'orderNumber': result.get('orderNumber'),
-                        'productName': result.get('productName'),
-                        'oldStatus': old_status,
-                        'newStatus': new_status,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    self.status_changes.append(change)
-
-                    # 发送 Telegram 通知
-                    try:
-                        notifier = get_notifier()
-                        enabled_bots = notifier.get_enabled_bots()
-                        if enabled_bots:
-                            status_emoji = {
-                                'CANCELED': '🚨',
-                                'SHIPPED': '📦',
-                                'DELIVERED': '✅',
-                                'PROCESSING': '⚙️',
-                                'PREPARED_FOR_SHIPMENT': '📋',
-                                'PLACED': '📝'
-                            }
-                            emoji = status_emoji.get(new_status, '📢')
-                            print(f"{emoji} 订单 {result.get('orderNumber')} 状态变更: {old_status} → {new_status}，发送通知到 {len(enabled_bots)} 个机器人")
-                            notifier.send_order_notification(result, old_status)
-                        else:
-                            print(f"⚠️ 没有启用的 Telegram 机器人，跳过通知")
-                    except Exception as e:
-                        print(f"发送通知失败: {e}")
+        engine = self.config.get('engine', 'threads')
+        if engine == 'async' and not async_sweep.is_available():
+            print("⚠️ 未安装 aiohttp，无法使用异步引擎，改用线程池")
+            engine = 'threads'
+        
+        print(f"🔍 开始查询 {len(orders_to_check)} 个订单 (引擎: {engine})...")
+        self.publish_status()
+        sweep_start = time.time()
+        notifier = get_notifier()
+        notifier.configure_digest(self.config.get('notify_digest', True), self.config.get('digest_window', 60))
+        notifier.begin_digest()
+        # 同时设置连接池大小和结果缓存时间（两种引擎共用同一个合并/缓存层）
+        workers = self._configure_concurrency()
+        get_fetch_client(workers).set_cache_ttl(self.config.get('fetch_cache_ttl', 10))
+        try:
+            if engine == 'async':
+                # 单个事件循环 + 信号量，可同时进行数百个请求
+                sweep_engine = async_sweep.AsyncSweepEngine(
+                    concurrency=self.config.get('async_concurrency', 200),
+                    timeout=self.config['timeout'],
+                    stream=self.config.get('stream_fetch', False)
+                )
+                results = sweep_engine.run(orders_to_check, self._build_result,
+                                           self._error_result, self._apply_result)
+                stream_stats = sweep_engine.stats
             else:
-                # 第一次查询该订单
-                print(f"🆕 首次查询订单: {result.get('orderNumber')}, 状态={result.get('status')}, 查询成功={result.get('success')}")
-                # 只有首次查询就是 CANCELED 状态时才发送通知
-                if result.get('success') and result.get('status') == 'CANCELED':
-                    print(f"🚨 首次查询订单 {result.get('orderNumber')}，状态: CANCELED，发送通知")
-                    try:
-                        notifier = get_notifier()
-                        enabled_bots = notifier.get_enabled_bots()
-                        if enabled_bots:
-                            notifier.send_order_notification(result, None)
-                        else:
-                            print(f"⚠️ 没有启用的 Telegram 机器人，跳过通知")
-                    except Exception as e:
-                        print(f"发送通知失败: {e}")
-                else:
-                    # 其他状态的首次查询不发送通知
-                    print(f"📥 首次查询订单 {result.get('orderNumber')}，状态: {result.get('status')}（不发送通知）")
-            
-            # 只有查询成功且信息完整时才更新历史记录
-            # 避免查询失败的结果覆盖之前的有效数据
-            if result.get('success'):
-                order_number = result.get('orderNumber', '-')
-                status = result.get('status', '-')
+                # 使用共用的查询线程池，每个线程先取优先通道中的新订单，再取本轮的订单
+                stream_before = get_fetch_client().get_stats()['stream']
+                pool, _ = self._query_pool()
+                pending = deque(orders_to_check)
+                checked = {}
                 
-                # 检查是否获取到有效信息
-                if order_number != '-' and status != '-':
-                    # 信息完整,更新结果
-                    self.results[url] = result
-                    print(f"✅ 更新订单记录: {order_number}, 状态={status}")
-                else:
-                    # 信息不完整,保留旧记录(如果有的话)
-                    if url in self.results:
-                        print(f"⚠️ 查询结果不完整,保留旧记录: {self.results[url].get('orderNumber')}")
-                        # 只更新查询次数和时间戳
-                        self.results[url]['queryCount'] = result.get('queryCount', 1)
-                        self.results[url]['timestamp'] = result.get('timestamp')
-                    else:
-                        # 首次查询就不完整,仍然保存,但标记为失败
-                        result['success'] = False
-                        self.results[url] = result
-                        print(f"⚠️ 首次查询结果不完整: {url}")
-            else:
-                # 查询失败,保留旧记录(如果有的话)
-                if url in self.results:
-                    print(f"❌ 查询失败,保留旧记录: {self.results[url].get('orderNumber')}")
-                    # 只更新查询次数和时间戳
-                    self.results[url]['queryCount'] = result.get('queryCount', 1)
-                    self.results[url]['timestamp'] = result.get('timestamp')
-                else:
-                    # 首次查询就失败,保存失败记录
-                    self.results[url] = result
-                    print(f"❌ 首次查询失败: {url}")
-            
-            return result
+                def sweep_worker():
+                    while True:
+                        item = self._take_priority()
+                        if item is not None:
+                            self._check_priority(*item)
+                            continue
+                        try:
+                            url = pending.popleft()
+                        except IndexError:
+                            return
+                        checked[url] = self.check_one(url, sweep=True)
+                
+                futures = [pool.submit(sweep_worker) for _ in range(min(workers, len(orders_to_check)))]
+                for future in futures:
+                    future.result()
+                results = [checked[url] for url in orders_to_check]
+                stream_after = get_fetch_client().get_stats()['stream']
+                stream_stats = {key: stream_after[key] - stream_before[key] for key in stream_after}
+        finally:
+            # 本轮的状态变更合并成汇总通知发送
+            notifier.end_digest()
         
-        # 使用线程池查询需要检查的订单
-        print(f"🔍 开始查询 {len(orders_to_check)} 个订单...")
-        with ThreadPoolExecutor(max_workers=self.config['threads']) as executor:
-            results = list(executor.map(check_one, orders_to_check))
+        # 本轮流量统计
+        unchanged = sum(1 for r in results if r.get('unchanged'))
+        changed = sum(1 for r in results if r.get('success') and not r.get('unchanged'))
+        skipped = sum(1 for r in results if r.get('skipped'))
+        self.last_sweep = {
+            'engine': engine,
+            'orders': len(orders_to_check),
+            'dueNow': len(orders_to_check),
+            'dueLater': due_later,
+            'seconds': round(time.time() - sweep_start, 2),
+            'bytesRead': sum(r.get('bytesRead', 0) for r in results),
+            'earlyExits': stream_stats['earlyExits'],
+            'bytesSkipped': stream_stats['bytesSkipped'],
+            'unchanged': unchanged,
+            'changed': changed,
+            'failed': len(results) - unchanged - changed - skipped,
+            'skipped': skipped,
+            'unchangedRatio': round(unchanged / len(results), 3) if results else 0,
+        }
+        print(f"📉 本轮读取 {self.last_sweep['bytesRead'] / 1024:.0f} KB, "
+              f"提前结束 {self.last_sweep['earlyExits']}/{len(orders_to_check)} 次, "
+              f"少下载 {self.last_sweep['bytesSkipped'] / 1024:.0f} KB, "
+              f"耗时 {self.last_sweep['seconds']} 秒")
+        print(f"🧮 内容未变化 {unchanged} 个, 有变化 {changed} 个, 失败 {self.last_sweep['failed']} 个 "
+              f"(未变化 {self.last_sweep['unchangedRatio']:.0%})")
+        if skipped:
+            print(f"⛔ 熔断后跳过 {skipped} 个订单，恢复后重新查询")
         
         self.last_check_time = datetime.now().isoformat()
         self.check_count += 1
         self.save_history()
+        self.publish_status()
         
         return results
     
@@ -437,20 +917,36 @@ class OrderMonitor:
         def monitor_loop():
             while not self.stop_event.is_set():
                 try:
-                    self.check_all_orders()
+                    self.check_all_orders(due_only=self.config.get('adaptive_schedule', True))
                 except Exception as e:
                     print(f"监控出错: {e}")
                 
-                # 等待下次检查
-                for _ in range(self.config['interval']):
-                    if self.stop_event.is_set():
-                        break
-                    time.sleep(1)
+                # 等待下次检查（自适应调度时等到下一个订单到期）
+                self.stop_event.wait(self.seconds_until_next_check())
         
         self.monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
         self.monitor_thread.start()
+        # 监视订单文件：Bot 添加的订单在约 1 秒内进入优先查询通道
+        self.watch_thread = threading.Thread(target=self._watch_orders, daemon=True, name='orders-watch')
+        self.watch_thread.start()
+        self.publish_status()
         return True
     
+    def seconds_until_next_check(self):
+        """距离下次检查的秒数"""
+        interval = self.config['interval']
+        retry_in = get_breaker().retry_in()
+        if retry_in:
+            # 熔断中：等到冷却结束再探测
+            return min(interval, max(MIN_SCHEDULE_WAIT, retry_in))
+        if not self.config.get('adaptive_schedule', True):
+            return interval
+        next_due = self.scheduler.next_due()
+        if next_due is None:
+            return interval
+        # 最长不超过 interval，保证新添加的订单能及时查询
+        return min(interval, max(MIN_SCHEDULE_WAIT, next_due - time.time()))
+    
     def stop(self):
         """停止监控"""
         if not self.running:
@@ -460,6 +956,9 @@ class OrderMonitor:
         self.running = False
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
+        if self.watch_thread:
+            self.watch_thread.join(timeout=5)
+        self.publish_status()
     
     def get_status(self):
         """获取监控状态"""
@@ -476,16 +975,17 @@ class OrderMonitor:
         
         # 计算待检查的订单数量
         orders = self.get_orders()
+        known = self.results  # 同一份快照，统计过程中不受查询线程影响
         pending_orders = 0
         checked_orders = 0
         
         for url in orders:
             # 如果从未查询过,需要查询
-            if url not in self.results:
+            if url not in known:
                 pending_orders += 1
                 continue
             
-            prev_result = self.results[url]
+            prev_result = known[url]
             
             # 如果之前查询失败,需要重新查询
             if not prev_result.get('success'):
@@ -509,6 +1009,12 @@ class OrderMonitor:
             else:
                 status_counts['unknown'] += 1
         
+        # 调度情况
+        self.scheduler.sync(orders, known)
+        due_now, due_later = self.scheduler.count_due(orders)
+        next_due = self.scheduler.next_due()
+        breaker = get_breaker().get_stats()
+        
         return {
             'running': self.running,
             'interval': self.config['interval'],
@@ -518,7 +1024,38 @@ class OrderMonitor:
             'checkCount': self.check_count,
             'statusCounts': status_counts,
             'pendingOrders': pending_orders,
-            'checkedOrders': checked_orders
+            'checkedOrders': checked_orders,
+            'schedule': {
+                'adaptive': self.config.get('adaptive_schedule', True),
+                'dueNow': due_now,
+                'dueLater': due_later,
+                'nextDueIn': max(0, int(next_due - time.time())) if next_due else None
+            },
+            'lastSweep': self.last_sweep,
+            'fetchPool': get_fetch_client().get_stats(),
+            'concurrency': get_limiter().get_stats(),
+            'breaker': breaker,
+            'degraded': breaker['degraded'],
+            'events': self.events.get_stats(),
+            'priorityLane': dict(self.priority_stats, queued=len(self.priority_urls),
+                                 inflight=len(self.priority_inflight)),
+            'notifications': get_notifier().get_dispatch_stats(),
+            'notifyOutbox': get_notifier().get_outbox_stats()
+        }
+    
+    def publish_status(self):
+        """推送监控状态（含各状态订单数量），没有仪表盘连接时跳过"""
+        if self.events.has_subscribers():
+            self.events.publish('status', self.get_status())
+    
+    def get_snapshot(self):
+        """仪表盘连接时的完整快照，之后只推送增量"""
+        results, changes = self.state.snapshot_all()
+        return {
+            'status': self.get_status(),
+            'orders': self.get_orders(),
+            'results': results,
+            'changes': changes,
         }
 
 
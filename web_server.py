@@ -4,9 +4,14 @@
 """
 
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from concurrent.futures import ThreadPoolExecutor
 import json
+import threading
+import time
 import webbrowser
-from datetime import datetime
+from batch_query import iter_batch_query
+from event_hub import encode_event
 from web_monitor import get_monitor
 from notifier import get_notifier
 
@@ -155,41 +160,40 @@ QUERY_HTML = '''
             document.getElementById('urlInput').value = '';
         }
         
-        // 查询单个订单，支持重试
-        async function queryOrderWithRetry(url, timeout, maxRetries = 2) {
-            let lastError = null;
-            
-            for (let attempt = 0; attempt <= maxRetries; attempt++) {
-                try {
-                    const response = await fetch('/api/query', {
-                        method: 'POST',
-                        headers: {'Content-Type': 'application/json'},
-                        body: JSON.stringify({url, timeout})
-                    });
-                    const result = await response.json();
-                    
-                    // 如果查询成功，直接返回
-                    if (result.success) {
-                        return result;
-                    }
-                    
-                    // 如果查询失败且还有重试次数
-                    lastError = result;
-                    if (attempt < maxRetries) {
-                        console.log(`订单 ${url.split('/').slice(-2,-1)[0]} 查询失败，重试 ${attempt + 1}/${maxRetries}...`);
-                        await new Promise(resolve => setTimeout(resolve, 1000)); // 等待1秒后重试
-                    }
-                } catch (error) {
-                    lastError = {success: false, url, error: error.message};
-                    if (attempt < maxRetries) {
-                        console.log(`订单查询出错，重试 ${attempt + 1}/${maxRetries}...`);
-                        await new Promise(resolve => setTimeout(resolve, 1000));
-                    }
+        // 调用服务端批量查询，逐行读取 NDJSON 结果
+        async function streamBatchQuery(urls, timeout, concurrency, onItem) {
+            const response = await fetch('/api/query/batch', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({urls, timeout, concurrency, retries: 2})
+            });
+            if (!response.ok) {
+                const error = await response.json().catch(() => ({}));
+                throw new Error(error.message || `HTTP ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let summary = null;
+            const handleLine = (line) => {
+                if (!line.trim()) return;
+                const item = JSON.parse(line);
+                if (item.done) {
+                    summary = item;
+                } else {
+                    onItem(item);
                 }
+            };
+            while (true) {
+                const {done, value} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                const lines = buffer.split('\\n');
+                buffer = lines.pop();
+                lines.forEach(handleLine);
             }
-            
-            // 所有重试都失败，返回最后的错误
-            return lastError;
+            handleLine(buffer);
+            return summary;
         }
 
         async function startQuery() {
@@ -220,80 +224,34 @@ QUERY_HTML = '''
             document.getElementById('resultCard').style.display = 'block';
             
             let completed = 0;
-            const batchSize = threadCount;
-            
-            // 第一轮查询（带重试）
-            for (let i = 0; i < urls.length; i += batchSize) {
-                const batch = urls.slice(i, i + batchSize);
-                const batchPromises = batch.map(async (url, idx) => {
-                    const index = i + idx;
-                    const result = await queryOrderWithRetry(url, timeout, 2);
-                    queryResults[index] = result;
-                    addResultToTable(result, index + 1);
-                    completed++;
-                    progressFill.style.width = (completed / urls.length * 100) + '%';
-                    status.textContent = `正在查询订单状态 ${completed}/${urls.length}`;
-                    const elapsed = (Date.now() - queryStartTime) / 1000;
-                    speedInfo.textContent = `速度: ${(completed/elapsed).toFixed(1)} 个/秒`;
-                });
-                await Promise.all(batchPromises);
-            }
             
-            // 统计已发货但缺少物流单号的订单
-            const shippedWithoutTrackingIndices = [];
-            queryResults.forEach((result, index) => {
-                if (result && result.success && result.status === 'SHIPPED') {
-                    if (!result.trackingNumber || result.trackingNumber === '-') {
-                        shippedWithoutTrackingIndices.push(index);
-                    }
-                }
-            });
+            function handleItem(item) {
+                queryResults[item.index] = item.result;
+                addResultToTable(item.result, item.index + 1);
+                completed++;
+                progressFill.style.width = (completed / urls.length * 100) + '%';
+                status.textContent = `正在查询订单状态 ${completed}/${urls.length}`;
+                const elapsed = (Date.now() - queryStartTime) / 1000;
+                speedInfo.textContent = `速度: ${(completed/elapsed).toFixed(1)} 个/秒`;
+            }
             
-            // 如果有已发货但缺少物流单号的订单，显示提示
-            if (shippedWithoutTrackingIndices.length > 0) {
-                status.textContent = `检测到 ${shippedWithoutTrackingIndices.length} 个已发货订单缺少物流单号，正在查询...`;
-                console.log(`发现 ${shippedWithoutTrackingIndices.length} 个 SHIPPED 订单需要查询物流单号`);
-                
-                // 注：物流单号实际上在第一次查询时就已经提取了
-                // 这里只是更新显示状态
-                for (const index of shippedWithoutTrackingIndices) {
-                    const result = queryResults[index];
-                    console.log(`订单 ${result.orderNumber}: 物流单号 ${result.trackingNumber || '未找到'}`);
-                }
+            // 服务端并发查询并自动重试，每完成一个订单返回一行 JSON
+            let failReason = '连接中断';
+            try {
+                await streamBatchQuery(urls, timeout, threadCount, handleItem);
+            } catch (error) {
+                console.log(`批量查询连接中断: ${error.message}`);
+                failReason = error.message;
             }
             
-            // 统计失败的订单
-            const failedIndices = [];
-            queryResults.forEach((result, index) => {
-                if (!result || !result.success) {
-                    failedIndices.push(index);
+            // 连接中断时未返回结果的订单记为失败
+            urls.forEach((url, index) => {
+                if (!queryResults[index]) {
+                    queryResults[index] = {success: false, url, error: failReason};
+                    addResultToTable(queryResults[index], index + 1);
                 }
             });
             
-            // 如果有失败的订单，进行第二轮完整重试
-            if (failedIndices.length > 0) {
-                status.textContent = `第一轮完成，重试 ${failedIndices.length} 个失败的订单...`;
-                
-                for (let i = 0; i < failedIndices.length; i += batchSize) {
-                    const batch = failedIndices.slice(i, i + batchSize);
-                    const retryPromises = batch.map(async (index) => {
-                        const url = urls[index];
-                        status.textContent = `重试失败订单 ${i + 1}/${failedIndices.length}...`;
-                        const result = await queryOrderWithRetry(url, timeout, 2);
-                        queryResults[index] = result;
-                        
-                        // 更新表格中的这一行
-                        const tbody = document.getElementById('resultBody');
-                        const rows = tbody.getElementsByTagName('tr');
-                        if (rows[index]) {
-                            rows[index].remove();
-                        }
-                        addResultToTable(result, index + 1);
-                    });
-                    await Promise.all(retryPromises);
-                }
-            }
-            
             const totalTime = ((Date.now() - queryStartTime) / 1000).toFixed(1);
             const finalFailedCount = queryResults.filter(r => !r || !r.success).length;
             const shippedCount = queryResults.filter(r => r && r.success && r.status === 'SHIPPED').length;
@@ -380,7 +338,8 @@ QUERY_HTML = '''
             
             try {
                 const timeout = parseInt(document.getElementById('timeout').value) || 30;
-                const result = await queryOrderWithRetry(url, timeout, 2);
+                let result = {success: false, url, error: '连接中断'};
+                await streamBatchQuery([url], timeout, 1, item => { result = item.result; });
                 
                 // 更新结果
                 queryResults[index] = result;
@@ -532,6 +491,15 @@ MONITOR_HTML = '''
         }
         .status-item.running .value { color: #28a745; }
         .status-item.stopped .value { color: #dc3545; }
+        .degraded-banner {
+            display: none;
+            margin-bottom: 15px;
+            padding: 12px 15px;
+            border-radius: 8px;
+            background: #fff3cd;
+            color: #856404;
+            border: 1px solid #ffeeba;
+        }
         .countdown-item .value { 
             color: #667eea; 
             font-family: 'Courier New', monospace;
@@ -779,6 +747,7 @@ MONITOR_HTML = '''
         
         <div class="card">
             <div class="card-title">📈 监控状态</div>
+            <div class="degraded-banner" id="degradedBanner"></div>
             <div class="status-panel">
                 <div class="status-item" id="monitorStatus">
                     <div class="value" id="statusText">--</div>
@@ -882,18 +851,132 @@ MONITOR_HTML = '''
 
     <script>
         let autoRefresh = null;
+        let eventSource = null;
         
         // 页面加载时初始化
         document.addEventListener('DOMContentLoaded', () => {
-            refreshData();
-            // 每10秒自动刷新
-            autoRefresh = setInterval(refreshData, 10000);
+            if (window.EventSource) {
+                // 服务端推送：连接时收到完整快照，之后只收到变化的订单
+                connectEvents();
+            } else {
+                refreshData();
+                // 不支持 EventSource 的浏览器每10秒自动刷新
+                autoRefresh = setInterval(refreshData, 10000);
+            }
         });
         
         // 全局状态
         let currentFilter = 'all';
         let orderStats = {};
         let allOrdersData = null;
+        let changesData = [];
+        let renderTimer = null;
+        
+        // 订阅仪表盘事件流（断开后浏览器会自动重连并重新发送快照）
+        function connectEvents() {
+            eventSource = new EventSource('/api/monitor/events');
+            
+            eventSource.addEventListener('snapshot', e => {
+                const snapshot = JSON.parse(e.data);
+                applyStatus(snapshot.status);
+                allOrdersData = {
+                    orders: snapshot.orders.map(url => ({url})),
+                    results: snapshot.results
+                };
+                changesData = snapshot.changes;
+                renderAll();
+            });
+            eventSource.addEventListener('status', e => applyStatus(JSON.parse(e.data)));
+            eventSource.addEventListener('order', e => {
+                const data = JSON.parse(e.data);
+                if (!allOrdersData) return;
+                allOrdersData.results[data.url] = data.result;
+                scheduleRender();
+            });
+            eventSource.addEventListener('result_removed', e => {
+                const data = JSON.parse(e.data);
+                if (!allOrdersData) return;
+                delete allOrdersData.results[data.url];
+                scheduleRender();
+            });
+            eventSource.addEventListener('results_cleared', () => {
+                if (!allOrdersData) return;
+                allOrdersData.results = {};
+                scheduleRender();
+            });
+            eventSource.addEventListener('orders_added', e => {
+                const data = JSON.parse(e.data);
+                if (!allOrdersData) return;
+                const known = new Set(allOrdersData.orders.map(order => order.url));
+                data.urls.forEach(url => {
+                    if (!known.has(url)) {
+                        allOrdersData.orders.push({url});
+                    }
+                    delete allOrdersData.results[url];
+                });
+                scheduleRender();
+            });
+            eventSource.addEventListener('orders_deleted', e => {
+                const data = JSON.parse(e.data);
+                if (!allOrdersData) return;
+                const deleted = new Set(data.urls);
+                allOrdersData.orders = allOrdersData.orders.filter(order => !deleted.has(order.url));
+                data.urls.forEach(url => delete allOrdersData.results[url]);
+                changesData = changesData.filter(change => !deleted.has(change.url));
+                scheduleRender();
+            });
+            eventSource.addEventListener('orders', e => {
+                // 订单文件被外部修改（如 Telegram Bot），整体替换订单列表
+                const data = JSON.parse(e.data);
+                if (!allOrdersData) return;
+                allOrdersData.orders = data.orders.map(url => ({url}));
+                scheduleRender();
+            });
+            eventSource.addEventListener('change', e => {
+                changesData.push(JSON.parse(e.data));
+                scheduleRender();
+            });
+        }
+        
+        function applyStatus(status) {
+            updateStatusPanel(status);
+            monitorInterval = status.interval || 300;
+        }
+        
+        // 一轮检查会连续收到很多增量，合并后再重新渲染
+        function scheduleRender() {
+            if (renderTimer) return;
+            renderTimer = setTimeout(() => {
+                renderTimer = null;
+                renderAll();
+            }, 300);
+        }
+        
+        function renderAll() {
+            if (!allOrdersData) return;
+            calculateStats(allOrdersData);
+            updateOrderList(allOrdersData, currentFilter);
+            updateChangeLog(changesData);
+            updateHistoryList(buildHistory(allOrdersData.results));
+        }
+        
+        // 与 /api/monitor/history 相同：查询成功的订单，按时间倒序
+        function buildHistory(results) {
+            const history = [];
+            Object.entries(results).forEach(([url, result]) => {
+                if (result.success) {
+                    history.push({
+                        url,
+                        orderNumber: result.orderNumber || '-',
+                        productName: result.productName || '-',
+                        status: result.status || '-',
+                        timestamp: result.timestamp || '-'
+                    });
+                }
+            });
+            history.sort((a, b) => (b.timestamp || '').localeCompare(a.timestamp || ''));
+            return history;
+        }
         
         // 倒计时相关变量
         let countdownInterval = null;
@@ -923,6 +1006,7 @@ MONITOR_HTML = '''
                 // 获取变更记录
                 const changesRes = await fetch('/api/monitor/changes');
                 const changes = await changesRes.json();
+                changesData = changes;
                 updateChangeLog(changes);
                 
                 // 获取历史记录
@@ -1027,6 +1111,18 @@ MONITOR_HTML = '''
             document.getElementById('orderCount').textContent = status.totalOrders;
             document.getElementById('checkCount').textContent = status.checkCount;
             
+            // 熔断中：苹果页面大量失败，暂停查询
+            const banner = document.getElementById('degradedBanner');
+            if (status.degraded && status.breaker) {
+                const probing = status.breaker.state === 'half_open' || !status.breaker.retryIn;
+                banner.textContent = '⛔ 苹果订单页面大量失败，已暂停查询' +
+                    (probing ? '，正在用少量订单探测' : `，${status.breaker.retryIn} 秒后探测`) +
+                    (status.breaker.lastReason ? `（${status.breaker.lastReason}）` : '');
+                banner.style.display = 'block';
+            } else {
+                banner.style.display = 'none';
+            }
+            
             if (status.lastCheck) {
                 const date = new Date(status.lastCheck);
                 document.getElementById('lastCheck').textContent = 
@@ -1504,32 +1600,19 @@ MONITOR_HTML = '''
                 deleteBtn.disabled = true;
                 deleteBtn.textContent = '删除中...';
                 
-                let successCount = 0;
-                let failCount = 0;
-                
-                // 逐个删除订单（避免并发问题）
-                for (const order of allOrdersData.orders) {
-                    try {
-                        const res = await fetch('/api/monitor/orders', {
-                            method: 'DELETE',
-                            headers: {'Content-Type': 'application/json'},
-                            body: JSON.stringify({url: order.url})
-                        });
-                        const result = await res.json();
-                        if (result.success) {
-                            successCount++;
-                        } else {
-                            failCount++;
-                            console.error('删除失败:', order.url, result.message);
-                        }
-                    } catch (err) {
-                        failCount++;
-                        console.error('删除出错:', order.url, err);
-                    }
-                    
-                    // 更新进度
-                    deleteBtn.textContent = `删除中 ${successCount + failCount}/${count}`;
+                // 一次请求批量删除
+                const res = await fetch('/api/monitor/orders', {
+                    method: 'DELETE',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({urls: allOrdersData.orders.map(order => order.url)})
+                });
+                const result = await res.json();
+                if (!result.success) {
+                    console.error('删除失败:', result.message);
                 }
+                const details = result.details || {deleted: [], missing: []};
+                const successCount = details.deleted.length;
+                const failCount = count - successCount;
                 
                 deleteBtn.textContent = '🗑️ 全部删除';
                 deleteBtn.disabled = false;
@@ -2063,9 +2146,49 @@ SETTINGS_HTML = '''
 '''
 
 
+# 服务启动标识，避免重启后版本号从 0 开始时 ETag 与旧数据相同
+BOOT_ID = format(int(time.time()), 'x')
+
+# 批量查询接口允许的单次超时（秒）和重试次数上限
+BATCH_MAX_TIMEOUT = 120
+BATCH_MAX_RETRIES = 5
+
+# 按数据版本缓存的序列化结果 {path: (etag, body)}
+_response_cache = {}
+_response_cache_lock = threading.Lock()
+
+
+def build_history():
+    """历史记录列表：查询成功的订单，按时间倒序"""
+    history = []
+    for url, result in get_monitor().results.items():
+        if result.get('success'):
+            history.append({
+                'url': url,
+                'orderNumber': result.get('orderNumber', '-'),
+                'productName': result.get('productName', '-'),
+                'status': result.get('status', '-'),
+                'timestamp': result.get('timestamp', '-')
+            })
+    # 按时间倒序排序
+    history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+    return history
+
+
+def build_orders_payload(monitor):
+    """订单列表和所有查询结果（/api/monitor/orders）"""
+    return {
+        'orders': [{'url': url} for url in monitor.get_orders()],
+        'results': monitor.results
+    }
+
+
 class RequestHandler(BaseHTTPRequestHandler):
     """HTTP 请求处理器"""
     
+    # keep-alive 连接上响应头和响应体分两次写入，关闭 Nagle 避免与延迟 ACK 叠加出 40ms 等待
+    disable_nagle_algorithm = True
+    
     def do_GET(self):
         path = self.path.split('?')[0]
         
@@ -2079,28 +2202,15 @@ class RequestHandler(BaseHTTPRequestHandler):
             self.send_json(get_monitor().get_status())
         elif path == '/api/monitor/orders':
             monitor = get_monitor()
-            self.send_json({
-                'orders': [{'url': url} for url in monitor.get_orders()],
-                'results': monitor.results
-            })
+            self.send_versioned_json(path, lambda: build_orders_payload(monitor),
+                                     extra=f"-{monitor.orders_version()}")
         elif path == '/api/monitor/changes':
-            self.send_json(get_monitor().status_changes)
+            self.send_versioned_json(path, lambda: get_monitor().status_changes)
+        elif path == '/api/monitor/events':
+            self.send_events()
         elif path == '/api/monitor/history':
             # 获取历史记录列表
-            monitor = get_monitor()
-            history = []
-            for url, result in monitor.results.items():
-                if result.get('success'):
-                    history.append({
-                        'url': url,
-                        'orderNumber': result.get('orderNumber', '-'),
-                        'productName': result.get('productName', '-'),
-                        'status': result.get('status', '-'),
-                        'timestamp': result.get('timestamp', '-')
-                    })
-            # 按时间倒序排序
-            history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            self.send_json(history)
+            self.send_versioned_json(path, build_history)
         elif path == '/api/monitor/config':
             self.send_json(get_monitor().config)
         elif path == '/api/telegram/config':
@@ -2109,8 +2219,7 @@ class RequestHandler(BaseHTTPRequestHandler):
             # 获取机器人列表
             self.send_json({'bots': get_notifier().get_bots()})
         else:
-            self.send_response(404)
-            self.end_headers()
+            self.send_not_found()
     
     def do_POST(self):
         path = self.path.split('?')[0]
@@ -2131,24 +2240,10 @@ class RequestHandler(BaseHTTPRequestHandler):
             # 检查单个订单
             url = data.get('url', '')
             if url:
-                result = get_monitor().query_order(url)
-                if result.get('success'):
-                    # 更新结果
-                    old_result = get_monitor().results.get(url, {})
-                    old_status = old_result.get('status')
-                    new_status = result.get('status')
-                    if old_status and old_status != new_status:
-                        change = {
-                            'url': url,
-                            'orderNumber': result.get('orderNumber'),
-                            'productName': result.get('productName'),
-                            'oldStatus': old_status,
-                            'newStatus': new_status,
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        get_monitor().status_changes.append(change)
-                    get_monitor().results[url] = result
-                    get_monitor().save_history()
+                monitor = get_monitor()
+                # 和检查、优先通道走同一条合并路径：按订单加锁、记录状态开始时间、更新调度、发送变更通知
+                result = monitor.check_one(url)
+                monitor.save_history()
                 self.send_json(result)
             else:
                 self.send_json({'success': False, 'error': '缺少 url 参数'})
@@ -2165,58 +2260,13 @@ class RequestHandler(BaseHTTPRequestHandler):
                 self.send_json({'success': False, 'message': '没有提供订单链接'})
                 return
             
-            results = {'success': [], 'failed': [], 'skipped': []}
-            
-            for url in urls:
-                url = url.strip()
-                if not url:
-                    continue
-                if not url.startswith('http'):
-                    results['failed'].append({'url': url, 'reason': '无效的链接格式'})
-                    continue
-                    
-                success, msg = monitor.add_order(url)
-                if success:
-                    results['success'].append(url)
-                elif '已存在' in msg:
-                    results['skipped'].append({'url': url, 'reason': msg})
-                else:
-                    results['failed'].append({'url': url, 'reason': msg})
-            
-            # 保存历史
-            monitor.save_history()
+            # 内存中校验去重，一次写入订单文件
+            results = monitor.add_orders(urls)
 
-            # 后台自动查询新添加的订单
-            new_urls = results['success']
-            if new_urls:
-                import threading
-                def query_new_orders():
-                    from notifier import get_notifier
-                    notifier = get_notifier()
-                    
-                    for url in new_urls:
-                        try:
-                            # 记录查询前是否在历史中
-                            is_new = url not in monitor.results
-                            
-                            result = monitor.query_order(url)
-                            if result.get('success'):
-                                # 检查是否是首次查询且状态为 CANCELED
-                                if is_new and result.get('status') == 'CANCELED':
-                                    print(f"🚨 新订单 {result.get('orderNumber')} 首次查询即为 CANCELED，发送通知", flush=True)
-                                    enabled_bots = notifier.get_enabled_bots()
-                                    if enabled_bots:
-                                        try:
-                                            notifier.send_order_notification(result, None)
-                                            print(f"✅ 通知已发送", flush=True)
-                                        except Exception as e:
-                                            print(f"❌ 发送通知失败: {e}", flush=True)
-                                
-                                monitor.results[url] = result
-                        except Exception as e:
-                            print(f"查询订单失败: {e}", flush=True)
-                    monitor.save_history()
-                threading.Thread(target=query_new_orders, daemon=True).start()
+            # 新添加的订单进入优先查询通道，并发查询，不等下一轮检查
+            # （首次查询即为 CANCELED 时由 _apply_result 发送通知）
+            if results['success']:
+                monitor.prioritize(results['success'])
 
             total = len(results['success']) + len(results['failed']) + len(results['skipped'])
             if len(results['success']) == total:
@@ -2278,10 +2328,45 @@ class RequestHandler(BaseHTTPRequestHandler):
         elif path == '/api/monitor/history/clear':
             # 清空所有历史记录
             monitor = get_monitor()
-            count = len(monitor.results)
-            monitor.results.clear()
+            count = monitor.clear_results()
             monitor.save_history()
             self.send_json({'success': True, 'count': count, 'message': f'已清空 {count} 条历史记录'})
+        elif path == '/api/query/batch':
+            # 批量查询：服务端滑动窗口并发，每完成一个订单就以 NDJSON 返回一行
+            urls = [u.strip() for u in data.get('urls', []) if u and u.strip()]
+            if not urls:
+                self.send_json({'success': False, 'message': '没有提供订单链接'})
+                return
+            monitor = get_monitor()
+            try:
+                timeout = float(data.get('timeout') or monitor.config['timeout'])
+                concurrency = int(data.get('concurrency') or monitor.config['threads'])
+                max_retries = int(data.get('retries', 2))
+            except (TypeError, ValueError):
+                self.send_json({'success': False, 'message': 'timeout、concurrency、retries 必须是数字'}, status=400)
+                return
+            timeout = min(max(timeout, 1), BATCH_MAX_TIMEOUT)
+            concurrency = monitor.batch_concurrency(concurrency)
+            max_retries = min(max(max_retries, 0), BATCH_MAX_RETRIES)
+            print(f"[批量查询] {len(urls)} 个订单, 并发 {concurrency}, 重试 {max_retries} 次")
+            
+            def lines():
+                start = time.time()
+                succeeded = 0
+                for index, result, attempts in iter_batch_query(
+                        urls, lambda url: monitor.query_order(url, timeout=timeout),
+                        concurrency=concurrency, max_retries=max_retries):
+                    succeeded += 1 if result.get('success') else 0
+                    yield {'index': index, 'attempts': attempts, 'result': result}
+                yield {
+                    'done': True,
+                    'total': len(urls),
+                    'succeeded': succeeded,
+                    'failed': len(urls) - succeeded,
+                    'elapsed': round(time.time() - start, 1),
+                }
+            
+            self.send_ndjson(lines())
         elif path == '/api/query':
             # 批量查询单个订单
             try:
@@ -2308,30 +2393,36 @@ class RequestHandler(BaseHTTPRequestHandler):
                     'error': f'服务器错误: {str(e)}'
                 })
         else:
-            self.send_response(404)
-            self.end_headers()
+            self.send_not_found()
     
     def do_DELETE(self):
         path = self.path.split('?')[0]
         data = self.read_body()
         
         if path == '/api/monitor/orders':
-            url = data.get('url', '')
-            success, msg = get_monitor().delete_order(url)
-            self.send_json({'success': success, 'message': msg})
+            # 删除订单（支持单个或批量）
+            urls = data.get('urls') or [data.get('url', '')]
+            details = get_monitor().delete_orders(urls)
+            if details['error']:
+                success, msg = False, details['error']
+            elif not details['deleted']:
+                success, msg = False, '订单不存在'
+            elif details['missing']:
+                success, msg = True, f"删除 {len(details['deleted'])} 个，{len(details['missing'])} 个不存在"
+            else:
+                success, msg = True, '删除成功' if len(urls) == 1 else f"已删除 {len(details['deleted'])} 个订单"
+            self.send_json({'success': success, 'message': msg, 'details': details})
         elif path == '/api/monitor/history':
             # 删除单条历史记录
             url = data.get('url', '')
             monitor = get_monitor()
-            if url and url in monitor.results:
-                del monitor.results[url]
+            if url and monitor.remove_result(url):
                 monitor.save_history()
                 self.send_json({'success': True, 'message': '历史记录已删除'})
             else:
                 self.send_json({'success': False, 'message': '未找到该历史记录'})
         else:
-            self.send_response(404)
-            self.end_headers()
+            self.send_not_found()
     
     def read_body(self):
         content_length = int(self.headers.get('Content-Length', 0))
@@ -2345,25 +2436,193 @@ class RequestHandler(BaseHTTPRequestHandler):
         return {}
     
     def send_html(self, html):
+        body = html.encode('utf-8')
         self.send_response(200)
         self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+        self.wfile.write(body)
     
-    def send_json(self, data):
+    def send_versioned_json(self, path, build, extra=''):
+        """
+        按监控数据版本号缓存的 JSON 响应
+        
+        数据没有变化时直接返回缓存的字节；客户端带上 If-None-Match 且版本相同时返回 304。
+        """
+        # 先取版本号再构造数据：构造期间数据若有变化，版本号会再次递增，缓存不会过期不更新
+        etag = f'"{BOOT_ID}-{get_monitor().version}{extra}"'
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        
+        cached = _response_cache.get(path)
+        if cached and cached[0] == etag:
+            body = cached[1]
+        else:
+            body = json.dumps(build()).encode('utf-8')
+            with _response_cache_lock:
+                _response_cache[path] = (etag, body)
+        
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_ndjson(self, items):
+        """逐行发送 JSON（NDJSON），HTTP/1.1 下使用分块传输以保持连接"""
+        chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        
+        try:
+            for item in items:
+                line = (json.dumps(item, ensure_ascii=False) + '\n').encode('utf-8')
+                if chunked:
+                    line = b'%x\r\n%s\r\n' % (len(line), line)
+                self.wfile.write(line)
+                self.wfile.flush()
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # 浏览器中途关闭了页面，后续结果不再发送
+            self.close_connection = True
+    
+    def send_events(self):
+        """
+        Server-Sent Events：先发送完整快照，之后只推送增量
+        
+        快照发送后连接交给独立线程推送，不长期占用请求线程池（见 PooledHTTPServer.detach）。
+        客户端太慢导致事件队列溢出时断开连接，浏览器自动重连后重新拿快照。
+        """
+        monitor = get_monitor()
+        # 先订阅再取快照，快照之后的变化不会丢失（重复的增量可以安全地重复应用）
+        sub = monitor.events.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.send_header('X-Accel-Buffering', 'no')  # 关闭反向代理缓冲
+            self.end_headers()
+            self.close_connection = True
+            
+            self.wfile.write(encode_event('snapshot', monitor.get_snapshot()))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            monitor.events.unsubscribe(sub)
+            return
+        
+        heartbeat = monitor.config.get('events_heartbeat', 15)
+        sock = self.request
+        
+        def stream():
+            try:
+                # 两个心跳周期内写不出去（客户端不读或连接已失效）就断开
+                sock.settimeout(heartbeat * 2)
+                while not sub.overflow:
+                    payload = sub.get(timeout=heartbeat)
+                    # 没有事件时发送注释行，及时发现已断开的连接
+                    sock.sendall(payload or b': ping\n\n')
+            except OSError:
+                pass
+            finally:
+                monitor.events.unsubscribe(sub)
+        
+        detach = getattr(self.server, 'detach', None)
+        if detach:
+            detach(sock, stream)
+        else:
+            stream()
+    
+    def send_not_found(self):
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
     
     def log_message(self, format, *args):
         pass
 
 
+class PooledHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    线程池 HTTP 服务器 - 每个连接交给固定大小的线程池处理
+    
+    慢请求（查询订单）不会阻塞其他请求，同时并发数有上限。
+    事件流这样的长连接通过 detach() 交给独立线程，不占用线程池。
+    """
+    daemon_threads = True
+    
+    def __init__(self, server_address, handler_class, max_workers=32):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http')
+        self.detached = {}  # {socket: 请求处理完后在独立线程中运行的函数}
+        self.detached_lock = threading.Lock()
+    
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+    
+    def detach(self, request, target):
+        """当前请求处理完后，连接不关闭，交给独立线程运行 target()，结束后再关闭"""
+        with self.detached_lock:
+            self.detached[request] = target
+    
+    def shutdown_request(self, request):
+        with self.detached_lock:
+            target = self.detached.pop(request, None)
+        if target is None:
+            super().shutdown_request(request)
+            return
+        
+        def run():
+            try:
+                target()
+            finally:
+                super(PooledHTTPServer, self).shutdown_request(request)
+        
+        threading.Thread(target=run, daemon=True, name='http-stream').start()
+    
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+def create_server(port, config):
+    """根据监控配置创建 HTTP 服务器"""
+    if config.get('server_keepalive', True):
+        # HTTP/1.1 保持连接；空闲连接超时后关闭，避免长期占用线程
+        RequestHandler.protocol_version = 'HTTP/1.1'
+        RequestHandler.timeout = config.get('keepalive_timeout', 10)
+    workers = config.get('server_workers', 32)
+    return PooledHTTPServer(('127.0.0.1', port), RequestHandler, max_workers=workers)  # 只监听本地，通过反向代理访问
+
+
 def main():
     port = 8846  # 使用 8846 端口（避免与 1Panel 冲突）
-    server = HTTPServer(('127.0.0.1', port), RequestHandler)  # 只监听本地，通过反向代理访问
+    config = get_monitor().config
+    server = create_server(port, config)
     
     # 获取本机 IP
     import socket
@@ -2377,7 +2636,9 @@ def main():
     print(f"📊 本地访问: http://127.0.0.1:{port}")
     print(f"🌐 局域网访问: http://{local_ip}:{port}")
     print(f"🔍 批量查询: http://{local_ip}:{port}/query")
-    print(f"⚙️  设置页面: http://{local_ip}:{port}/settings\n")
+    print(f"⚙️  设置页面: http://{local_ip}:{port}/settings")
+    print(f"🧵 并发处理: {config.get('server_workers', 32)} 个线程, "
+          f"keep-alive: {'开启' if config.get('server_keepalive', True) else '关闭'}\n")
     
     # webbrowser.open(f'http://127.0.0.1:{port}')
     
@@ -2385,6 +2646,7 @@ def main():
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n服务器已停止")
+        server.server_close()
 
 
 if __name__ == '__main__':